@@ -1,158 +1,29 @@
-import pickle
-import random
-import numpy as np
+import json
 import os
-from flask import Flask, render_template, jsonify, session, url_for
-
-# --- PokerEvaluator Class (Copied from your original code, largely unchanged) ---
-class PokerEvaluator:
-    # Hand rankings
-    HIGH_CARD = 0
-    PAIR = 1
-    TWO_PAIR = 2
-    THREE_KIND = 3
-    STRAIGHT = 4
-    FLUSH = 5
-    FULL_HOUSE = 6
-    FOUR_KIND = 7
-    STRAIGHT_FLUSH = 8
-
-    def __init__(self):
-        self.RANK_VALUES = {
-            "2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8, "9": 9,
-            "10": 10, "J": 11, "Q": 12, "K": 13, "A": 14
-        }
-
-    def evaluate_hand(self, hole_cards, community_cards):
-        all_cards = hole_cards + community_cards
-        if not all_cards or len(all_cards) < 5:
-            return None # Not enough cards to evaluate
-
-        combinations = []
-        # Ensure cards are strings for consistency if they come from different sources
-        processed_cards = []
-        for card in all_cards:
-            if isinstance(card, tuple): # e.g. ('A', 'h')
-                processed_cards.append(f"{card[0]}{card[1]}")
-            elif isinstance(card, dict): # e.g. {'rank': 'A', 'suit': 'h'}
-                 processed_cards.append(f"{card['rank']}{card['suit']}")
-            else: # e.g. "Ah"
-                processed_cards.append(card)
-
-        self.generate_combinations(processed_cards, 5, 0, [], combinations)
-
-        best_score = None
-        for combo in combinations:
-            score = self.evaluate_five_card_hand(combo)
-            if best_score is None or (score and score > best_score):
-                best_score = score
-        return best_score
-
-    def evaluate_five_card_hand(self, hand):
-        if not hand or len(hand) != 5: return None
-
-        # Convert string cards to values
-        # Ensure hand items are strings like "Kh" or "10s"
-        card_values = []
-        for card_str in hand:
-            rank_str = card_str[:-1] # "K", "10"
-            if rank_str not in self.RANK_VALUES:
-                # print(f"Warning: Unknown rank {rank_str} in card {card_str}")
-                return None # Invalid card
-            card_values.append(self.RANK_VALUES[rank_str])
-
-        card_values.sort(reverse=True)
-
-        freq = {}
-        for v in card_values:
-            freq[v] = freq.get(v, 0) + 1
-        freq_sorted = sorted(freq.items(), key=lambda x: (x[1], x[0]), reverse=True)
-
-        is_flush = self.check_flush(hand)
-        straight_high = [0]
-        is_straight = self.check_straight(card_values, straight_high)
-
-        if is_flush and is_straight:
-            return [self.STRAIGHT_FLUSH, straight_high[0]]
-        if freq_sorted[0][1] == 4:
-            kicker = next((v for v in card_values if v != freq_sorted[0][0]), 0) # Default kicker
-            return [self.FOUR_KIND, freq_sorted[0][0], kicker]
-        if freq_sorted[0][1] == 3 and len(freq_sorted) > 1 and freq_sorted[1][1] >= 2:
-            return [self.FULL_HOUSE, freq_sorted[0][0], freq_sorted[1][0]]
-        if is_flush:
-            return [self.FLUSH] + card_values[:5] # Ensure only 5 cards
-        if is_straight:
-            return [self.STRAIGHT, straight_high[0]]
-        if freq_sorted[0][1] == 3:
-            kickers = [v for v in card_values if v != freq_sorted[0][0]]
-            return [self.THREE_KIND, freq_sorted[0][0]] + kickers[:2] # Ensure 2 kickers
-        if freq_sorted[0][1] == 2 and len(freq_sorted) > 1 and freq_sorted[1][1] == 2:
-            kicker = next((v for v in card_values if v != freq_sorted[0][0] and v != freq_sorted[1][0]), 0)
-            # Ensure pairs are sorted if ranks are different
-            pair1_val = freq_sorted[0][0]
-            pair2_val = freq_sorted[1][0]
-            return [self.TWO_PAIR, max(pair1_val, pair2_val), min(pair1_val, pair2_val), kicker]
-        if freq_sorted[0][1] == 2:
-            kickers = [v for v in card_values if v != freq_sorted[0][0]]
-            return [self.PAIR, freq_sorted[0][0]] + kickers[:3] # Ensure 3 kickers
-        return [self.HIGH_CARD] + card_values[:5] # Ensure 5 cards
-
-    def generate_combinations(self, cards, combination_size, start, current_combo, all_combinations):
-        if len(current_combo) == combination_size:
-            all_combinations.append(current_combo[:])
-            return
-        if start >= len(cards):
-            return
-        for i in range(start, len(cards) - (combination_size - len(current_combo)) + 1):
-            current_combo.append(cards[i])
-            self.generate_combinations(cards, combination_size, i + 1, current_combo, all_combinations)
-            current_combo.pop()
-
-    def check_flush(self, hand):
-        if not hand: return False
-        suit = hand[0][-1]
-        return all(c[-1] == suit for c in hand)
-
-    def check_straight(self, values, high_straight_value):
-        # values should be numeric and sorted for this function
-        unique_sorted_values = sorted(list(set(values)), reverse=True) # Ace can be high or low
-
-        # Check for standard straight (5 unique ranks in sequence)
-        for i in range(len(unique_sorted_values) - 4):
-            is_seq = True
-            for j in range(4):
-                if unique_sorted_values[i+j] - unique_sorted_values[i+j+1] != 1:
-                    is_seq = False
-                    break
-            if is_seq:
-                high_straight_value[0] = unique_sorted_values[i]
-                return True
-
-        # Check for A-5 straight (wheel: A, 5, 4, 3, 2)
-        # Numeric values: 14, 5, 4, 3, 2
-        if set([14, 5, 4, 3, 2]).issubset(set(values)):
-             # Check if these 5 distinct cards form the wheel
-            wheel_ranks = [14, 5, 4, 3, 2]
-            hand_ranks_for_wheel_check = sorted(list(set(v for v in values if v in wheel_ranks)), reverse=True)
-            if len(hand_ranks_for_wheel_check) >= 5: # Ensure we have at least 5 cards for a straight
-                # Check if the highest 5 cards that could form a wheel actually do
-                # This logic is tricky with 7 cards. We need to find if ANY 5 cards form a straight.
-                # The main evaluate_hand generates 5-card combos, so check_straight receives 5 values.
-                # For a 5-card hand:
-                if sorted(values) == [2,3,4,5,14]: # Ace is high (14)
-                    high_straight_value[0] = 5 # Ace is low in A-5 straight
-                    return True
-        return False
-
-    def hand_type_to_string(self, hand_type_val):
-        types = {
-            self.HIGH_CARD: "High Card", self.PAIR: "Pair", self.TWO_PAIR: "Two Pair",
-            self.THREE_KIND: "Three of a Kind", self.STRAIGHT: "Straight", self.FLUSH: "Flush",
-            self.FULL_HOUSE: "Full House", self.FOUR_KIND: "Four of a Kind",
-            self.STRAIGHT_FLUSH: "Straight Flush"
-        }
-        return types.get(hand_type_val, "Unknown Hand")
-# --- End PokerEvaluator Class ---
+import re
+import secrets
+import threading
+import time
+from flask import (
+    Flask, Response, render_template, jsonify, session, url_for, request, send_from_directory, abort,
+    stream_with_context
+)
+
+from card_assets import SPRITE_DIR, CardImageIndex, load_sprite_atlas
+from cards import class_id_from_str, ints_to_cards
+from equity_tables import DEFAULT_PATH as EQUITY_TABLES_PATH, load_equity_tables
+from events import StateNotifier, format_sse, view_delta
+from game import (
+    OPPONENT_MODEL, apply_user_decision, deal_new_hand, get_initial_game_state, log_message, resolve_user_bb_walk,
+    upgrade_state
+)
+from hand_history import DEFAULT_DIR as HAND_HISTORY_DIR, HandHistoryWriter, hand_record
+from jobs import JobQueue
+from opponent_model import record_user_decision
+from poker_evaluator import EVALUATION_CACHE
+from simulator import SimulationStream
+from state_store import DEFAULT_DB_PATH, LRUCache, create_state_store, new_session_id
+from strategy_assets import ENCODINGS, MANIFEST_NAME, STRATEGY_ASSET_DIR, load_strategy_assets
 
 
 app = Flask(__name__)
@@ -161,47 +32,81 @@ app = Flask(__name__)
 def home():
     return render_template("index.html")
 
-app.secret_key = os.urandom(24)
-
-evaluator = PokerEvaluator()
-RANKS = ['A', 'K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2']
-SUITS = ['h', 'd', 'c', 's'] # hearts, diamonds, clubs, spades
-
-# Load hand data (strategy)
-def load_results():
+def load_secret_key():
+    """
+    The session signing key, shared by every worker: SECRET_KEY from the environment,
+    otherwise the key in SECRET_KEY_FILE (default instance/secret_key), which is
+    generated on first start.
+    """
+    secret_key = os.environ.get('SECRET_KEY')
+    if secret_key:
+        return secret_key
+    path = os.environ.get('SECRET_KEY_FILE', os.path.join('instance', 'secret_key'))
     try:
-        # First try to load from JSON file
-        import json
-        json_path = os.path.join('static', 'aggregated_results.json')
-        if os.path.exists(json_path):
-            with open(json_path, 'r') as f:
-                json_data = json.load(f)
-                # Convert JSON format to Python tuple format
-                # JSON format: "P2:[P0:P][P1:P]|KJo" -> Python format: ("P2:[P0:P][P1:P]", "KJo")
-                converted_data = {}
-                for json_key, probabilities in json_data.items():
-                    if '|' in json_key:
-                        infoset, hand = json_key.split('|', 1)
-                        tuple_key = (infoset, hand)
-                        # Convert to the expected tuple format (fold_prob, all_in_prob)
-                        fold_prob = probabilities.get('fold_probability', 0.5)
-                        all_in_prob = probabilities.get('all_in_probability', 0.5)
-                        converted_data[tuple_key] = (fold_prob, all_in_prob)
-                print(f"Successfully loaded {len(converted_data)} strategy entries from aggregated_results.json")
-                return converted_data
-        
-        # Fallback to pickle file if JSON doesn't exist
-        with open('aggregated_results.pkl', 'rb') as f:
-            data = pickle.load(f)
-            print(f"Successfully loaded aggregated_results.pkl with {len(data)} entries.")
-            return data
-    except FileNotFoundError:
-        print("Warning: Neither aggregated_results.json nor aggregated_results.pkl found. Using empty dictionary.")
-        return {}
-    except Exception as e:
-        print(f"Error loading strategy data: {e}")
-        return {}
-HAND_DATA_STRATEGY = load_results()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # O_EXCL: when several processes start at once, exactly one writes the key
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    for _ in range(50): # Another process may still be writing it
+        with open(path, 'r') as f:
+            secret_key = f.read().strip()
+        if secret_key:
+            return secret_key
+        time.sleep(0.01)
+    raise RuntimeError(f"Secret key file {path} is empty")
+
+app.secret_key = load_secret_key()
+
+EQUITY_TABLES = load_equity_tables() # Precomputed class-vs-class tables, None until built
+if EQUITY_TABLES is None:
+    print(f"Equity tables not found at {EQUITY_TABLES_PATH}: /equity runs Monte Carlo for every query "
+          "and solve jobs are refused. Build them with: python equity_tables.py")
+elif EQUITY_TABLES.three_way is None:
+    print(f"Equity tables at {EQUITY_TABLES_PATH} are heads-up only: three- and four-way /equity queries run Monte Carlo")
+
+CARD_IMAGES = CardImageIndex() # Card id -> image filename, rescanned when static/card_images changes
+SPRITE_ATLAS = load_sprite_atlas(CARD_IMAGES) # All card images in one hashed PNG, None without Pillow
+SPRITE_FILENAME = re.compile(r'^cards\.[0-9a-f]{12}\.(png|json)$') # Content-hashed, so safe to cache forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STRATEGY_ASSETS = load_strategy_assets() # Quantized strategy export for browser clients, rebuilt when the strategy changes
+STRATEGY_ASSET_FILENAME = re.compile(r'^push_fold\.[0-9a-f]{12}\.bin$')
+
+# Game states are kept server-side; the session cookie only holds the session id
+STATE_STORE = create_state_store(
+    os.environ.get('GAME_STATE_BACKEND', 'sqlite'),
+    os.environ.get('GAME_STATE_DB', DEFAULT_DB_PATH),
+    int(os.environ.get('GAME_STATE_CACHE_SIZE', 1024))
+)
+STATE_EVENTS = StateNotifier() # Wakes /events streams when a session's state is saved
+EVENTS_POLL_INTERVAL = 1.0 # Seconds between store checks for saves made by other workers
+EVENTS_KEEPALIVE = 15.0 # Seconds of silence before a keep-alive comment
+EVENTS_MAX_DURATION = 300.0 # Streams are closed after this long; EventSource reconnects by itself
+
+# /simulate runs each request in a child process; these bound what one request can take
+SIMULATE_MAX_HANDS = int(os.environ.get('SIMULATE_MAX_HANDS', 10000000))
+SIMULATE_CPU_BUDGET = float(os.environ.get('SIMULATE_CPU_BUDGET', 20.0)) # CPU seconds per simulation
+SIMULATE_MAX_CONCURRENT = int(os.environ.get('SIMULATE_MAX_CONCURRENT', 2)) # Per web worker process
+SIMULATE_SLOTS = threading.BoundedSemaphore(SIMULATE_MAX_CONCURRENT)
+
+# Equity, simulation and solve jobs run in a process pool; results are cached by parameters
+JOB_QUEUE = JobQueue(
+    int(os.environ.get('JOB_WORKERS', 0)) or None, # Default: one per core
+    int(os.environ.get('JOB_CACHE_SIZE', 256)),
+    os.environ.get('JOB_CACHE_DIR', os.path.join('instance', 'job_cache')), # Empty: memory only
+    simulation_cpu_budget=SIMULATE_CPU_BUDGET
+)
+JOB_ID = re.compile(r'^[0-9a-f]{64}$')
+
+# Every finished hand is appended to a binary log (see hand_history.py); an empty HAND_HISTORY_DIR disables it
+HAND_HISTORY_DIR = os.environ.get('HAND_HISTORY_DIR', HAND_HISTORY_DIR)
+HAND_HISTORY = HandHistoryWriter(HAND_HISTORY_DIR) if HAND_HISTORY_DIR else None
+
+# Rendered /get_state bodies: session id -> (ETag, JSON bytes) for the latest state version
+VIEW_CACHE = LRUCache(int(os.environ.get('GAME_STATE_CACHE_SIZE', 1024)))
+
 
 # Helper function to convert app's hand string format to the strategy lookup format
 def convert_hand_to_lookup_format(hand_str_app):
@@ -224,264 +129,58 @@ def convert_hand_to_lookup_format(hand_str_app):
     
     return f"{rank1_char} {rank2_char}{suit_info}"
 
-# Helper function to generate the infoset string for strategy lookup
-def generate_infoset_for_lookup(prior_actions):
-    """
-    Generates the infoset string based on prior player actions.
-    prior_actions: list of decisions ("ALL_IN" or "FOLD") from CO, BTN, SB in order.
-    Player IDs in infoset (P0, P1, P2, P3) map to (CO, BTN, SB, BB).
-    """
-    num_prior = len(prior_actions)
-    
-    if num_prior == 0:  # Current player is CO
-        # This is the typical starting infoset for the first actor (CO)
-        return "P2:[P0:P][P1:P]"
-        
-    elif num_prior == 1:  # Current player is BTN (CO has acted)
-        co_act_char = 'A' if prior_actions[0] == 'ALL_IN' else 'F'
-        # Infoset for BTN, given CO's action (P2 refers to CO in this context)
-        return f"P3:[P0:P][P1:P][P2:{co_act_char}]"
-        
-    elif num_prior == 2:  # Current player is SB (CO and BTN have acted)
-        co_act_char = 'A' if prior_actions[0] == 'ALL_IN' else 'F'
-        btn_act_char = 'A' if prior_actions[1] == 'ALL_IN' else 'F'
-        # Infoset for SB, given CO (P2) and BTN (P3) actions
-        return f"P0:[P1:P][P2:{co_act_char}][P3:{btn_act_char}]"
-        
-    elif num_prior == 3:  # Current player is BB (CO, BTN, SB have acted)
-        co_act_char = 'A' if prior_actions[0] == 'ALL_IN' else 'F'
-        btn_act_char = 'A' if prior_actions[1] == 'ALL_IN' else 'F'
-        sb_act_char = 'A' if prior_actions[2] == 'ALL_IN' else 'F'
-        # Infoset for BB, given CO (P0), BTN (P2), and SB (P3) actions
-        return f"P1:[P0:{co_act_char}][P2:{btn_act_char}][P3:{sb_act_char}]"
-    
-    # Fallback, though for a 4-player game, num_prior should be 0, 1, 2, or 3.
-    print(f"Warning: Unexpected number of prior actions ({num_prior}) for infoset generation.")
-    return "ERROR_UNKNOWN_INFOSET_CONDITION"
-
-# Helper function to find card image files with various naming conventions
-def find_card_image_filename(card_str):
-    """
-    Tries to find an existing card image file based on the card string.
-    card_str: e.g., "9h", "AS", "10d"
-    Returns the filename (e.g., "9H.png") if found, or a default if not.
-    """
-    if not card_str or len(card_str) < 2:
-        #print(f"[CARD_IMG_DEBUG] Invalid card_str: {card_str}, returning back.png")
-        return "back.png"  # Should ideally not happen with valid card strings
-
-    rank_part = card_str[:-1]  # e.g., "9", "A", "10"
-    suit_part = card_str[-1]   # e.g., "h", "S", "d" (suit from input string)
-    #print(f"[CARD_IMG_DEBUG] Finding image for card_str: '{card_str}' (Rank: '{rank_part}', Suit: '{suit_part}')")
-
-    base_image_path = os.path.join('static', 'card_images')
-
-    # Patterns to try:
-    patterns_to_try = [
-        f"{rank_part}{suit_part.lower()}.png",          # Rs (e.g. Ah.png, 10s.png)
-        f"{rank_part.lower()}{suit_part.lower()}.png",  # rs (e.g. ah.png, 10s.png)
-        f"{rank_part}{suit_part.upper()}.png",          # RSU (e.g. AH.png, 10S.png)
-        f"{rank_part.lower()}{suit_part.upper()}.png",  # rsU (e.g. aH.png, 10S.png)
-    ]
-
-    unique_patterns = []
-    for p in patterns_to_try:
-        if p not in unique_patterns:
-            unique_patterns.append(p)
-    
-    #print(f"[CARD_IMG_DEBUG] Trying patterns for '{card_str}': {unique_patterns}")
-
-    for pattern_filename in unique_patterns:
-        full_path = os.path.join(base_image_path, pattern_filename)
-        # print(f"[CARD_IMG_DEBUG] Checking for: '{full_path}'") # Optional: very verbose
-        if os.path.exists(full_path):
-            #print(f"[CARD_IMG_DEBUG] Found existing image for '{card_str}': '{pattern_filename}' at path '{full_path}'")
-            return pattern_filename
-        # else: # Optional: very verbose
-            # print(f"[CARD_IMG_DEBUG] Image not found: '{pattern_filename}' at path '{full_path}'")
-
-    # Fallback if no image found after trying all patterns
-    default_filename = f"{rank_part}{suit_part.lower()}.png" # Default to Rank + lowercase suit
-    print(f"[CARD_IMG_DEBUG] No image found for '{card_str}' using patterns. Defaulting to '{default_filename}' and expecting it at '{os.path.join(base_image_path, default_filename)}'")
-    return default_filename
-
-def get_initial_game_state():
+def get_sprite_atlas_info():
     return {
-        "players": ["CO", "BTN", "SB", "BB"],
-        "player_stacks": [8.0, 8.0, 8.0, 8.0], # Starting stacks in BB
-        "current_player_idx": 0, # User is always current_player_idx for decision
-        "user_player_position_idx": 0, # Actual position of the user (CO, BTN, SB, BB)
-        "user_player_position_idx_last_hand": 0, # Added: User's position in the hand just played/being played
-        "hands_played": 0,
-        "all_player_cards": [], # List of 2-card lists, e.g., [["AH", "KD"], ["QC", "JS"], ...]
-        "community_cards": [], # List of 5 cards, e.g., ["2S", "3H", "4D", "5C", "6S"]
-        "decisions": [""] * 4, # Initialize with empty strings for 4 players
-        "pot_size": 0.0,
-        "small_blind": 0.4,
-        "big_blind": 1.0,
-        "log_messages": ["Game started! Click 'Deal New Hand' to begin."],
-        "game_phase": "pre_deal", # "pre_deal", "awaiting_decision", "showdown"
-        "player_cumulative_bb": [0], # For the graph - starts at 0
-        "winner_info": None, # To store winner details for display
-        "winners_player_indices": [], # Added: To store indices of winning players
-        "revealed_cards": {}, # player_idx: [card1, card2] for showdown
-        "player_bets_this_hand": [0.0, 0.0, 0.0, 0.0] # Tracks total bets for each player in the current hand
+        "image_url": url_for('sprite_file_api', filename=SPRITE_ATLAS["image"]),
+        "map_url": url_for('sprite_file_api', filename=SPRITE_ATLAS["map"]),
+        "width": SPRITE_ATLAS["width"],
+        "height": SPRITE_ATLAS["height"],
+        "card_width": SPRITE_ATLAS["card_width"],
+        "card_height": SPRITE_ATLAS["card_height"]
     }
 
+def get_session_id():
+    if 'sid' not in session:
+        session['sid'] = new_session_id()
+    return session['sid']
+
 def get_game_state():
-    if 'game_state' not in session:
-        session['game_state'] = get_initial_game_state()
+    state = STATE_STORE.get(get_session_id())
+    if state is None:
+        # States from before the server-side store were kept in the cookie itself
+        state = session.pop('game_state', None) or get_initial_game_state()
+    upgrade_state(state)
     # Ensure all keys are present, useful for upgrades
     default_state = get_initial_game_state()
     for key, value in default_state.items():
-        session['game_state'].setdefault(key, value)
-    return session['game_state']
+        state.setdefault(key, value)
+    return state
 
 def save_game_state(state):
-    session['game_state'] = state
-    session.modified = True
-
-
-def log_message(state, message):
-    state["log_messages"].append(message)
-    if len(state["log_messages"]) > 10: # Keep log concise
-        state["log_messages"].pop(0)
-
-def format_hand_for_strategy(cards_list):
-    # cards_list is like ["AH", "KS"]
-    if not cards_list or len(cards_list) != 2:
-        return "Unknown"
-    card1_rank = cards_list[0][:-1]
-    card1_suit = cards_list[0][-1]
-    card2_rank = cards_list[1][:-1]
-    card2_suit = cards_list[1][-1]
+    """Saves the state, wakes the session's event streams and returns the new version."""
+    session_id = get_session_id()
+    version = STATE_STORE.save(session_id, state)
+    STATE_EVENTS.notify(session_id)
+    return version
 
-    suited = 's' if card1_suit == card2_suit else 'o'
-    
-    rank_values = evaluator.RANK_VALUES
-    # Order by rank (higher rank first) using original rank values
-    card1_value = rank_values.get(card1_rank, 0)
-    card2_value = rank_values.get(card2_rank, 0)
-    
-    # Keep "10" as is - aggregated results use "10" format, not "T"
-    
-    # Handle pocket pairs (same rank) - no suit designation needed
-    if card1_value == card2_value:
-        return f"{card1_rank}{card2_rank}"  # e.g., "66", "AA", "1010"
-    
-    # Order by rank (higher rank first) - aggregated results expect higher rank first (no spaces)
-    if card1_value > card2_value:
-        return f"{card1_rank}{card2_rank}{suited}"  # card1 is higher, so it goes first
-    return f"{card2_rank}{card1_rank}{suited}"  # card2 is higher, so it goes first
+def log_finished_hand(state):
+    """Queues the hand for the hand history log if it has just been resolved."""
+    if HAND_HISTORY is not None and state["game_phase"] == "showdown":
+        HAND_HISTORY.append(hand_record(state, get_session_id()))
 
 
-def simulate_optimal_decision(player_position_name, player_hand_str, state):
-    # player_position_name is "CO", "BTN", "SB", "BB"
-    # player_hand_str is "AKs", "107o", etc. (from format_hand_for_strategy)
-    # state is the current game state
-    #print(f"\n[DEBUG_SIMULATE_DECISION] Simulating for: {player_position_name}, Hand: {player_hand_str}")
 
-    player_map = {"CO": 0, "BTN": 1, "SB": 2, "BB": 3}
-    current_player_game_idx = player_map.get(player_position_name)
-
-    if current_player_game_idx is None:
-        print(f"Warning: Unknown player position '{player_position_name}' in simulate_optimal_decision. Defaulting to FOLD.")
-        return "FOLD"
-
-    # Get decisions of players who acted before the current player
-    # state["decisions"] stores actions for CO, BTN, SB, BB by their game index
-    prior_raw_decisions = state["decisions"][:current_player_game_idx]
-    
-    # Ensure prior decisions are valid ("ALL_IN" or "FOLD"), default to "FOLD" if empty/unexpected
-    prior_actions_for_infoset = []
-    for dec in prior_raw_decisions:
-        if dec in ["ALL_IN", "FOLD"]:
-            prior_actions_for_infoset.append(dec)
-        else:
-            # If a prior player's decision isn't set or is invalid, assume FOLD for infoset robustness
-            # This might happen if state["decisions"] wasn't fully populated as expected
-            prior_actions_for_infoset.append("FOLD") 
-
-
-    infoset_key = generate_infoset_for_lookup(prior_actions_for_infoset)
-    hand_key = player_hand_str # Convert "A10s" to "A Ts"
-    #print(f"[DEBUG_SIMULATE_DECISION] Infoset Key for lookup: '{infoset_key}'")
-    #print(f"[DEBUG_SIMULATE_DECISION] Hand Key for lookup: '{hand_key}'")
-
-    # The strategy data is expected to store (fold_probability, all_in_probability)
-    # Default to 50/50 fold/all-in if the specific situation is not in the strategy
-    default_probabilities = (0.5, 0.5) # Default if key not found
-    lookup_key = (infoset_key, hand_key)
-    
-    if lookup_key not in HAND_DATA_STRATEGY:
-        print(f"[MISSING KEY DEBUG] Key not found: ({infoset_key}, {hand_key})")
-        print(f"[MISSING KEY DEBUG] Player: {player_position_name}, Using default probabilities: {default_probabilities}")
-    
-    retrieved_probabilities = HAND_DATA_STRATEGY.get(lookup_key, default_probabilities)
-    fold_prob, all_in_prob = retrieved_probabilities
-    
-    # if retrieved_probabilities == default_probabilities and (infoset_key, hand_key) not in HAND_DATA_STRATEGY:
-    #     print(f"[DEBUG_SIMULATE_DECISION] Key ({infoset_key}, {hand_key}) not found in HAND_DATA_STRATEGY. Using default probabilities: {default_probabilities}")
-    # else:
-    #     print(f"[DEBUG_SIMULATE_DECISION] Retrieved probabilities for ({infoset_key}, {hand_key}): Fold Prob={fold_prob}, All-In Prob={all_in_prob}")
-    
-    # Decision logic based on all_in_prob, as seen in the provided simulation code
-    decision = "FOLD" # Default decision
-    random_value = random.random()
-    if random_value < all_in_prob:
-        decision = "ALL_IN"
-    
-    # Debug output specifically for key hands to verify they're working correctly
-    if hand_key in ["K7o", "106o", "1010", "66", "77", "88", "99"]:
-        print(f"[{hand_key} DEBUG] Player: {player_position_name}, Infoset: {infoset_key}")
-        print(f"[{hand_key} DEBUG] Probabilities: fold={fold_prob:.3f} ({fold_prob*100:.1f}%), all_in={all_in_prob:.3f} ({all_in_prob*100:.1f}%)")
-        print(f"[{hand_key} DEBUG] Random value: {random_value:.3f}, Decision: {decision}")
-        print(f"[{hand_key} DEBUG] Key lookup: ({infoset_key}, {hand_key}) -> {'FOUND' if (infoset_key, hand_key) in HAND_DATA_STRATEGY else 'NOT FOUND'}")
-    
-    #print(f"[DEBUG_SIMULATE_DECISION] Simulated decision: {decision} (random draw vs all_in_prob {all_in_prob})")
-    return decision
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/get_state', methods=['GET'])
-def get_state_api():
-    state = get_game_state()
+def build_view_state(state):
+    """
+    The client's view of a game state: the state itself plus which card images each
+    seat shows (own cards, showdown reveals), the board at showdown and the winners.
+    """
     display_state = state.copy()
-    
-    # Check if user is BB and all others have folded - if so, auto-decide ALL_IN
-    if state["game_phase"] == "awaiting_decision":
-        co_idx = state["players"].index("CO")
-        btn_idx = state["players"].index("BTN")
-        sb_idx = state["players"].index("SB")
-        bb_idx = state["players"].index("BB")
-        
-        if state["user_player_position_idx"] == bb_idx and \
-           state["decisions"][co_idx] == "FOLD" and \
-           state["decisions"][btn_idx] == "FOLD" and \
-           state["decisions"][sb_idx] == "FOLD":
-            
-            # Auto-decide ALL_IN for user as BB
-            state["decisions"][bb_idx] = "ALL_IN"
-            log_message(state, f"You (BB) automatically win as all others folded. Your decision set to ALL_IN.")
-            
-            # Update BB's bet and stack for the automatic ALL_IN
-            amount_to_add_to_pot = state["player_stacks"][bb_idx]
-            state["player_bets_this_hand"][bb_idx] += amount_to_add_to_pot
-            state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
-            state["player_stacks"][bb_idx] = 0
-            
-            # Determine winner and move to showdown
-            determine_winner(state, state["user_player_position_idx"])
-            state["game_phase"] = "showdown"
-            state["user_player_position_idx_last_hand"] = state["user_player_position_idx"]
-            state["user_player_position_idx"] = (state["user_player_position_idx"] + 1) % len(state["players"])
-            save_game_state(state)
-            
-            # Since we modified the state, update display_state
-            display_state = state.copy()
-    
     processed_all_player_cards = []
     all_player_cards_data = state.get("all_player_cards", [])
     player_decisions_data = state.get("decisions", [])
@@ -519,8 +218,8 @@ def get_state_api():
 
             if can_see_cards:
                 processed_all_player_cards.append([
-                    find_card_image_filename(p_cards_list[0]),
-                    find_card_image_filename(p_cards_list[1])
+                    CARD_IMAGES.filename(p_cards_list[0]),
+                    CARD_IMAGES.filename(p_cards_list[1])
                 ])
             else:
                 processed_all_player_cards.append(["back.png", "back.png"])
@@ -531,7 +230,15 @@ def get_state_api():
     display_state["all_player_cards_display"] = processed_all_player_cards
     display_state["community_cards_display"] = []
     if state["game_phase"] == "showdown":
-        display_state["community_cards_display"] = [find_card_image_filename(card_str) for card_str in state.get("community_cards", [])[:5]]
+        display_state["community_cards_display"] = [CARD_IMAGES.filename(card) for card in state.get("community_cards", [])[:5]]
+
+    # Sprite atlas offsets for the same images, so the client can draw every card from one PNG
+    if SPRITE_ATLAS is not None:
+        sprite_files = SPRITE_ATLAS["files"]
+        display_state["sprite_atlas"] = get_sprite_atlas_info()
+        display_state["all_player_cards_sprites"] = [[sprite_files.get(f) for f in files] for files in processed_all_player_cards]
+        display_state["community_cards_sprites"] = [sprite_files.get(f) for f in display_state["community_cards_display"]]
+        display_state["card_back_sprite"] = sprite_files.get(CARD_IMAGES.back_filename())
     
     display_state["user_hand_display"] = ["?", "?"]
     if all_player_cards_data and \
@@ -540,7 +247,12 @@ def get_state_api():
        len(all_player_cards_data[state["user_player_position_idx"]]) == 2 and \
        state["game_phase"] != "pre_deal":
         user_cards_now = all_player_cards_data[state["user_player_position_idx"]]
-        display_state["user_hand_display"] = [user_cards_now[0], user_cards_now[1]]
+        display_state["user_hand_display"] = ints_to_cards(user_cards_now)
+
+    # The state keeps card ints; the JSON response keeps the card strings it always had
+    display_state["all_player_cards"] = [ints_to_cards(hole) for hole in all_player_cards_data]
+    display_state["community_cards"] = ints_to_cards(state.get("community_cards", []))
+    display_state["revealed_cards"] = {p_idx: ints_to_cards(hole) for p_idx, hole in state.get("revealed_cards", {}).items()}
 
 
     # Pass winner indices for highlighting
@@ -548,358 +260,327 @@ def get_state_api():
     if state["game_phase"] == "showdown": # Only pass if it's showdown
         display_state["winner_indices"] = state.get("winners_player_indices", [])
         
-    return jsonify(display_state)
+    return display_state
 
 
-@app.route('/deal', methods=['POST'])
-def deal_cards_api():
-    state = get_game_state()
-
-    if state["game_phase"] == "awaiting_decision":
-        log_message(state, "Cannot deal, hand in progress.")
-        save_game_state(state)
-        return jsonify({"success": False, "message": "Hand in progress."})
+def wants_view():
+    # Mutating routes return the post-action view too when called with ?view=1
+    return request.args.get('view', '').lower() in ('1', 'true')
 
-    # Reset stacks and pot for new hand
-    state["player_stacks"] = [8.0, 8.0, 8.0, 8.0]  # Reset all stacks to starting amount
-    state["pot_size"] = 0.0  # Reset pot size
-    state["player_bets_this_hand"] = [0.0] * len(state["players"]) # Reset bets for the new hand
 
+def action_response(result, state):
+    if wants_view():
+        result["state"] = build_view_state(state)
+        result["state"]["state_version"] = STATE_STORE.version(get_session_id())
+    return jsonify(result)
 
-    state["hands_played"] += 1
-    state["current_player_idx"] = state["user_player_position_idx"] # User is always the one to act on their turn
-    state["decisions"] = [""] * len(state["players"]) # Reset decisions
-    state["winner_info"] = None
-    state["winners_player_indices"] = []
-    state["revealed_cards"] = {}
-    state["user_player_position_idx_last_hand"] = state["user_player_position_idx"] # Set for current hand
 
-    deck = [(rank, suit) for rank in RANKS for suit in SUITS]
-    random.shuffle(deck)
+def state_etag(version):
+    # The view depends on the state version and on the card image filenames
+    atlas = SPRITE_ATLAS["image"] if SPRITE_ATLAS is not None else "none"
+    return f"v{version}-i{CARD_IMAGES.generation}-{atlas}"
 
-    state["all_player_cards"] = []
-    for i in range(len(state["players"])):
-        card1 = deck.pop(0)
-        card2 = deck.pop(0)
-        state["all_player_cards"].append([f"{card1[0]}{card1[1]}", f"{card2[0]}{card2[1]}"])
 
-    state["community_cards"] = [f"{card[0]}{card[1]}" for card in deck[:5]] # Deal 5, reveal later
+@app.route('/get_state', methods=['GET'])
+def get_state_api():
+    """
+    The current view. Every saved state has a version; the response carries an ETag
+    derived from it, and a matching If-None-Match gets a 304 without loading the state.
+    """
+    session_id = get_session_id()
+    version = STATE_STORE.version(session_id)
+    if version is not None and request.if_none_match.contains(state_etag(version)):
+        return app.response_class(status=304, headers={"ETag": f'"{state_etag(version)}"', "Cache-Control": "no-cache"})
 
-    # Blinds
-    sb_idx = state["players"].index("SB")
-    bb_idx = state["players"].index("BB")
-    
-    # SB post - Stacks are full (8.0) here
-    state["player_stacks"][sb_idx] = round(state["player_stacks"][sb_idx] - state["small_blind"], 2)
-    state["player_bets_this_hand"][sb_idx] = state["small_blind"]
-    state["pot_size"] = round(state["pot_size"] + state["small_blind"], 2)
-    
-    # BB post - Stacks are full (8.0) here
-    state["player_stacks"][bb_idx] = round(state["player_stacks"][bb_idx] - state["big_blind"], 2)
-    state["player_bets_this_hand"][bb_idx] = state["big_blind"]
-    state["pot_size"] = round(state["pot_size"] + state["big_blind"], 2)
-    
-    log_message(state, f"Hand #{state['hands_played']}. You are {state['players'][state['user_player_position_idx']]}.")
-    user_cards = state["all_player_cards"][state["user_player_position_idx"]]
-    log_message(state, f"Your hand: {user_cards[0]} {user_cards[1]}")
-
-    # Simulate decisions for players before the user
-    # This simplified model assumes user is 'current_player_idx' and others act based on that.
-    # A more complex model would have a proper turn order.
-    # For now, let's assume CO acts first, then BTN, then SB, then BB. User is one of them.
-    
-    # Determine who acts before the user in this round
-    # Example: if user is SB (idx 2), CO (idx 0) and BTN (idx 1) act first.
-    for i in range(state["user_player_position_idx"]):
-        player_pos_name = state["players"][i]
-        player_actual_cards = state["all_player_cards"][i]
-        player_hand_str = format_hand_for_strategy(player_actual_cards)
-        decision = simulate_optimal_decision(player_pos_name, player_hand_str, state)
-        state["decisions"][i] = decision
-        log_message(state, f"{player_pos_name} ({player_hand_str}) decided: {decision}")
-        if decision == "ALL_IN":
-            amount_to_add_to_bet = state["player_stacks"][i] # Their remaining stack
-            state["pot_size"] = round(state["pot_size"] + amount_to_add_to_bet, 2)
-            state["player_bets_this_hand"][i] += amount_to_add_to_bet # Add to existing bet (0 or blind)
-            state["player_stacks"][i] = 0
-        # If FOLD, player_bets_this_hand[i] remains as is (their blind, or 0).
+    state = get_game_state()
 
     # Check if user is BB and all others have folded - if so, auto-decide ALL_IN
-    co_idx = state["players"].index("CO")
-    btn_idx = state["players"].index("BTN")
-    sb_idx = state["players"].index("SB")
-    bb_idx = state["players"].index("BB")
-    
-    if state["user_player_position_idx"] == bb_idx and \
-       state["decisions"][co_idx] == "FOLD" and \
-       state["decisions"][btn_idx] == "FOLD" and \
-       state["decisions"][sb_idx] == "FOLD":
-        
-        # Auto-decide ALL_IN for user as BB
-        state["decisions"][bb_idx] = "ALL_IN"
-        log_message(state, f"You (BB) automatically win as all others folded. Your decision set to ALL_IN.")
-        
-        # Update BB's bet and stack for the automatic ALL_IN
-        amount_to_add_to_pot = state["player_stacks"][bb_idx]
-        state["player_bets_this_hand"][bb_idx] += amount_to_add_to_pot
-        state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
-        state["player_stacks"][bb_idx] = 0
-        
-        # Determine winner and move to showdown
-        determine_winner(state, state["user_player_position_idx"])
-        state["game_phase"] = "showdown"
-        state["user_player_position_idx_last_hand"] = state["user_player_position_idx"]
-        state["user_player_position_idx"] = (state["user_player_position_idx"] + 1) % len(state["players"])
-        save_game_state(state)
-        return jsonify({"success": True})
+    if resolve_user_bb_walk(state):
+        version = save_game_state(state)
+        log_finished_hand(state)
+
+    if version is None:
+        # Never saved (fresh session): nothing to version or cache yet
+        return jsonify(build_view_state(state))
+
+    etag = state_etag(version)
+    cached = VIEW_CACHE.get(session_id)
+    if cached is not None and cached[0] == etag:
+        body = cached[1]
+    else:
+        view = build_view_state(state)
+        view["state_version"] = version
+        body = app.json.dumps(view)
+        VIEW_CACHE.put(session_id, (etag, body))
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache" # Always revalidate, 304 when unchanged
+    return response
+
+
+@app.route('/events', methods=['GET'])
+def state_events_api():
+    """
+    Server-Sent Events stream of the session's view: a "snapshot" event, then a "delta"
+    event with the view fields changed since the stream's previous view (base_version)
+    whenever the state version changes. Meant for
+    workers that hold idle connections cheaply (gevent), see Procfile.
+    """
+    session_id = get_session_id()
+    wakeup = STATE_EVENTS.subscribe(session_id)
+
+    def stream():
+        last_view = None
+        last_version = None
+        started = last_sent = time.monotonic()
+        try:
+            yield f"retry: {int(EVENTS_POLL_INTERVAL * 2000)}\n\n"
+            while time.monotonic() - started < EVENTS_MAX_DURATION:
+                wakeup.clear()
+                version = STATE_STORE.version(session_id)
+                if version is not None and version != last_version:
+                    view = build_view_state(get_game_state())
+                    view["state_version"] = version
+                    if last_view is None:
+                        yield format_sse("snapshot", view, version)
+                    else:
+                        delta = {"state_version": version, "base_version": last_version, "changes": view_delta(last_view, view)}
+                        yield format_sse("delta", delta, version)
+                    last_view, last_version = view, version
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= EVENTS_KEEPALIVE:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+                wakeup.wait(EVENTS_POLL_INTERVAL)
+        finally:
+            STATE_EVENTS.unsubscribe(session_id, wakeup)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no" # Don't let a proxy buffer the stream
+    return response
+
+
+@app.route('/simulate', methods=['POST'])
+def simulate_api():
+    """
+    Plays many hands headlessly and streams aggregate snapshots as NDJSON, one JSON
+    object per line (EV per position in BB/hand with 95% intervals, hands done),
+    the last with "done": true. JSON body:
+    {"policy": {"SB": "22+, A2s+"}, "hands": 100000, "seed": 1, "seats": 4}
+    The policy (see simulator.apply_policy) replaces the strategy of the positions it
+    names; the other positions play the loaded strategy for the table size (default 4).
+    """
+    params = request.get_json(silent=True) or {}
+    try:
+        num_hands = int(params.get("hands", 100000))
+        if not 1 <= num_hands <= SIMULATE_MAX_HANDS:
+            return jsonify({"success": False, "message": f"hands must be between 1 and {SIMULATE_MAX_HANDS}."})
+        job_id, _, (num_hands, table, seed, _) = JOB_QUEUE.prepare("simulation", params)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)})
+
+    # A finished identical run (same push table, hands and seed) is replayed from the job cache
+    cached = JOB_QUEUE.cache.get(job_id)
+    if cached is not None:
+        cached = dict(cached, cached=True)
+        return Response(json.dumps(cached, separators=(',', ':')) + "\n", mimetype='application/x-ndjson')
+
+    if seed is None:
+        seed = secrets.randbits(32)
+    if not SIMULATE_SLOTS.acquire(blocking=False):
+        return jsonify({"success": False, "message": "Too many simulations running, try again shortly."})
+    try:
+        simulation = SimulationStream(num_hands, table, seed, cpu_budget=SIMULATE_CPU_BUDGET)
+    except Exception:
+        SIMULATE_SLOTS.release()
+        raise
+
+    def stream():
+        try:
+            for snapshot in simulation:
+                snapshot["seed"] = seed
+                if snapshot["done"] and snapshot["stopped"] == "complete":
+                    JOB_QUEUE.cache.put(job_id, snapshot)
+                yield json.dumps(snapshot, separators=(',', ':')) + "\n"
+        finally:
+            simulation.close()
+            SIMULATE_SLOTS.release()
+
+    response = Response(stream(), mimetype='application/x-ndjson')
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 
-    state["game_phase"] = "awaiting_decision"
+@app.route('/deal', methods=['POST'])
+def deal_cards_api():
+    state = get_game_state()
+    result = deal_new_hand(state)
     save_game_state(state)
-    return jsonify({"success": True})
+    if result["success"]:
+        log_finished_hand(state) # The user's BB walk finishes the hand at the deal
+    return action_response(result, state)
 
 
 @app.route('/make_decision/<string:decision_type>', methods=['POST'])
 def make_decision_api(decision_type):
     state = get_game_state()
-
-    if state["game_phase"] != "awaiting_decision":
-        return jsonify({"success": False, "message": "Not time for decision."})
-
-    user_original_position_this_hand = state["user_player_position_idx"]
-    state["decisions"][user_original_position_this_hand] = decision_type
-    log_message(state, f"You ({state['players'][user_original_position_this_hand]}) decided: {decision_type}")
-
-    # Update user's bet and stack for ALL_IN
-    if decision_type == "ALL_IN":
-        amount_to_add_to_pot = state["player_stacks"][user_original_position_this_hand]
-        state["player_bets_this_hand"][user_original_position_this_hand] += amount_to_add_to_pot
-        state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
-        state["player_stacks"][user_original_position_this_hand] = 0
-        log_message(state, f"You go ALL IN. Your bet this hand: {state['player_bets_this_hand'][user_original_position_this_hand]:.2f} BB. Pot: {state['pot_size']:.2f} BB")
-
-    # Check if CO, BTN, and SB have all folded - if so, BB automatically wins
-    co_idx = state["players"].index("CO")
-    btn_idx = state["players"].index("BTN")
-    sb_idx = state["players"].index("SB")
-    bb_idx = state["players"].index("BB")
-    
-    # Check if CO, BTN, and SB have all folded
-    if (state["decisions"][co_idx] == "FOLD" or not state["decisions"][co_idx]) and \
-       (state["decisions"][btn_idx] == "FOLD" or not state["decisions"][btn_idx]) and \
-       (state["decisions"][sb_idx] == "FOLD" or not state["decisions"][sb_idx]):
-        
-        # BB automatically wins - set decision to ALL_IN if not already decided
-        if not state["decisions"][bb_idx]:
-            state["decisions"][bb_idx] = "ALL_IN"
-            log_message(state, f"BB automatically wins as all others folded. BB decision set to ALL_IN.")
-            
-            # Update BB's bet and stack for the automatic ALL_IN
-            amount_to_add_to_pot = state["player_stacks"][bb_idx]
-            state["player_bets_this_hand"][bb_idx] += amount_to_add_to_pot
-            state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
-            state["player_stacks"][bb_idx] = 0
-            
-        # Skip simulating other decisions and go straight to determining winner
-        determine_winner(state, user_original_position_this_hand)
-        state["game_phase"] = "showdown"
-        state["user_player_position_idx_last_hand"] = user_original_position_this_hand
-        state["user_player_position_idx"] = (user_original_position_this_hand + 1) % len(state["players"])
+    result = apply_user_decision(state, decision_type)
+    if result["success"]:
+        record_user_decision(state, state["user_player_position_idx_last_hand"], decision_type)
         save_game_state(state)
-        return jsonify({"success": True})
-
-    # Simulate decisions for other players who haven't acted yet, using the optimal strategy.
-    for i in range(len(state["players"])):
-        if i == user_original_position_this_hand:
-            continue # Skip user, decision already made
-
-        if not state["decisions"][i]: # If no decision yet for this player
-            player_pos_name = state["players"][i]
-            
-            # Check if this is BB and all others have folded
-            if i == bb_idx and \
-               state["decisions"][co_idx] == "FOLD" and \
-               state["decisions"][btn_idx] == "FOLD" and \
-               state["decisions"][sb_idx] == "FOLD":
-                
-                # BB automatically wins - set decision to ALL_IN
-                state["decisions"][bb_idx] = "ALL_IN"
-                log_message(state, f"BB automatically wins as all others folded. BB decision set to ALL_IN.")
-                
-                # Update BB's bet and stack for the automatic ALL_IN
-                amount_to_add_to_pot = state["player_stacks"][bb_idx]
-                state["player_bets_this_hand"][bb_idx] += amount_to_add_to_pot
-                state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
-                state["player_stacks"][bb_idx] = 0
-                
-                # Skip simulating other decisions
-                break
-            
-            # Ensure cards are available for decision making
-            if not state["all_player_cards"] or i >= len(state["all_player_cards"]) or not state["all_player_cards"][i]:
-                log_message(state, f"Warning: Cards not found for {player_pos_name}, defaulting their action to FOLD.")
-                state["decisions"][i] = "FOLD" # Fallback if cards are missing
-                continue
-
-            player_actual_cards = state["all_player_cards"][i]
-            player_hand_str = format_hand_for_strategy(player_actual_cards)
-            
-            # Call simulate_optimal_decision for opponents
-            opponent_decision = simulate_optimal_decision(player_pos_name, player_hand_str, state)
-            state["decisions"][i] = opponent_decision
-            log_message(state, f"{state['players'][i]} ({player_hand_str}) decided: {opponent_decision}")
-
-            if opponent_decision == "ALL_IN":
-                # Amount to add is their current stack (if > 0)
-                amount_opponent_adds_to_bet = state["player_stacks"][i]
-                if amount_opponent_adds_to_bet > 0:
-                    state["player_bets_this_hand"][i] += amount_opponent_adds_to_bet # Add to existing bet (e.g., blind)
-                    state["pot_size"] = round(state["pot_size"] + amount_opponent_adds_to_bet, 2)
-                    state["player_stacks"][i] = 0
-                    log_message(state, f"{state['players'][i]} goes ALL IN. Their bet: {state['player_bets_this_hand'][i]:.2f} BB. Pot: {state['pot_size']:.2f} BB")
-                else:
-                    log_message(state, f"{state['players'][i]} is already all-in or has no chips to bet for ALL_IN decision.")
-            # If FOLD, their stack and current bet (e.g. blind) remain. The decision is logged above.
-            
-            # After each player's decision, check if BB is the only one left
-            if state["decisions"][co_idx] == "FOLD" and \
-               state["decisions"][btn_idx] == "FOLD" and \
-               state["decisions"][sb_idx] == "FOLD" and \
-               not state["decisions"][bb_idx]:
-                
-                # BB automatically wins - set decision to ALL_IN
-                state["decisions"][bb_idx] = "ALL_IN"
-                log_message(state, f"BB automatically wins as all others folded. BB decision set to ALL_IN.")
-                
-                # Update BB's bet and stack for the automatic ALL_IN
-                amount_to_add_to_pot = state["player_stacks"][bb_idx]
-                state["player_bets_this_hand"][bb_idx] += amount_to_add_to_pot
-                state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
-                state["player_stacks"][bb_idx] = 0
-                
-                # Skip simulating other decisions
-                break
-
-    # Determine winner
-    determine_winner(state, user_original_position_this_hand) # Pass user's original position
-    state["game_phase"] = "showdown"
-    
-    state["user_player_position_idx_last_hand"] = user_original_position_this_hand # Store for get_state
-
-    # Rotate positions for next hand (user moves to next position)
-    # This rotation should happen AFTER the current hand is fully resolved and state saved for showdown
-    # So, user_player_position_idx is rotated for the *next* deal.
-    state["user_player_position_idx"] = (user_original_position_this_hand + 1) % len(state["players"])
-    
-    save_game_state(state)
-    return jsonify({"success": True})
-
-def determine_winner(state, user_idx_for_this_hand): # Added user_idx_for_this_hand
-    # Ensure decisions array is properly initialized
-    current_decisions = state.get("decisions", [])
-    state["decisions"] = current_decisions + ["FOLD"] * (len(state["players"]) - len(current_decisions))
-    for i in range(len(state["decisions"])):
-        if not state["decisions"][i]: 
-            state["decisions"][i] = "FOLD" # Default unmade decisions to FOLD
-
-    # user_p_idx is the user's position for the hand just played
-    user_contribution_this_hand = state["player_bets_this_hand"][user_idx_for_this_hand]
-    current_cumulative_bb_val = state["player_cumulative_bb"][-1] if state["player_cumulative_bb"] else 0
-    state["winners_player_indices"] = [] # Initialize/reset
-
-    non_folded_players = [i for i, d in enumerate(state["decisions"]) if d != "FOLD"]
-
-    if not non_folded_players:
-        log_message(state, "Error: All players folded? Pot distributed or error.")
-        final_user_bb_change_for_hand = -user_contribution_this_hand
-        state["player_cumulative_bb"].append(current_cumulative_bb_val + final_user_bb_change_for_hand)
-        log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
-        state["winner_info"] = {"name": "No Winner", "hand_type": "All Folded"}
-        return
-
-    if len(non_folded_players) == 1:
-        winner_idx = non_folded_players[0]
-        log_message(state, f"{state['players'][winner_idx]} wins the pot of {state['pot_size']:.2f} BB (others folded).")
-        state["winner_info"] = {"name": state['players'][winner_idx], "hand_type": "Opponents Folded"}
-        state["winners_player_indices"] = [winner_idx]
-        if state["all_player_cards"] and len(state["all_player_cards"]) > winner_idx and state["all_player_cards"][winner_idx]:
-            state["revealed_cards"][winner_idx] = state["all_player_cards"][winner_idx]
-        
-        state["player_stacks"][winner_idx] = round(state["player_stacks"][winner_idx] + state["pot_size"], 2)
-        
-        final_user_bb_change_for_hand = 0
-        if winner_idx == user_idx_for_this_hand:
-            final_user_bb_change_for_hand = state["pot_size"] - user_contribution_this_hand
-        else:
-            final_user_bb_change_for_hand = -user_contribution_this_hand
-        
-        state["player_cumulative_bb"].append(current_cumulative_bb_val + final_user_bb_change_for_hand)
-        log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
-        return
-
-    showdown_players_indices = non_folded_players 
-    best_score = None
-    winners_indices_local = [] # Use local variable for winners in this scope
-    player_scores = {}
-
-    for p_idx in showdown_players_indices:
-        if not state["all_player_cards"] or p_idx >= len(state["all_player_cards"]) or not state["all_player_cards"][p_idx]:
-            log_message(state, f"Error: Missing cards for player {state['players'][p_idx]} at index {p_idx} during showdown.")
-            continue # Skip this player if cards are missing
-        hole_cards = state["all_player_cards"][p_idx]
-        score = evaluator.evaluate_hand(hole_cards, state["community_cards"])
-        player_scores[p_idx] = score
-        state["revealed_cards"][p_idx] = hole_cards
-
-        if score:
-            log_message(state, f"{state['players'][p_idx]} has {evaluator.hand_type_to_string(score[0])} ({hole_cards})")
-            if best_score is None or score > best_score:
-                best_score = score
-                winners_indices_local = [p_idx]
-            elif score == best_score:
-                winners_indices_local.append(p_idx)
-        else:
-            log_message(state, f"{state['players'][p_idx]} ({hole_cards}) - could not evaluate hand.")
-
-    state["winners_player_indices"] = winners_indices_local # Store in state
-
-    if not winners_indices_local or not best_score:
-        log_message(state, "Error: Could not determine a winner from hand evaluation.")
-        final_user_bb_change_for_hand = -user_contribution_this_hand if user_idx_for_this_hand in showdown_players_indices else -user_contribution_this_hand
-        state["player_cumulative_bb"].append(current_cumulative_bb_val + final_user_bb_change_for_hand)
-        log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
-        state["winner_info"] = {"name": "Evaluation Error", "hand_type": "Unknown"}
-        return
-
-    pot_per_winner = round(state["pot_size"] / len(winners_indices_local), 2)
-    winner_names = [state['players'][idx] for idx in winners_indices_local]
-    hand_name = evaluator.hand_type_to_string(best_score[0])
-    log_message(state, f"Winner(s): {', '.join(winner_names)} with {hand_name}. Each gets {pot_per_winner:.2f} BB.")
-    state["winner_info"] = {"name": ', '.join(winner_names), "hand_type": hand_name}
-
-    for w_idx in winners_indices_local:
-        state["player_stacks"][w_idx] = round(state["player_stacks"][w_idx] + pot_per_winner, 2)
-
-    final_user_bb_change_for_hand = 0
-    if user_idx_for_this_hand in winners_indices_local:
-        final_user_bb_change_for_hand = pot_per_winner - user_contribution_this_hand
-    elif user_idx_for_this_hand in showdown_players_indices:
-        final_user_bb_change_for_hand = -user_contribution_this_hand
-    else: # User folded before showdown
-        final_user_bb_change_for_hand = -user_contribution_this_hand
-        
-    state["player_cumulative_bb"].append(current_cumulative_bb_val + final_user_bb_change_for_hand)
-    log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
+        log_finished_hand(state)
+    return action_response(result, state)
 
 
 @app.route('/restart', methods=['POST'])
 def restart_api():
-    user_player_pos_idx = session.get('game_state', {}).get('user_player_position_idx', 0)
-    session['game_state'] = get_initial_game_state()
+    """Starts a new game; an optional JSON {"seed": n} replays the deals of that seed (see deals.py)."""
+    seed = (request.get_json(silent=True) or {}).get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed < 1 << 64):
+        return jsonify({"success": False, "message": "seed must be an integer between 0 and 2^64 - 1."})
+    state = get_initial_game_state(deal_seed=seed)
     # Preserve user's position through restarts, or reset to CO
-    session['game_state']['user_player_position_idx'] = 0 # Or user_player_pos_idx to keep it
-    log_message(session['game_state'], "Game restarted!")
-    save_game_state(session['game_state']) # Explicitly save after modifying
-    return jsonify({"success": True})
+    state['user_player_position_idx'] = 0 # Or the previous position to keep it
+    log_message(state, "Game restarted!")
+    save_game_state(state) # Explicitly save after modifying
+    return action_response({"success": True}, state)
+
+
+@app.route('/card_manifest', methods=['GET'])
+def card_manifest_api():
+    """Image filenames for every card, so clients can resolve card images themselves."""
+    manifest = CARD_IMAGES.manifest()
+    manifest["success"] = True
+    manifest["base_url"] = url_for('static', filename='card_images/')
+    if SPRITE_ATLAS is not None:
+        manifest["sprite_atlas"] = get_sprite_atlas_info()
+        manifest["sprites"] = SPRITE_ATLAS["files"]
+    return jsonify(manifest)
+
+
+@app.route('/sprites/<string:filename>', methods=['GET'])
+def sprite_file_api(filename):
+    """Serves the content-hashed sprite atlas and its map with immutable cache headers."""
+    if not SPRITE_FILENAME.match(filename):
+        abort(404)
+    response = send_from_directory(SPRITE_DIR, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/strategy/<string:filename>', methods=['GET'])
+def strategy_file_api(filename):
+    """
+    Serves the client strategy export (see strategy_assets.py): the hashed file as the best
+    precompressed copy the client accepts, with Content-Encoding and immutable cache headers,
+    and manifest.json, which is always revalidated.
+    """
+    if filename == MANIFEST_NAME:
+        response = send_from_directory(STRATEGY_ASSET_DIR, MANIFEST_NAME, max_age=0)
+        response.cache_control.no_cache = True
+        return response
+    if not STRATEGY_ASSET_FILENAME.match(filename):
+        abort(404)
+    content_encoding, served = None, filename
+    for encoding, _, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.exists(os.path.join(STRATEGY_ASSET_DIR, filename + suffix)):
+            content_encoding, served = encoding, filename + suffix
+            break
+    response = send_from_directory(STRATEGY_ASSET_DIR, served, mimetype='application/octet-stream',
+                                   max_age=IMMUTABLE_MAX_AGE)
+    if content_encoding:
+        response.headers["Content-Encoding"] = content_encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/equity', methods=['POST'])
+def equity_api():
+    """
+    All-in equity for 2-4 hands. JSON body:
+    {"hands": [["Ah", "Kd"], "QQ", "KJo"], "dead_cards": ["2c"], "tolerance": 0.002, "seed": 1}
+    Table and Monte Carlo answers have the same fields (equity, win, tie, std_error, trials,
+    exact, source); the table leaves trials null.
+    """
+    params = request.get_json(silent=True) or {}
+    hands = params.get("hands", [])
+
+    # Pure class-vs-class queries are answered from the precomputed tables when available
+    if EQUITY_TABLES is not None and not params.get("dead_cards") and isinstance(hands, list):
+        class_ids = [class_id_from_str(h) for h in hands]
+        if class_ids and None not in class_ids:
+            table_result = EQUITY_TABLES.result(class_ids)
+            if table_result is not None:
+                return jsonify(dict(table_result, success=True, source="table"))
+
+    # Otherwise Monte Carlo in the job pool, answered from the job cache for repeated queries
+    try:
+        job_id, result = JOB_QUEUE.run("equity", params)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)})
+    result = dict(result, success=True, job_id=job_id, exact=False)
+    return jsonify(result)
+
+
+@app.route('/jobs/<string:job_type>', methods=['POST'])
+def submit_job_api(job_type):
+    """
+    Queues an "equity", "simulation" or "solve" job with the JSON body as its parameters
+    (as for /equity and /simulate; solve takes iterations, stack, small_blind, big_blind).
+    Returns the job's status; its id is a hash of the parameters, so resubmitting an
+    identical job returns the same id, already done when the result is cached.
+    """
+    try:
+        job = JOB_QUEUE.submit(job_type, request.get_json(silent=True) or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)})
+    return jsonify({"success": True, "job": job, "status_url": url_for('job_status_api', job_id=job["id"]),
+                    "result_url": url_for('job_result_api', job_id=job["id"])})
+
+
+@app.route('/jobs/<string:job_id>', methods=['GET'])
+def job_status_api(job_id):
+    job = JOB_QUEUE.status(job_id) if JOB_ID.match(job_id) else None
+    if job is None:
+        return jsonify({"success": False, "message": "Unknown job."}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@app.route('/jobs/<string:job_id>/result', methods=['GET'])
+def job_result_api(job_id):
+    job = JOB_QUEUE.status(job_id) if JOB_ID.match(job_id) else None
+    if job is None:
+        return jsonify({"success": False, "message": "Unknown job."}), 404
+    if job["status"] != "done":
+        return jsonify({"success": False, "job": job, "message": f"Job is {job['status']}."}), 202
+    return jsonify({"success": True, "job": job, "result": JOB_QUEUE.result(job_id)})
+
+
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats_api():
+    return jsonify({"success": True, "cache": JOB_QUEUE.cache.stats()})
+
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats_api():
+    """Hit rates of this worker's caches: hand evaluations, equity/simulation/solve job results and bot adaptation."""
+    stats = {"success": True, "evaluation": EVALUATION_CACHE.stats(), "jobs": JOB_QUEUE.cache.stats()}
+    if OPPONENT_MODEL is not None:
+        stats["opponent_model"] = OPPONENT_MODEL.stats()
+    return jsonify(stats)
+
+
+@app.route('/hand_history/stats', methods=['GET'])
+def hand_history_stats_api():
+    """Records this worker has written to (or dropped from) the hand history log."""
+    if HAND_HISTORY is None:
+        return jsonify({"success": False, "message": "Hand history is disabled."})
+    return jsonify({"success": True, "hand_history": HAND_HISTORY.stats()})
 
 
 if __name__ == '__main__':
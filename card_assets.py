@@ -0,0 +1,224 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+try:
+    from PIL import Image
+except ImportError: # Pillow is only needed to build the sprite atlas
+    Image = None
+
+from cards import CARD_STRS, NUM_CARDS, NUM_RANKS, NUM_SUITS
+
+# --- Card image index ---
+# static/card_images is scanned once into a case-insensitive index, and every
+# card id is resolved to its filename up front, so a card image lookup is a
+# list index instead of a round of os.path.exists probes. The directory's
+# mtime is checked at most every RESCAN_INTERVAL seconds and the index is
+# rebuilt when files were added, removed or renamed.
+
+CARD_IMAGE_DIR = os.path.join('static', 'card_images')
+BACK_IMAGE = "back.png"
+RESCAN_INTERVAL = 2.0 # seconds
+
+
+class CardImageIndex:
+    def __init__(self, directory=CARD_IMAGE_DIR, rescan_interval=RESCAN_INTERVAL):
+        self.directory = directory
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        self._files = {} # lowercase filename -> filename on disk
+        self._by_id = [None] * NUM_CARDS
+        self.generation = 0 # Bumped on every rescan, so cached views can tell the filenames changed
+        self.refresh(force=True)
+
+    def _directory_mtime(self):
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self, force=False):
+        """Rescans the directory if it changed (or force is set). Returns True if it was rescanned."""
+        mtime = self._directory_mtime()
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if not force and mtime == self._dir_mtime:
+                return False
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                names = []
+            self._files = {name.lower(): name for name in names}
+            self._by_id = [self._resolve(CARD_STRS[c]) for c in range(NUM_CARDS)]
+            self._dir_mtime = mtime
+            self.generation += 1
+            return True
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._checked_at >= self.rescan_interval:
+            self.refresh()
+
+    def _resolve(self, card_str):
+        # A file named rank + suit, in any case
+        rank_part = card_str[:-1]
+        suit_part = card_str[-1]
+        found = self._files.get(f"{rank_part}{suit_part}.png".lower())
+        if found:
+            return found
+        default_filename = f"{rank_part}{suit_part.lower()}.png" # Default to Rank + lowercase suit
+        print(f"[CARD_IMG_DEBUG] No image found for '{card_str}' in {self.directory}. Defaulting to '{default_filename}'")
+        return default_filename
+
+    def filename(self, card):
+        """Image filename of an integer card id."""
+        self._maybe_refresh()
+        return self._by_id[card]
+
+    def filename_for(self, card_str):
+        """Image filename of a card string ("9h", "AS", "10d"), or back.png if it isn't a card."""
+        if not card_str or len(card_str) < 2:
+            return BACK_IMAGE
+        self._maybe_refresh()
+        with self._lock:
+            return self._resolve(card_str)
+
+    def back_filename(self):
+        self._maybe_refresh()
+        return self._files.get(BACK_IMAGE, BACK_IMAGE)
+
+    def manifest(self):
+        """Card string -> filename for all 52 cards, the same list by card id, and the card back."""
+        self._maybe_refresh()
+        by_id = list(self._by_id)
+        return {
+            "cards": {CARD_STRS[c]: by_id[c] for c in range(NUM_CARDS)},
+            "by_id": by_id,
+            "back": self.back_filename()
+        }
+
+
+# --- Card sprite atlas ---
+# All 52 faces and the card back packed into one PNG (one row per suit, one
+# column per rank, the back at the start of the last row) plus a JSON map of
+# filename -> [x, y] pixel offsets. Both are written to static/sprites under
+# content-hashed names, so they can be served with immutable cache headers.
+# sprites/atlas.json points at the current build and records a signature of
+# the source images; the atlas is only rebuilt when that signature changes.
+
+SPRITE_DIR = os.path.join('static', 'sprites')
+SPRITE_POINTER = 'atlas.json'
+SPRITE_CARD_WIDTH = 120 # 2x the 60 x 84 cards in style.css
+SPRITE_CARD_HEIGHT = 168
+
+
+def _source_signature(index, card_width, card_height):
+    entries = [f"{card_width}x{card_height}"]
+    for name in index.manifest()["by_id"] + [index.back_filename()]:
+        try:
+            stat = os.stat(os.path.join(index.directory, name))
+            entries.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            entries.append(f"{name}:missing")
+    return hashlib.sha256("\n".join(entries).encode('utf-8')).hexdigest()[:16]
+
+
+def write_hashed(directory, stem, extension, data, hash_of=None):
+    """
+    Writes data to <stem>.<content hash>.<extension> in directory unless it's already there;
+    returns the filename. hash_of names the file after other bytes (a compressed copy after its source).
+    """
+    digest = hashlib.sha256(data if hash_of is None else hash_of).hexdigest()[:12]
+    name = f"{stem}.{digest}.{extension}"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return name
+
+
+def build_sprite_atlas(index, output_dir=SPRITE_DIR, card_width=SPRITE_CARD_WIDTH, card_height=SPRITE_CARD_HEIGHT):
+    """Packs the indexed card images into a hashed atlas PNG and coordinate map; returns the map."""
+    if Image is None:
+        raise RuntimeError("Pillow is required to build the card sprite atlas.")
+    os.makedirs(output_dir, exist_ok=True)
+    atlas = Image.new('RGBA', (NUM_RANKS * card_width, (NUM_SUITS + 1) * card_height))
+    positions = {}
+    cells = [(index.manifest()["by_id"][c], c >> 2, c & 3) for c in range(NUM_CARDS)]
+    cells.append((index.back_filename(), 0, NUM_SUITS))
+    for filename, column, row in cells:
+        x, y = column * card_width, row * card_height
+        try:
+            with Image.open(os.path.join(index.directory, filename)) as image:
+                atlas.paste(image.convert('RGBA').resize((card_width, card_height), Image.LANCZOS), (x, y))
+        except OSError:
+            print(f"[CARD_IMG_DEBUG] Could not read {filename} for the sprite atlas; leaving its cell empty")
+        positions[filename] = [x, y]
+
+    png = io.BytesIO()
+    atlas.save(png, 'PNG')
+    sprite_map = {
+        "image": write_hashed(output_dir, 'cards', 'png', png.getvalue()),
+        "width": atlas.width,
+        "height": atlas.height,
+        "card_width": card_width,
+        "card_height": card_height,
+        "files": positions
+    }
+    sprite_map["map"] = write_hashed(output_dir, 'cards', 'json', json.dumps(sprite_map, sort_keys=True).encode('utf-8'))
+    return sprite_map
+
+
+def load_sprite_atlas(index, output_dir=SPRITE_DIR, build=True):
+    """
+    The current atlas map, rebuilt first if the card images changed since the last build.
+    Returns None when there's no usable atlas (e.g. Pillow missing); the app then serves plain images.
+    """
+    signature = _source_signature(index, SPRITE_CARD_WIDTH, SPRITE_CARD_HEIGHT)
+    pointer_path = os.path.join(output_dir, SPRITE_POINTER)
+    try:
+        with open(pointer_path, 'r') as f:
+            pointer = json.load(f)
+        if pointer.get("signature") == signature:
+            with open(os.path.join(output_dir, pointer["map"]), 'r') as f:
+                sprite_map = json.load(f)
+            if os.path.exists(os.path.join(output_dir, sprite_map["image"])):
+                sprite_map["map"] = pointer["map"]
+                return sprite_map
+    except (OSError, ValueError, KeyError):
+        pass
+    if not build:
+        return None
+    try:
+        sprite_map = build_sprite_atlas(index, output_dir)
+        tmp_path = pointer_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"signature": signature, "map": sprite_map["map"]}, f)
+        os.replace(tmp_path, pointer_path)
+        print(f"Built card sprite atlas {sprite_map['image']}")
+        return sprite_map
+    except (OSError, RuntimeError) as e:
+        print(f"Card sprite atlas unavailable: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the card sprite atlas in static/sprites.")
+    parser.add_argument('--images', default=CARD_IMAGE_DIR)
+    parser.add_argument('--output', default=SPRITE_DIR)
+    args = parser.parse_args()
+    sprite_map = load_sprite_atlas(CardImageIndex(args.images), args.output)
+    if sprite_map is None:
+        raise SystemExit(1)
+    print(f"{args.output}: {sprite_map['image']} ({sprite_map['width']}x{sprite_map['height']}), {sprite_map['map']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# --- Card encoding ---
+# Cards are encoded as small integers 0-51: card = rank_index * 4 + suit_index,
+# where rank_index 0..12 maps to 2..A and suit_index follows SUIT_STRS.
+# Strings like "10h" / "Ah" are only needed at the JSON and image boundary.
+
+RANK_STRS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+SUIT_STRS = ['h', 'd', 'c', 's'] # hearts, diamonds, clubs, spades
+
+NUM_RANKS = 13
+NUM_SUITS = 4
+NUM_CARDS = 52
+
+_RANK_INDEX = {r: i for i, r in enumerate(RANK_STRS)}
+_RANK_INDEX['T'] = _RANK_INDEX['10'] # Accept "Th" as well as "10h"
+_SUIT_INDEX = {s: i for i, s in enumerate(SUIT_STRS)}
+
+# Precomputed int -> string table, the reverse of card_to_int
+CARD_STRS = [f"{RANK_STRS[c >> 2]}{SUIT_STRS[c & 3]}" for c in range(NUM_CARDS)]
+_CARD_INDEX = {s: i for i, s in enumerate(CARD_STRS)}
+
+
+def make_card(rank_idx, suit_idx):
+    return rank_idx * 4 + suit_idx
+
+
+def card_rank(card):
+    """Rank index 0..12 (2..A) of an integer card."""
+    return card >> 2
+
+
+def card_suit(card):
+    """Suit index 0..3 of an integer card."""
+    return card & 3
+
+
+def card_to_int(card):
+    """
+    Converts a card in any of the app's formats to its 0-51 integer code.
+    Accepts ints, strings ("Ah", "10s", "TD"), tuples (('A', 'h')) and dicts ({'rank': 'A', 'suit': 'h'}).
+    Returns None for anything that is not a valid card.
+    """
+    if isinstance(card, int):
+        return card if 0 <= card < NUM_CARDS else None
+    if isinstance(card, tuple):
+        card = f"{card[0]}{card[1]}"
+    elif isinstance(card, dict):
+        card = f"{card['rank']}{card['suit']}"
+    if not isinstance(card, str):
+        return None
+
+    code = _CARD_INDEX.get(card)
+    if code is not None:
+        return code
+    if len(card) < 2:
+        return None
+    rank_idx = _RANK_INDEX.get(card[:-1].upper())
+    suit_idx = _SUIT_INDEX.get(card[-1].lower())
+    if rank_idx is None or suit_idx is None:
+        return None
+    return make_card(rank_idx, suit_idx)
+
+
+def cards_to_ints(cards):
+    """Converts a list of cards to integer codes, or returns None if any card is invalid."""
+    codes = [card_to_int(c) for c in cards]
+    if any(c is None for c in codes):
+        return None
+    return codes
+
+
+def int_to_card(code):
+    """Converts a 0-51 integer code back to the app's string format, e.g. 34 -> "10c"."""
+    return CARD_STRS[code]
+
+
+def ints_to_cards(codes):
+    """Converts a list of integer codes to card strings, for JSON output and log messages."""
+    return [CARD_STRS[c] for c in codes]
+
+
+# --- Hand classes ---
+# The 169 canonical preflop classes use the same strings as format_hand_for_strategy:
+# higher rank first, "10" kept as-is, pairs without a suffix ("AA", "1010"),
+# otherwise 's' (suited) or 'o' (offsuit), e.g. "AKs", "K10o".
+
+def _split_ranks(text):
+    # Splits "K10" / "107" / "AK" / "KT" into rank indexes, or returns None
+    ranks = []
+    i = 0
+    while i < len(text):
+        token = text[i:i + 2] if text[i:i + 2] == '10' else text[i].upper()
+        rank_idx = _RANK_INDEX.get(token)
+        if rank_idx is None:
+            return None
+        ranks.append(rank_idx)
+        i += len(token)
+    return ranks
+
+
+def parse_hand_class(hand_class):
+    """
+    Parses a class string ("KJo", "A10s", "1010", "QQ", "KTo") into
+    (high_rank_idx, low_rank_idx, suited). Returns None if the string is not a class.
+    """
+    if not isinstance(hand_class, str) or len(hand_class) < 2:
+        return None
+    suffix = hand_class[-1].lower()
+    ranks = _split_ranks(hand_class[:-1] if suffix in ('s', 'o') else hand_class)
+    if not ranks or len(ranks) != 2:
+        return None
+    high, low = max(ranks), min(ranks)
+    if high == low:
+        if suffix in ('s', 'o'):
+            return None # Pairs can't be suited and offsuit is implied
+        return (high, low, False)
+    if suffix not in ('s', 'o'):
+        return None
+    return (high, low, suffix == 's')
+
+
+# Class ids follow the 13x13 starting-hand grid: pairs on the diagonal, suited
+# hands at 13 * high + low, offsuit hands at 13 * low + high.
+NUM_HAND_CLASSES = 169
+
+
+def hand_class_id(high_rank_idx, low_rank_idx, suited):
+    if suited or high_rank_idx == low_rank_idx:
+        return 13 * high_rank_idx + low_rank_idx
+    return 13 * low_rank_idx + high_rank_idx
+
+
+def hand_class_str(high_rank_idx, low_rank_idx, suited):
+    if high_rank_idx == low_rank_idx:
+        return f"{RANK_STRS[high_rank_idx]}{RANK_STRS[low_rank_idx]}"
+    return f"{RANK_STRS[high_rank_idx]}{RANK_STRS[low_rank_idx]}{'s' if suited else 'o'}"
+
+
+def _build_hand_classes():
+    names = [None] * NUM_HAND_CLASSES
+    for high in range(NUM_RANKS):
+        for low in range(high + 1):
+            for suited in ((False,) if high == low else (True, False)):
+                names[hand_class_id(high, low, suited)] = hand_class_str(high, low, suited)
+    return names
+
+
+HAND_CLASSES = _build_hand_classes() # class id -> class string, e.g. HAND_CLASSES[168] == "AA"
+HAND_CLASS_IDS = {name: i for i, name in enumerate(HAND_CLASSES)}
+
+
+# Precomputed (card1, card2) -> class id table, indexed card1 * 52 + card2
+COMBO_CLASS_IDS = [
+    hand_class_id(max(c1 >> 2, c2 >> 2), min(c1 >> 2, c2 >> 2), (c1 & 3) == (c2 & 3))
+    for c1 in range(NUM_CARDS) for c2 in range(NUM_CARDS)
+]
+
+
+def combo_class_id(card1, card2):
+    """Class id of two integer hole cards, e.g. (Ah, Kh) -> the id of "AKs"."""
+    return COMBO_CLASS_IDS[card1 * NUM_CARDS + card2]
+
+
+def class_id_from_str(hand_class):
+    """Class id for any accepted class spelling ("KTo", "K10o"), or None."""
+    parsed = parse_hand_class(hand_class)
+    if parsed is None:
+        return None
+    return hand_class_id(*parsed)
+
+
+def _range_token_class_ids(token):
+    # One range token: a class ("AKs", "QQ"), "22+" (that pair and every higher pair),
+    # "A2s+"/"K9o+" (raise the low rank up to just below the high rank) or "A2s-A5s"
+    if token.lower() in ('any', 'all', '100%'):
+        return list(range(NUM_HAND_CLASSES))
+    if '-' in token:
+        first, last = (parse_hand_class(part) for part in token.split('-', 1))
+        if first is None or last is None or first[2] != last[2] or (first[0] == first[1]) != (last[0] == last[1]):
+            return None
+        if first[0] == first[1]: # Pair span, e.g. "22-66"
+            low, high = sorted((first[0], last[0]))
+            return [hand_class_id(r, r, False) for r in range(low, high + 1)]
+        if first[0] != last[0]: # Kicker span must keep the high card, e.g. "A2s-A5s"
+            return None
+        low, high = sorted((first[1], last[1]))
+        return [hand_class_id(first[0], r, first[2]) for r in range(low, high + 1)]
+    plus = token.endswith('+')
+    parsed = parse_hand_class(token[:-1] if plus else token)
+    if parsed is None:
+        return None
+    high, low, suited = parsed
+    if not plus:
+        return [hand_class_id(high, low, suited)]
+    if high == low:
+        return [hand_class_id(r, r, False) for r in range(low, NUM_RANKS)]
+    return [hand_class_id(high, r, suited) for r in range(low, high)]
+
+
+def parse_range(spec):
+    """
+    Class ids of a hand range, given as a comma-separated string ("22+, A2s+, KTo+, 65s")
+    or a list of such tokens. Raises ValueError on tokens that aren't classes or spans.
+    """
+    tokens = spec.split(',') if isinstance(spec, str) else spec
+    if not isinstance(tokens, (list, tuple)):
+        raise ValueError(f"Invalid hand range: {spec!r}")
+    class_ids = set()
+    for token in tokens:
+        token = str(token).replace(' ', '')
+        if not token:
+            continue
+        ids = _range_token_class_ids(token)
+        if ids is None:
+            raise ValueError(f"Invalid hand range token: {token!r}")
+        class_ids.update(ids)
+    return sorted(class_ids)
+
+
+def hand_class_combos(hand_class):
+    """All (card1, card2) integer combos of a class: 6 for pairs, 4 suited, 12 offsuit."""
+    parsed = parse_hand_class(hand_class)
+    if parsed is None:
+        return None
+    high, low, suited = parsed
+    combos = []
+    for s1 in range(NUM_SUITS):
+        for s2 in range(NUM_SUITS):
+            if high == low and s2 <= s1:
+                continue
+            if high != low and (s1 == s2) != suited:
+                continue
+            combos.append((make_card(high, s1), make_card(low, s2)))
+    return combos
+
+
+def parse_hole_cards(spec):
+    """
+    Parses a player's hand given either as two specific cards (["Ah", "Kd"], "AhKd", "10s10c")
+    or as a hand class ("KJo"). Returns a list of possible (card1, card2) combos, or None.
+    """
+    if isinstance(spec, (list, tuple)) and len(spec) == 2:
+        codes = cards_to_ints(spec)
+        if codes is None or codes[0] == codes[1]:
+            return None
+        return [tuple(codes)]
+    if not isinstance(spec, str):
+        return None
+    text = spec.replace(' ', '')
+    # Two specific cards: try every split point, e.g. "AhKd", "10h9d", "Ah10d"
+    for split in (2, 3):
+        first, second = card_to_int(text[:split]), card_to_int(text[split:])
+        if first is not None and second is not None and len(text) in (4, 5, 6):
+            if first == second:
+                return None
+            return [(first, second)]
+    return hand_class_combos(text)
@@ -0,0 +1,74 @@
+import os
+import secrets
+
+import numpy as np
+
+from cards import NUM_CARDS
+from state_store import LRUCache
+from strategy import MAX_SEATS
+
+# --- Deal engine ---
+# Every session has its own deal seed, and its hands are numbered 0, 1, 2...
+# Deal i of a seed is fully determined by (seed, i): a shuffled deck (card
+# ints, see cards.py) and DRAWS_PER_DEAL uniform numbers that the game uses
+# for the stack depth and each bot's decision. Given the user's decisions,
+# the whole hand replays exactly.
+#
+# Deals are generated POOL_SIZE at a time with a counter-based Philox
+# generator keyed by (seed, i // POOL_SIZE). Any pool can be rebuilt
+# directly, without replaying the ones before it, in any worker process,
+# and sessions never share generator state. Recently used pools stay in an
+# in-process LRU, so dealing a hand is usually a cached array read.
+
+POOL_SIZE = 64 # Deals generated per batch
+DRAWS_PER_DEAL = MAX_SEATS + 1 # One per seat's decision, plus the stack depth
+DEFAULT_CACHE_SIZE = 1024 # Pools kept per process (about 8 KiB each)
+STACK_DRAW = MAX_SEATS # Index of the stack-depth draw in a deal's draws
+
+
+def new_deal_seed():
+    """A fresh session seed; DEAL_SEED in the environment fixes it (debugging, demos)."""
+    fixed = os.environ.get('DEAL_SEED')
+    return int(fixed) if fixed else secrets.randbits(63)
+
+
+def deal_pool(seed, pool_index, pool_size=POOL_SIZE):
+    """(decks uint8[pool_size, 52], draws float64[pool_size, DRAWS_PER_DEAL]) of one pool of a seed."""
+    generator = np.random.Generator(np.random.Philox(key=[seed, pool_index]))
+    decks = generator.permuted(np.tile(np.arange(NUM_CARDS, dtype=np.uint8), (pool_size, 1)), axis=1)
+    draws = generator.random((pool_size, DRAWS_PER_DEAL))
+    return decks, draws
+
+
+class DealEngine:
+    """Deals by (seed, index) from cached, pre-generated pools."""
+
+    def __init__(self, pool_size=POOL_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+        self.pool_size = pool_size
+        self._pools = LRUCache(cache_size) # (seed, pool index) -> deal_pool()
+
+    def _pool(self, seed, pool_index):
+        key = (seed, pool_index)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = deal_pool(seed, pool_index, self.pool_size)
+            self._pools.put(key, pool)
+        return pool
+
+    def deck(self, seed, index):
+        """The shuffled deck of deal index, as a list of card ints."""
+        decks, _ = self._pool(seed, index // self.pool_size)
+        return decks[index % self.pool_size].tolist()
+
+    def draws(self, seed, index):
+        """The uniform draws of deal index: one per seat's decision, then the stack depth (STACK_DRAW)."""
+        _, draws = self._pool(seed, index // self.pool_size)
+        return draws[index % self.pool_size]
+
+    def deal(self, seed, index, num_seats):
+        """(hole cards per seat, 5-card board) of deal index at an N-handed table."""
+        deck = self.deck(seed, index)
+        return [deck[2 * i:2 * i + 2] for i in range(num_seats)], deck[2 * num_seats:2 * num_seats + 5]
+
+
+DEAL_ENGINE = DealEngine()
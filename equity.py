@@ -0,0 +1,208 @@
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from cards import HAND_CLASSES, NUM_CARDS, cards_to_ints, combo_class_id, ints_to_cards, parse_hole_cards
+from isomorphism import canonical_groups
+from poker_evaluator import evaluate_batch
+
+# --- Monte Carlo all-in equity ---
+# Every showdown in push/fold is an all-in: equity is decided by the 5 board
+# cards alone. Runouts are dealt as NumPy batches (random keys per card with
+# the used cards masked out, then the 5 smallest keys form the board) and
+# evaluated with evaluate_batch. Players may be given as specific cards or as
+# hand classes; class players get a random combo per trial, with rows whose
+# combos collide thrown away, which keeps the joint deal uniform.
+#
+# With processes > 1 every worker runs its own job until its local standard
+# error drops below tolerance * sqrt(processes), so the pooled estimate lands
+# at roughly the requested tolerance and wall time scales with core count.
+
+DEFAULT_TOLERANCE = 0.002
+DEFAULT_BATCH_SIZE = 20000
+DEFAULT_MAX_TRIALS = 2000000
+MAX_EMPTY_BATCHES = 20 # Give up if this many batches in a row produce no valid deal
+
+
+def parse_players(hands, dead_cards=None):
+    """
+    Validates the equity inputs.
+    hands: 2-4 entries, each two cards (["Ah", "Kd"] / "AhKd") or a hand class ("KJo").
+    Returns (list of combo arrays, dead card list, indices of the players given specific cards).
+    Raises ValueError on bad input.
+    """
+    if not 2 <= len(hands) <= 4:
+        raise ValueError("Equity needs between 2 and 4 hands.")
+    dead = cards_to_ints(dead_cards or [])
+    if dead is None:
+        raise ValueError(f"Invalid dead cards: {dead_cards}")
+    if len(set(dead)) != len(dead):
+        raise ValueError("Dead cards contain duplicates.")
+
+    player_combos = []
+    fixed = []
+    for i, spec in enumerate(hands):
+        combos = parse_hole_cards(spec)
+        if not combos:
+            raise ValueError(f"Invalid hand: {spec}")
+        if len(combos) == 1: # Specific cards; a class always has several combos before dead-card removal
+            fixed.append(i)
+        # Combos that use a dead card can never be dealt
+        combos = [c for c in combos if c[0] not in dead and c[1] not in dead]
+        if not combos:
+            raise ValueError(f"Hand {spec} is blocked by the dead cards.")
+        player_combos.append(np.array(combos, dtype=np.int64))
+
+    # Only hands given as specific cards can conflict outright; classes are dealt around each other
+    fixed_cards = [int(c) for i in fixed for c in player_combos[i][0]]
+    if len(set(fixed_cards)) != len(fixed_cards):
+        raise ValueError("The same card was given to more than one player.")
+    return player_combos, dead, fixed
+
+
+def canonical_matchup(hands, dead_cards=None):
+    """
+    Suit-isomorphic representative of an equity query: (hand specs, dead card strings)
+    with the specific-card hands and dead cards relabelled together (see isomorphism.py)
+    and hand classes in their standard spelling. Equities are the same for every query
+    with the same representative, player order included. Raises ValueError like parse_players.
+    """
+    player_combos, dead, fixed = parse_players(hands, dead_cards)
+    groups = canonical_groups([[int(c) for c in player_combos[i][0]] for i in fixed] + [dead])
+    specs = [HAND_CLASSES[combo_class_id(*map(int, combos[0]))] for combos in player_combos]
+    for i, cards in zip(fixed, groups):
+        specs[i] = "".join(ints_to_cards(cards))
+    return specs, ints_to_cards(groups[-1])
+
+
+def _deal_batch(rng, player_combos, dead, batch_size):
+    """Returns (hole cards (P, B, 2), boards (B, 5)) for the valid rows of one batch."""
+    holes = []
+    used = np.zeros(batch_size, dtype=np.uint64)
+    valid = np.ones(batch_size, dtype=bool)
+    one = np.uint64(1)
+    for combos in player_combos:
+        if len(combos) == 1:
+            hole = np.broadcast_to(combos[0], (batch_size, 2))
+        else:
+            hole = combos[rng.integers(0, len(combos), size=batch_size)]
+        bits = (one << hole[:, 0].astype(np.uint64)) | (one << hole[:, 1].astype(np.uint64))
+        valid &= (used & bits) == 0
+        used |= bits
+        holes.append(hole)
+
+    rows = np.flatnonzero(valid)
+    holes = np.stack([h[rows] for h in holes])
+
+    keys = rng.random((rows.size, NUM_CARDS))
+    row_idx = np.arange(rows.size)[:, None]
+    for hole in holes:
+        keys[row_idx, hole] = 2.0
+    if dead:
+        keys[:, dead] = 2.0
+    boards = np.argpartition(keys, 5, axis=1)[:, :5]
+    return holes, boards
+
+
+def _showdown(holes, boards):
+    """Per-player win flags, tie flags and equity shares for each dealt runout."""
+    strengths = np.stack([evaluate_batch(np.concatenate([hole, boards], axis=1)) for hole in holes])
+    best = strengths.max(axis=0)
+    is_best = strengths == best
+    num_best = is_best.sum(axis=0)
+    wins = is_best & (num_best == 1)
+    ties = is_best & (num_best > 1)
+    shares = is_best / num_best
+    return wins, ties, shares
+
+
+def _run_job(player_combos, dead, tolerance, max_trials, batch_size, seed):
+    """
+    Samples runouts until every player's equity standard error is below tolerance
+    (or max_trials is reached). Returns summed statistics so jobs can be pooled.
+    """
+    rng = np.random.default_rng(seed)
+    num_players = len(player_combos)
+    trials = 0
+    wins = np.zeros(num_players)
+    ties = np.zeros(num_players)
+    share_sum = np.zeros(num_players)
+    share_sq_sum = np.zeros(num_players)
+    empty_batches = 0
+
+    while trials < max_trials:
+        holes, boards = _deal_batch(rng, player_combos, dead, min(batch_size, max_trials - trials))
+        if not len(boards):
+            empty_batches += 1
+            if empty_batches >= MAX_EMPTY_BATCHES:
+                raise ValueError("These hands can't be dealt together (card removal leaves no valid deal).")
+            continue
+        empty_batches = 0
+        batch_wins, batch_ties, shares = _showdown(holes, boards)
+        trials += len(boards)
+        wins += batch_wins.sum(axis=1)
+        ties += batch_ties.sum(axis=1)
+        share_sum += shares.sum(axis=1)
+        share_sq_sum += (shares * shares).sum(axis=1)
+        if _std_error(trials, share_sum, share_sq_sum).max() < tolerance:
+            break
+
+    return {
+        "trials": trials, "wins": wins, "ties": ties,
+        "share_sum": share_sum, "share_sq_sum": share_sq_sum
+    }
+
+
+def _run_job_star(args):
+    return _run_job(*args)
+
+
+def _std_error(trials, share_sum, share_sq_sum):
+    if trials < 2:
+        return np.full(len(share_sum), np.inf)
+    mean = share_sum / trials
+    variance = np.maximum(share_sq_sum / trials - mean * mean, 0.0)
+    return np.sqrt(variance / trials)
+
+
+def calculate_equity(hands, dead_cards=None, tolerance=DEFAULT_TOLERANCE, max_trials=DEFAULT_MAX_TRIALS,
+                     batch_size=DEFAULT_BATCH_SIZE, processes=None, seed=None):
+    """
+    Monte Carlo all-in equity for 2-4 hands.
+    hands: specific cards (["Ah", "Kd"] or "AhKd") or hand classes ("KJo", "1010").
+    dead_cards: cards removed from the deck.
+    tolerance: target standard error of every player's equity.
+    processes: worker processes to spread the sampling over (None = all cores, 1 = in-process).
+    Returns {"equity", "win", "tie", "std_error", "trials"}; per-player lists are fractions of 1.
+    """
+    player_combos, dead, _ = parse_players(hands, dead_cards)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, int(processes))
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+
+    if processes == 1:
+        results = [_run_job(player_combos, dead, tolerance, max_trials, batch_size, seeds[0])]
+    else:
+        # Each worker only needs to reach tolerance * sqrt(n): n equal, independent
+        # samples pooled together shrink the standard error by sqrt(n).
+        job_tolerance = tolerance * math.sqrt(processes)
+        job_trials = max(1, max_trials // processes)
+        jobs = [(player_combos, dead, job_tolerance, job_trials, batch_size, s) for s in seeds]
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_run_job_star, jobs)
+
+    trials = sum(r["trials"] for r in results)
+    wins = sum(r["wins"] for r in results)
+    ties = sum(r["ties"] for r in results)
+    share_sum = sum(r["share_sum"] for r in results)
+    share_sq_sum = sum(r["share_sq_sum"] for r in results)
+    return {
+        "equity": (share_sum / trials).tolist(),
+        "win": (wins / trials).tolist(),
+        "tie": (ties / trials).tolist(),
+        "std_error": _std_error(trials, share_sum, share_sq_sum).tolist(),
+        "trials": int(trials)
+    }
@@ -0,0 +1,323 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from cards import HAND_CLASSES, NUM_CARDS, NUM_HAND_CLASSES, hand_class_combos
+from isomorphism import canonical_groups
+from poker_evaluator import board_features, evaluate_batch, evaluate_on_boards
+
+# --- Precomputed class-vs-class equity tables ---
+# Build step (python equity_tables.py) that writes every preflop class matchup
+# into one binary file the app opens with np.memmap, so an equity query at
+# request time is an array lookup. Layout after a fixed 64-byte header:
+#   hu_equity  float32[169, 169]       equity of class i vs class j (ties count half)
+#   hu_win     float32[169, 169]       outright win rate of class i vs class j
+#   hu_combos  uint16[169, 169]        non-conflicting combo pairs (card-removal weight)
+#   three_way  float16[169, 169, 169]  equity of class i vs classes j and k (optional)
+#
+# Heads-up entries are exact: every combo pair of the two classes is reduced
+# to its suit-isomorphic representative, and each representative is run over
+# all C(48, 5) boards. Three-way entries are sampled (a full enumeration is
+# out of reach), with the number of deals per class triple set at build time.
+# Four-way matchups would need 169^4 entries and are left to the Monte Carlo
+# engine in equity.py.
+#
+# The repository ships the exact heads-up tables only (built with
+# --three-way-samples 0, about 280 KB): the solver, the exploitability report
+# and bot adaptation work from a fresh checkout. The sampled three-way table
+# adds about 10 MB and hours of build time; without it the solver
+# approximates three-way pots from the heads-up tables and /equity answers
+# 3- and 4-way queries by Monte Carlo.
+
+DEFAULT_PATH = os.path.join('static', 'equity_tables.bin')
+MAGIC = b'PFEQTBL1'
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('num_classes', '<u4'), ('has_three_way', '<u4'),
+    ('board_samples', '<u4'), ('three_way_samples', '<u4'), ('reserved', 'S36')
+])
+VERSION = 1
+
+def heads_up_groups(class_a, class_b):
+    """
+    Groups the non-conflicting combo pairs of two classes by suit isomorphism.
+    Returns {representative ((a1, a2), (b1, b2)): number of combo pairs it stands for}.
+    """
+    groups = {}
+    for hand_a in hand_class_combos(HAND_CLASSES[class_a]):
+        for hand_b in hand_class_combos(HAND_CLASSES[class_b]):
+            if set(hand_a) & set(hand_b):
+                continue
+            key = canonical_groups((hand_a, hand_b))
+            groups[key] = groups.get(key, 0) + 1
+    return groups
+
+
+# --- Board set shared by the heads-up workers (built once per process) ---
+_BOARDS = None
+
+
+def _init_boards(board_samples, seed):
+    global _BOARDS
+    boards = np.array(list(itertools.combinations(range(NUM_CARDS), 5)), dtype=np.uint8)
+    if board_samples:
+        rng = np.random.default_rng(seed)
+        boards = boards[np.sort(rng.choice(len(boards), size=board_samples, replace=False))]
+    bits = np.zeros(len(boards), dtype=np.uint64)
+    for j in range(5):
+        bits |= np.left_shift(np.uint64(1), boards[:, j].astype(np.uint64))
+    totals, suit_masks = board_features(boards)
+    _BOARDS = (bits, totals, suit_masks)
+
+
+def _heads_up_pair(pair):
+    """Worker: exact (or board-sampled) equity of one unordered class pair."""
+    class_a, class_b = pair
+    bits, totals, suit_masks = _BOARDS
+    equity_a = win_a = win_b = 0.0
+    weight = 0
+    for (hand_a, hand_b), count in heads_up_groups(class_a, class_b).items():
+        hole_bits = np.uint64(0)
+        for c in hand_a + hand_b:
+            hole_bits |= np.uint64(1 << c)
+        rows = np.flatnonzero((bits & hole_bits) == 0)
+        board_totals, board_masks = totals[rows], suit_masks[rows]
+        strength_a = evaluate_on_boards(hand_a, board_totals, board_masks)
+        strength_b = evaluate_on_boards(hand_b, board_totals, board_masks)
+        wins_a = np.count_nonzero(strength_a > strength_b)
+        wins_b = np.count_nonzero(strength_a < strength_b)
+        ties = len(rows) - wins_a - wins_b
+        equity_a += count * (wins_a + 0.5 * ties) / len(rows)
+        win_a += count * wins_a / len(rows)
+        win_b += count * wins_b / len(rows)
+        weight += count
+    if not weight:
+        return class_a, class_b, np.nan, np.nan, np.nan, 0
+    return class_a, class_b, equity_a / weight, win_a / weight, win_b / weight, weight
+
+
+def build_heads_up(processes=None, board_samples=0, seed=0, progress=True):
+    """Returns (hu_equity, hu_win, hu_combos) for all 169 x 169 class matchups."""
+    hu_equity = np.full((NUM_HAND_CLASSES, NUM_HAND_CLASSES), np.nan, dtype=np.float32)
+    hu_win = np.full((NUM_HAND_CLASSES, NUM_HAND_CLASSES), np.nan, dtype=np.float32)
+    hu_combos = np.zeros((NUM_HAND_CLASSES, NUM_HAND_CLASSES), dtype=np.uint16)
+    pairs = [(a, b) for a in range(NUM_HAND_CLASSES) for b in range(a, NUM_HAND_CLASSES)]
+
+    _init_boards(board_samples, seed)
+    started = time.time()
+    # Workers are forked after the board set is built, so they share it copy-on-write
+    with multiprocessing.Pool(processes) as pool:
+        for done, (a, b, equity_a, win_a, win_b, weight) in enumerate(pool.imap_unordered(_heads_up_pair, pairs, chunksize=4), 1):
+            hu_equity[a, b], hu_equity[b, a] = equity_a, 1.0 - equity_a
+            hu_win[a, b], hu_win[b, a] = win_a, win_b
+            hu_combos[a, b] = hu_combos[b, a] = weight
+            if progress and done % 500 == 0:
+                print(f"Heads-up: {done}/{len(pairs)} class pairs ({time.time() - started:.0f}s)")
+    return hu_equity, hu_win, hu_combos
+
+
+# --- Sampled three-way table ---
+_COMBO_TABLE = None # (169, 12, 2) combos per class, padded by repetition
+_COMBO_COUNTS = None
+
+
+def _combo_table():
+    global _COMBO_TABLE, _COMBO_COUNTS
+    if _COMBO_TABLE is None:
+        _COMBO_TABLE = np.zeros((NUM_HAND_CLASSES, 12, 2), dtype=np.int64)
+        _COMBO_COUNTS = np.zeros(NUM_HAND_CLASSES, dtype=np.int64)
+        for class_id, name in enumerate(HAND_CLASSES):
+            combos = hand_class_combos(name)
+            _COMBO_COUNTS[class_id] = len(combos)
+            for k in range(12):
+                _COMBO_TABLE[class_id, k] = combos[k % len(combos)]
+    return _COMBO_TABLE, _COMBO_COUNTS
+
+
+def _three_way_chunk(args):
+    """Worker: sampled equities for a chunk of unordered class triples, shape (T, 3)."""
+    triples, samples, seed = args
+    rng = np.random.default_rng(seed)
+    combo_table, combo_counts = _combo_table()
+    num_triples = len(triples)
+    owner = np.repeat(np.arange(num_triples), samples)
+    rows = len(owner)
+
+    used = np.zeros(rows, dtype=np.uint64)
+    valid = np.ones(rows, dtype=bool)
+    holes = []
+    one = np.uint64(1)
+    for p in range(3):
+        classes = triples[owner, p]
+        picks = (rng.random(rows) * combo_counts[classes]).astype(np.int64)
+        hole = combo_table[classes, picks]
+        bits = (one << hole[:, 0].astype(np.uint64)) | (one << hole[:, 1].astype(np.uint64))
+        valid &= (used & bits) == 0
+        used |= bits
+        holes.append(hole)
+
+    # Boards by rejection: 5 uniform draws, dropped if they repeat or hit a hole card
+    boards = rng.integers(0, NUM_CARDS, size=(rows, 5))
+    board_bits = np.zeros(rows, dtype=np.uint64)
+    for j in range(5):
+        card_bits = one << boards[:, j].astype(np.uint64)
+        valid &= (board_bits & card_bits) == 0
+        board_bits |= card_bits
+    valid &= (board_bits & used) == 0
+
+    keep = np.flatnonzero(valid)
+    strengths = np.stack([evaluate_batch(np.concatenate([hole[keep], boards[keep]], axis=1)) for hole in holes])
+    is_best = strengths == strengths.max(axis=0)
+    shares = is_best / is_best.sum(axis=0)
+
+    counts = np.bincount(owner[keep], minlength=num_triples)
+    equities = np.stack([np.bincount(owner[keep], weights=shares[p], minlength=num_triples) for p in range(3)], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return triples, equities / counts[:, None]
+
+
+def build_three_way(samples, processes=None, chunk_triples=500, seed=0, progress=True):
+    """Sampled float16[169, 169, 169] table: equity of class i against classes j and k."""
+    triples = np.array(list(itertools.combinations_with_replacement(range(NUM_HAND_CLASSES), 3)), dtype=np.int64)
+    seeds = np.random.SeedSequence(seed).spawn((len(triples) + chunk_triples - 1) // chunk_triples)
+    jobs = [(triples[i:i + chunk_triples], samples, seeds[n]) for n, i in enumerate(range(0, len(triples), chunk_triples))]
+
+    totals = np.zeros((NUM_HAND_CLASSES,) * 3, dtype=np.float32)
+    counts = np.zeros((NUM_HAND_CLASSES,) * 3, dtype=np.uint8)
+    started = time.time()
+    with multiprocessing.Pool(processes) as pool:
+        for done, (chunk, equities) in enumerate(pool.imap_unordered(_three_way_chunk, jobs), 1):
+            # Every player's equity fills "its class vs the other two" in both orders,
+            # and duplicate classes in a triple are averaged through the counts.
+            for p, (q, r) in ((0, (1, 2)), (1, (0, 2)), (2, (0, 1))):
+                for a, b in ((q, r), (r, q)):
+                    index = (chunk[:, p], chunk[:, a], chunk[:, b])
+                    np.add.at(totals, index, np.nan_to_num(equities[:, p], nan=0.0))
+                    np.add.at(counts, index, ~np.isnan(equities[:, p]))
+            if progress and done % 100 == 0:
+                print(f"Three-way: {done}/{len(jobs)} chunks ({time.time() - started:.0f}s)")
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (totals / counts).astype(np.float16)
+
+
+def write_equity_tables(path, hu_equity, hu_win, hu_combos, three_way=None, board_samples=0, three_way_samples=0):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['num_classes'] = NUM_HAND_CLASSES
+    header['has_three_way'] = 1 if three_way is not None else 0
+    header['board_samples'] = board_samples
+    header['three_way_samples'] = three_way_samples
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+        for array, dtype in ((hu_equity, '<f4'), (hu_win, '<f4'), (hu_combos, '<u2')):
+            f.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        if three_way is not None:
+            f.write(np.ascontiguousarray(three_way, dtype='<f2').tobytes())
+    os.replace(tmp_path, path) # Readers never see a half-written file
+
+
+class EquityTables:
+    """Read-only, memory-mapped view of a file written by write_equity_tables."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} equity table file.")
+        n = int(header['num_classes'])
+        self.path = path
+        self.exact = int(header['board_samples']) == 0
+        offset = HEADER_SIZE
+        self.hu_equity = np.memmap(path, dtype='<f4', mode='r', offset=offset, shape=(n, n))
+        offset += 4 * n * n
+        self.hu_win = np.memmap(path, dtype='<f4', mode='r', offset=offset, shape=(n, n))
+        offset += 4 * n * n
+        self.hu_combos = np.memmap(path, dtype='<u2', mode='r', offset=offset, shape=(n, n))
+        offset += 2 * n * n
+        self.three_way = None
+        if header['has_three_way']:
+            self.three_way = np.memmap(path, dtype='<f2', mode='r', offset=offset, shape=(n, n, n))
+
+    def equity(self, class_ids):
+        """
+        Per-player equity for 2 (or, if built, 3) class ids, or None if the matchup
+        isn't covered (4 players, or the classes can't be dealt together).
+        """
+        if len(class_ids) == 2:
+            a, b = class_ids
+            values = [float(self.hu_equity[a, b]), float(self.hu_equity[b, a])]
+        elif len(class_ids) == 3 and self.three_way is not None:
+            a, b, c = class_ids
+            values = [float(self.three_way[a, b, c]), float(self.three_way[b, a, c]), float(self.three_way[c, a, b])]
+        else:
+            return None
+        if any(np.isnan(v) for v in values):
+            return None
+        return values
+
+    def result(self, class_ids):
+        """
+        equity() in the shape of equity.calculate_equity's result (win, tie and std_error
+        per player, rounded to 6 places), or None if the matchup isn't covered. Only heads-up
+        entries have win and tie rates; the sampled three-way entries leave them None.
+        """
+        values = self.equity(class_ids)
+        if values is None:
+            return None
+        exact = self.exact and len(class_ids) == 2
+        result = {"equity": [float(round(v, 6)) for v in values], "win": None, "tie": None,
+                  "std_error": [0.0] * len(values) if exact else None, "trials": None, "exact": exact}
+        if len(class_ids) == 2:
+            a, b = class_ids
+            wins = [float(self.hu_win[a, b]), float(self.hu_win[b, a])]
+            result["win"] = [float(round(w, 6)) for w in wins]
+            tie = float(round(max(2.0 * (values[0] - wins[0]), 0.0), 6))
+            result["tie"] = [tie, tie]
+        return result
+
+    def heads_up(self, class_a, class_b):
+        """(equity, win, tie) of class_a against class_b."""
+        equity = float(self.hu_equity[class_a, class_b])
+        win = float(self.hu_win[class_a, class_b])
+        return equity, win, 2.0 * (equity - win)
+
+
+def load_equity_tables(path=DEFAULT_PATH):
+    """Opens the precomputed tables if they have been built, otherwise returns None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return EquityTables(path)
+    except (ValueError, OSError) as e:
+        print(f"Error loading equity tables from {path}: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed preflop class equity tables.")
+    parser.add_argument('--output', default=DEFAULT_PATH)
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--board-samples', type=int, default=0,
+                        help="Use a fixed random subset of boards instead of all of them (quick, approximate builds)")
+    parser.add_argument('--three-way-samples', type=int, default=1000,
+                        help="Deals sampled per three-way class triple (0 skips the three-way table)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.time()
+    hu_equity, hu_win, hu_combos = build_heads_up(args.processes, args.board_samples, args.seed)
+    three_way = None
+    if args.three_way_samples:
+        three_way = build_three_way(args.three_way_samples, args.processes, seed=args.seed)
+    write_equity_tables(args.output, hu_equity, hu_win, hu_combos, three_way,
+                        args.board_samples, args.three_way_samples)
+    print(f"Wrote {args.output} in {time.time() - started:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import json
+import threading
+
+# --- Server-Sent Events helpers ---
+# /events streams a session's view to the browser over one long-lived
+# connection: a full "snapshot" first, then a "delta" with only the changed
+# top-level view fields (decisions, pot, revealed cards, winner, ...) each
+# time the state version moves. Routes that save a state call
+# StateNotifier.notify, which wakes that session's streams in this process
+# at once; streams held by other worker processes notice the new version on
+# their next poll of the state store.
+
+
+def format_sse(event, data, event_id=None):
+    """One SSE message; data is JSON-encoded on a single line."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def view_delta(previous, current):
+    """Top-level view fields that changed (or were removed, as None) between two views."""
+    changes = {key: value for key, value in current.items() if previous.get(key) != value}
+    for key in previous:
+        if key not in current:
+            changes[key] = None
+    return changes
+
+
+class StateNotifier:
+    """Wakes the event streams of a session when its state is saved in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {} # session id -> set of threading.Event
+
+    def subscribe(self, session_id):
+        event = threading.Event()
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, session_id, event):
+        with self._lock:
+            subscribers = self._subscribers.get(session_id)
+            if subscribers is not None:
+                subscribers.discard(event)
+                if not subscribers:
+                    del self._subscribers[session_id]
+
+    def notify(self, session_id):
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, ()))
+        for event in subscribers:
+            event.set()
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
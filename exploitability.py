@@ -0,0 +1,121 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from equity_tables import DEFAULT_PATH as EQUITY_TABLES_PATH, load_equity_tables
+from game import BIG_BLIND, SMALL_BLIND, STARTING_STACK
+from simulator import push_table
+from solver import PushFoldSolver
+from strategy import (
+    COMPILED_PATH, JSON_PATH, NUM_SEATS, StrategyTable, get_strategy_table, infoset_id, num_seats_for,
+    seat_positions, walk_infoset
+)
+
+# --- Exploitability ---
+# For each seat, the best response to the other seats' strategies and
+# what it gains over the seat's own strategy. The counterfactual values come
+# from the solver's class-vector arithmetic (PushFoldSolver.profile_values),
+# so a seat's push and fold values for every infoset are a few 169-vector
+# products over the class-vs-class equity tables; the best response picks the
+# better action per infoset and class. The sum of the seats' gains (NashConv)
+# is 0 at an equilibrium and is reported in milli big blinds per hand.
+# Mixing in a pure best response can only be as good as it, so a seat's gain
+# is never negative.
+
+
+def seat_action_values(solver, strategy, seat):
+    """{infoset id: (push value, fold value)} vectors over seat's classes, for every decision of seat."""
+    return {infoset_id(seat, mask): values for mask, values in solver.action_values(strategy, seat).items()}
+
+
+def best_response(solver, strategy, seat):
+    """
+    Best response of one seat against strategy (float[2^N - 1, 169] push probabilities).
+    Returns (push indicator rows {infoset id: float[169]}, seat EV, best-response EV), EVs in BB/hand.
+    """
+    walk = walk_infoset(solver.num_seats)
+    rows = {}
+    ev = best_ev = 0.0
+    for info, (push_value, fold_value) in seat_action_values(solver, strategy, seat).items():
+        sigma = strategy[info]
+        ev += solver.prior @ (sigma * push_value + (1.0 - sigma) * fold_value)
+        if info == walk: # Forced all in, not a decision
+            rows[info] = np.ones_like(push_value)
+            best_ev += solver.prior @ push_value
+            continue
+        rows[info] = (push_value > fold_value).astype(np.float64)
+        best_ev += solver.prior @ np.maximum(push_value, fold_value)
+    return rows, float(ev), float(best_ev)
+
+
+def exploitability(strategy=None, tables=None, stack=STARTING_STACK, small_blind=SMALL_BLIND, big_blind=BIG_BLIND,
+                   solver=None):
+    """
+    Best-response report for a StrategyTable (default: the loaded one) or a float[2^N - 1, 169]
+    push array: per position its EV, best-response EV and gain, plus the total (NashConv)
+    and per-seat average, gains in mBB/hand.
+    """
+    if strategy is None or isinstance(strategy, StrategyTable):
+        strategy = push_table(strategy)
+    num_seats = num_seats_for(len(strategy))
+    if solver is None:
+        if tables is None:
+            tables = load_equity_tables()
+        if tables is None:
+            raise ValueError("Exploitability needs the equity tables; build them with: python equity_tables.py")
+        solver = PushFoldSolver(tables, stack, small_blind, big_blind, num_seats)
+    if solver.num_seats != num_seats:
+        raise ValueError(f"A {num_seats}-seat strategy can't be evaluated by a {solver.num_seats}-seat solver.")
+
+    positions = {}
+    total = 0.0
+    for seat, position in enumerate(seat_positions(num_seats)):
+        _, ev, best_ev = best_response(solver, strategy, seat)
+        gain = max(best_ev - ev, 0.0) * 1000.0
+        total += gain
+        positions[position] = {"ev_bb": ev, "best_response_ev_bb": best_ev, "gain_mbb": gain}
+    return {
+        "positions": positions,
+        "exploitability_mbb": total,
+        "average_gain_mbb": total / num_seats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Best-response exploitability of a push/fold strategy.")
+    parser.add_argument('--strategy', default=None,
+                        help=f"aggregated_results .json or compiled .npy (default: {COMPILED_PATH}, or {JSON_PATH} if newer)")
+    parser.add_argument('--seats', type=int, default=NUM_SEATS,
+                        help="Table size, 2-9; without --strategy, its strategy from strategy.strategy_paths")
+    parser.add_argument('--tables', default=EQUITY_TABLES_PATH)
+    parser.add_argument('--stack', type=float, default=STARTING_STACK)
+    parser.add_argument('--max-mbb', type=float, default=None,
+                        help="Exit with status 1 when the total exploitability exceeds this (deployment gate)")
+    args = parser.parse_args()
+
+    tables = load_equity_tables(args.tables)
+    if tables is None:
+        raise SystemExit(f"Equity tables not found at {args.tables}; build them with: python equity_tables.py")
+    if args.strategy is None:
+        try:
+            table = get_strategy_table(args.seats)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    elif args.strategy.endswith('.npy'):
+        table = StrategyTable.load(args.strategy)
+    else:
+        table = StrategyTable.from_json(args.strategy, args.seats)
+
+    started = time.time()
+    report = exploitability(table, tables, stack=args.stack)
+    report["seconds"] = round(time.time() - started, 2)
+    print(json.dumps(report, indent=2))
+    if args.max_mbb is not None and report["exploitability_mbb"] > args.max_mbb:
+        print(f"Exploitability {report['exploitability_mbb']:.1f} mBB/hand exceeds {args.max_mbb}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,538 @@
+import os
+
+from cards import CARD_STRS, HAND_CLASSES, HAND_CLASS_IDS, cards_to_ints, combo_class_id, ints_to_cards
+from deals import DEAL_ENGINE, STACK_DRAW, new_deal_seed
+from opponent_model import load_opponent_model
+from poker_evaluator import PokerEvaluator, evaluate_cards, strength_category
+from strategy import (
+    INFOSET_ID_TABLE, NUM_SEATS, STRATEGY_GRID, get_strategy_table, infoset_name, prior_mask, seat_positions
+)
+
+# --- Game engine ---
+# The hand lifecycle (deal, blinds, bot decisions, the user's decision and the
+# showdown) as plain functions over the game-state dict. Nothing here touches
+# the Flask session or builds responses, so the routes in app.py are thin
+# wrappers and the same rules can be driven headlessly (see simulator.py).
+#
+# Cards in the state are 0-51 integers (see cards.py) and hands are looked up
+# by class id and infoset id; card strings are only built for log messages
+# and at the JSON/image boundary in app.py.
+#
+# Every random choice of a hand (the deck, the stack depth, each bot's
+# decision) comes from the session's deal seed and the hand's deal index
+# (see deals.py), so a hand can be regenerated from the two.
+#
+# The table is 4-handed (CO, BTN, SB, BB) unless GAME_NUM_SEATS says otherwise
+# (2-9, positions from strategy.seat_positions); the bots then play that table
+# size's strategy (see strategy.strategy_paths).
+
+GAME_NUM_SEATS = int(os.environ.get('GAME_NUM_SEATS', NUM_SEATS))
+PLAYERS = seat_positions(GAME_NUM_SEATS)
+get_strategy_table(GAME_NUM_SEATS) # Refuse to start with a table size that has no strategy (raises ValueError)
+STARTING_STACK = 8.0 # BB
+SMALL_BLIND = 0.4
+BIG_BLIND = 1.0
+STACK_DEPTH_STEP = 0.5 # BB
+
+
+def parse_stack_depth_range(spec):
+    """ "3:25" -> (3.0, 25.0); an empty spec means every hand starts at STARTING_STACK (None)."""
+    if not spec:
+        return None
+    low, high = (float(x) for x in spec.split(':'))
+    if not 0 < low <= high:
+        raise ValueError(f"Invalid stack depth range: {spec}")
+    return low, high
+
+
+# With STACK_DEPTH_RANGE set (e.g. "3:25"), every hand is dealt at a depth drawn from the range
+# and the bots play the strategy grid interpolated at that depth (see strategy.StrategyGrid)
+STACK_DEPTH_RANGE = parse_stack_depth_range(os.environ.get('STACK_DEPTH_RANGE', ''))
+# The cumulative-BB graph series is downsampled to stay under this many points
+CUMULATIVE_BB_MAX_POINTS = int(os.environ.get('CUMULATIVE_BB_MAX_POINTS', 500))
+
+evaluator = PokerEvaluator()
+# Classes whose bot decisions are printed in detail
+DEBUG_CLASS_IDS = {HAND_CLASS_IDS[h] for h in ["K7o", "106o", "1010", "66", "77", "88", "99"]}
+
+def get_initial_game_state(num_seats=None, deal_seed=None):
+    players = seat_positions(num_seats) if num_seats else list(PLAYERS)
+    return {
+        "players": players,
+        "player_stacks": [STARTING_STACK] * len(players), # Starting stacks in BB
+        "stack_depth": STARTING_STACK, # Every player's stack at the start of the current hand, in BB
+        "current_player_idx": 0, # User is always current_player_idx for decision
+        "user_player_position_idx": 0, # Actual position of the user (index into players)
+        "user_player_position_idx_last_hand": 0, # Added: User's position in the hand just played/being played
+        "hands_played": 0,
+        "deal_seed": new_deal_seed() if deal_seed is None else deal_seed, # Session's deal seed (see deals.py)
+        "deal_index": -1, # Index of the current hand's deal under deal_seed
+        "all_player_cards": [], # List of 2-card lists of card ints (see cards.py), e.g., [[48, 45], [42, 39], ...]
+        "community_cards": [], # List of 5 card ints
+        "decisions": [""] * len(players), # Initialize with empty strings for every player
+        "pot_size": 0.0,
+        "small_blind": SMALL_BLIND,
+        "big_blind": BIG_BLIND,
+        "log_messages": ["Game started! Click 'Deal New Hand' to begin."],
+        "game_phase": "pre_deal", # "pre_deal", "awaiting_decision", "showdown"
+        "player_cumulative_bb": [0], # For the graph - starts at 0, see record_cumulative_bb
+        "player_cumulative_bb_stride": 1, # Hands between graph points
+        "player_cumulative_bb_hands": 0, # Hands recorded in the graph
+        "winner_info": None, # To store winner details for display
+        "winners_player_indices": [], # Added: To store indices of winning players
+        "revealed_cards": {}, # player_idx: [card1, card2] for showdown
+        "player_bets_this_hand": [0.0] * len(players), # Tracks total bets for each player in the current hand
+        "user_decision_counts": [0] * len(players), # User's decisions per position (see opponent_model.py)
+        "user_push_counts": [0] * len(players) # User's all-ins per position
+    }
+
+def log_message(state, message):
+    state["log_messages"].append(message)
+    if len(state["log_messages"]) > 10: # Keep log concise
+        state["log_messages"].pop(0)
+
+def format_hand_for_strategy(cards_list):
+    # cards_list is like [48, 45] (or ["Ah", "Kd"]); returns the class string, e.g. "AKo", "1010"
+    codes = cards_to_ints(cards_list) if cards_list and len(cards_list) == 2 else None
+    if codes is None:
+        return "Unknown"
+    return HAND_CLASSES[combo_class_id(*codes)]
+
+
+def _as_ints(cards):
+    if any(isinstance(c, str) for c in cards):
+        return cards_to_ints(cards) or []
+    return cards
+
+
+def upgrade_state(state):
+    """
+    Brings a state saved by an older version up to date: card strings become
+    card ints, the graph series gets its hand count and the session a deal seed.
+    """
+    if "player_cumulative_bb_hands" not in state:
+        state["player_cumulative_bb_hands"] = max(len(state.get("player_cumulative_bb", [0])) - 1, 0)
+        state["player_cumulative_bb_stride"] = 1
+    state["all_player_cards"] = [_as_ints(hole) for hole in state.get("all_player_cards", [])]
+    state["community_cards"] = _as_ints(state.get("community_cards", []))
+    state["revealed_cards"] = {p_idx: _as_ints(hole) for p_idx, hole in state.get("revealed_cards", {}).items()}
+    if "deal_seed" not in state: # States from before seeded deals; a hand in progress draws from deal 0
+        state["deal_seed"] = new_deal_seed()
+        state["deal_index"] = 0
+
+def equilibrium_table(num_seats, stack_depth):
+    """The StrategyTable the bots play at a table size and stack depth, before any adaptation."""
+    if STRATEGY_GRID is not None and STRATEGY_GRID.num_seats == num_seats:
+        return STRATEGY_GRID.table_at(stack_depth)
+    return get_strategy_table(num_seats)
+
+
+# With the equity tables built, bots adapt to the user's observed push frequencies (BOT_ADAPTATION=0 turns it off)
+OPPONENT_MODEL = load_opponent_model(equilibrium_table)
+
+def simulate_optimal_decision(player_position_name, class_id, state):
+    # player_position_name is one of state["players"], e.g. "CO", "BTN", "SB", "BB"
+    # class_id is the hand-class id of the player's hole cards (cards.combo_class_id)
+    # state is the current game state
+    #print(f"\n[DEBUG_SIMULATE_DECISION] Simulating for: {player_position_name}, Hand: {player_hand_str}")
+
+    players = state["players"]
+    current_player_game_idx = players.index(player_position_name) if player_position_name in players else None
+
+    if current_player_game_idx is None:
+        print(f"Warning: Unknown player position '{player_position_name}' in simulate_optimal_decision. Defaulting to FOLD.")
+        return "FOLD"
+
+    # Get decisions of players who acted before the current player
+    # state["decisions"] stores actions for each player by their game index.
+    # Anything other than "ALL_IN" (unset or unexpected) counts as FOLD for the infoset.
+    prior_raw_decisions = state["decisions"][:current_player_game_idx]
+    mask = prior_mask(prior_raw_decisions)
+    info_id = INFOSET_ID_TABLE[current_player_game_idx][mask]
+
+    # Default to 50/50 fold/all-in if the specific situation is not in the strategy
+    num_seats = len(players)
+    adapted_prob = None
+    if OPPONENT_MODEL is not None:
+        adapted_prob = OPPONENT_MODEL.all_in_probability(state, current_player_game_idx, info_id, class_id)
+    if adapted_prob is not None:
+        all_in_prob, found = adapted_prob, True
+    elif STRATEGY_GRID is not None and STRATEGY_GRID.num_seats == num_seats:
+        all_in_prob = STRATEGY_GRID.all_in_probability(state.get("stack_depth", STARTING_STACK), info_id, class_id, None)
+        found = all_in_prob is not None
+    else:
+        strategy_table = get_strategy_table(num_seats)
+        found = strategy_table.contains(info_id, class_id)
+        all_in_prob = strategy_table.all_in_probability(info_id, class_id) if found else None
+    if not found:
+        hand_key = HAND_CLASSES[class_id]
+        infoset_key = infoset_name(current_player_game_idx, mask, num_seats)
+        print(f"[MISSING KEY DEBUG] Key not found: ({infoset_key}, {hand_key})")
+        print(f"[MISSING KEY DEBUG] Player: {player_position_name}, Using default probabilities: (0.5, 0.5)")
+        all_in_prob = 0.5
+    fold_prob = 1.0 - all_in_prob
+
+    # Decision logic based on all_in_prob, as seen in the provided simulation code
+    decision = "FOLD" # Default decision
+    random_value = DEAL_ENGINE.draws(state["deal_seed"], state["deal_index"])[current_player_game_idx]
+    if random_value < all_in_prob:
+        decision = "ALL_IN"
+    
+    # Debug output specifically for key hands to verify they're working correctly
+    if class_id in DEBUG_CLASS_IDS:
+        hand_key = HAND_CLASSES[class_id]
+        infoset_key = infoset_name(current_player_game_idx, mask, num_seats)
+        print(f"[{hand_key} DEBUG] Player: {player_position_name}, Infoset: {infoset_key}")
+        print(f"[{hand_key} DEBUG] Probabilities: fold={fold_prob:.3f} ({fold_prob*100:.1f}%), all_in={all_in_prob:.3f} ({all_in_prob*100:.1f}%)")
+        print(f"[{hand_key} DEBUG] Random value: {random_value:.3f}, Decision: {decision}")
+        print(f"[{hand_key} DEBUG] Key lookup: ({infoset_key}, {hand_key}) -> {'FOUND' if found else 'NOT FOUND'}")
+    
+    #print(f"[DEBUG_SIMULATE_DECISION] Simulated decision: {decision} (random draw vs all_in_prob {all_in_prob})")
+    return decision
+
+def record_cumulative_bb(state, total, max_points=None):
+    """
+    Appends the user's running total after a hand. Point i of the series is the
+    total after hand i * stride, except the last point, which is always the
+    latest total. When the series outgrows max_points (CUMULATIVE_BB_MAX_POINTS),
+    every other point is dropped and the stride doubles, so the state stays
+    bounded however many hands are played.
+    """
+    max_points = max(3, max_points or CUMULATIVE_BB_MAX_POINTS)
+    series = state["player_cumulative_bb"]
+    stride = state["player_cumulative_bb_stride"]
+    hands = state["player_cumulative_bb_hands"]
+    if hands % stride: # The previous latest point isn't on the grid, replace it
+        series.pop()
+    series.append(total)
+    hands += 1
+    if len(series) > max_points:
+        stride *= 2
+        grid = series[:hands // (stride // 2) + 1:2]
+        if hands % stride:
+            grid.append(total)
+        series[:] = grid
+    state["player_cumulative_bb_stride"] = stride
+    state["player_cumulative_bb_hands"] = hands
+
+
+def draw_stack_depth(uniform):
+    """Starting stack for a new hand: STARTING_STACK, or the point of STACK_DEPTH_RANGE a uniform [0, 1) draw picks."""
+    if STACK_DEPTH_RANGE is None:
+        return STARTING_STACK
+    low, high = STACK_DEPTH_RANGE
+    steps = int((high - low) / STACK_DEPTH_STEP)
+    return low + STACK_DEPTH_STEP * min(int(uniform * (steps + 1)), steps)
+
+
+def _all_folded_before(state, idx, undecided_folds=False):
+    """True if every player seated before idx folded (with undecided_folds, or hasn't decided yet)."""
+    return all(d == "FOLD" or (undecided_folds and not d) for d in state["decisions"][:idx])
+
+
+def _bb_auto_all_in(state, bb_idx, message):
+    # BB's decision is set to ALL_IN when everyone before them folded
+    state["decisions"][bb_idx] = "ALL_IN"
+    log_message(state, message)
+
+    # Update BB's bet and stack for the automatic ALL_IN
+    amount_to_add_to_pot = state["player_stacks"][bb_idx]
+    state["player_bets_this_hand"][bb_idx] += amount_to_add_to_pot
+    state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
+    state["player_stacks"][bb_idx] = 0
+
+
+def _finish_hand(state, user_idx_for_this_hand):
+    # Determine winner, move to showdown and rotate the user to the next position for the next deal
+    determine_winner(state, user_idx_for_this_hand)
+    state["game_phase"] = "showdown"
+    state["user_player_position_idx_last_hand"] = user_idx_for_this_hand
+    state["user_player_position_idx"] = (user_idx_for_this_hand + 1) % len(state["players"])
+
+
+def deal_new_hand(state):
+    """
+    Starts a new hand: resets stacks, deals, posts blinds and plays the bots seated before the user.
+    Returns the result dict for the /deal route.
+    """
+    if state["game_phase"] == "awaiting_decision":
+        log_message(state, "Cannot deal, hand in progress.")
+        return {"success": False, "message": "Hand in progress."}
+
+    state["deal_index"] += 1
+    seed, index = state["deal_seed"], state["deal_index"]
+
+    # Reset stacks and pot for new hand
+    state["stack_depth"] = draw_stack_depth(DEAL_ENGINE.draws(seed, index)[STACK_DRAW])
+    state["player_stacks"] = [state["stack_depth"]] * len(state["players"])  # Reset all stacks to starting amount
+    state["pot_size"] = 0.0  # Reset pot size
+    state["player_bets_this_hand"] = [0.0] * len(state["players"]) # Reset bets for the new hand
+
+
+    state["hands_played"] += 1
+    state["current_player_idx"] = state["user_player_position_idx"] # User is always the one to act on their turn
+    state["decisions"] = [""] * len(state["players"]) # Reset decisions
+    state["winner_info"] = None
+    state["winners_player_indices"] = []
+    state["revealed_cards"] = {}
+    state["user_player_position_idx_last_hand"] = state["user_player_position_idx"] # Set for current hand
+
+    # Deal 5 community cards too, revealed later
+    state["all_player_cards"], state["community_cards"] = DEAL_ENGINE.deal(seed, index, len(state["players"]))
+
+    # Blinds
+    sb_idx = state["players"].index("SB")
+    bb_idx = state["players"].index("BB")
+    
+    # SB post - Stacks are full (stack_depth) here
+    state["player_stacks"][sb_idx] = round(state["player_stacks"][sb_idx] - state["small_blind"], 2)
+    state["player_bets_this_hand"][sb_idx] = state["small_blind"]
+    state["pot_size"] = round(state["pot_size"] + state["small_blind"], 2)
+    
+    # BB post - Stacks are full (stack_depth) here
+    state["player_stacks"][bb_idx] = round(state["player_stacks"][bb_idx] - state["big_blind"], 2)
+    state["player_bets_this_hand"][bb_idx] = state["big_blind"]
+    state["pot_size"] = round(state["pot_size"] + state["big_blind"], 2)
+    
+    log_message(state, f"Hand #{state['hands_played']}. You are {state['players'][state['user_player_position_idx']]}.")
+    if STACK_DEPTH_RANGE is not None:
+        log_message(state, f"Stacks: {state['stack_depth']:g} BB.")
+    user_cards = state["all_player_cards"][state["user_player_position_idx"]]
+    log_message(state, f"Your hand: {CARD_STRS[user_cards[0]]} {CARD_STRS[user_cards[1]]}")
+
+    # Simulate decisions for players before the user
+    # This simplified model assumes user is 'current_player_idx' and others act based on that.
+    # A more complex model would have a proper turn order.
+    # Players act in seat order (4-handed: CO, then BTN, then SB, then BB). User is one of them.
+    
+    # Determine who acts before the user in this round
+    # Example: 4-handed, if user is SB (idx 2), CO (idx 0) and BTN (idx 1) act first.
+    for i in range(state["user_player_position_idx"]):
+        player_pos_name = state["players"][i]
+        class_id = combo_class_id(*state["all_player_cards"][i])
+        decision = simulate_optimal_decision(player_pos_name, class_id, state)
+        state["decisions"][i] = decision
+        log_message(state, f"{player_pos_name} ({HAND_CLASSES[class_id]}) decided: {decision}")
+        if decision == "ALL_IN":
+            amount_to_add_to_bet = state["player_stacks"][i] # Their remaining stack
+            state["pot_size"] = round(state["pot_size"] + amount_to_add_to_bet, 2)
+            state["player_bets_this_hand"][i] += amount_to_add_to_bet # Add to existing bet (0 or blind)
+            state["player_stacks"][i] = 0
+        # If FOLD, player_bets_this_hand[i] remains as is (their blind, or 0).
+
+    # Check if user is BB and all others have folded - if so, auto-decide ALL_IN
+    bb_idx = state["players"].index("BB")
+    
+    if state["user_player_position_idx"] == bb_idx and _all_folded_before(state, bb_idx):
+        
+        # Auto-decide ALL_IN for user as BB
+        _bb_auto_all_in(state, bb_idx, "You (BB) automatically win as all others folded. Your decision set to ALL_IN.")
+        _finish_hand(state, state["user_player_position_idx"])
+        return {"success": True}
+
+    state["game_phase"] = "awaiting_decision"
+    return {"success": True}
+
+
+def apply_user_decision(state, decision_type):
+    """
+    Records the user's decision, plays the remaining bots and resolves the hand.
+    Returns the result dict for the /make_decision route.
+    """
+    if state["game_phase"] != "awaiting_decision":
+        return {"success": False, "message": "Not time for decision."}
+
+    user_original_position_this_hand = state["user_player_position_idx"]
+    state["decisions"][user_original_position_this_hand] = decision_type
+    log_message(state, f"You ({state['players'][user_original_position_this_hand]}) decided: {decision_type}")
+
+    # Update user's bet and stack for ALL_IN
+    if decision_type == "ALL_IN":
+        amount_to_add_to_pot = state["player_stacks"][user_original_position_this_hand]
+        state["player_bets_this_hand"][user_original_position_this_hand] += amount_to_add_to_pot
+        state["pot_size"] = round(state["pot_size"] + amount_to_add_to_pot, 2)
+        state["player_stacks"][user_original_position_this_hand] = 0
+        log_message(state, f"You go ALL IN. Your bet this hand: {state['player_bets_this_hand'][user_original_position_this_hand]:.2f} BB. Pot: {state['pot_size']:.2f} BB")
+
+    # Check if everyone before BB has folded (or not acted yet) - if so, BB automatically wins
+    bb_idx = state["players"].index("BB")
+    
+    if _all_folded_before(state, bb_idx, undecided_folds=True):
+        
+        # BB automatically wins - set decision to ALL_IN if not already decided
+        if not state["decisions"][bb_idx]:
+            _bb_auto_all_in(state, bb_idx, "BB automatically wins as all others folded. BB decision set to ALL_IN.")
+
+        # Skip simulating other decisions and go straight to determining winner
+        _finish_hand(state, user_original_position_this_hand)
+        return {"success": True}
+
+    # Simulate decisions for other players who haven't acted yet, using the optimal strategy.
+    for i in range(len(state["players"])):
+        if i == user_original_position_this_hand:
+            continue # Skip user, decision already made
+
+        if not state["decisions"][i]: # If no decision yet for this player
+            player_pos_name = state["players"][i]
+            
+            # Check if this is BB and all others have folded
+            if i == bb_idx and _all_folded_before(state, bb_idx):
+                
+                # BB automatically wins - set decision to ALL_IN
+                _bb_auto_all_in(state, bb_idx, "BB automatically wins as all others folded. BB decision set to ALL_IN.")
+
+                # Skip simulating other decisions
+                break
+            
+            # Ensure cards are available for decision making
+            if not state["all_player_cards"] or i >= len(state["all_player_cards"]) or not state["all_player_cards"][i]:
+                log_message(state, f"Warning: Cards not found for {player_pos_name}, defaulting their action to FOLD.")
+                state["decisions"][i] = "FOLD" # Fallback if cards are missing
+                continue
+
+            class_id = combo_class_id(*state["all_player_cards"][i])
+            
+            # Call simulate_optimal_decision for opponents
+            opponent_decision = simulate_optimal_decision(player_pos_name, class_id, state)
+            state["decisions"][i] = opponent_decision
+            log_message(state, f"{state['players'][i]} ({HAND_CLASSES[class_id]}) decided: {opponent_decision}")
+
+            if opponent_decision == "ALL_IN":
+                # Amount to add is their current stack (if > 0)
+                amount_opponent_adds_to_bet = state["player_stacks"][i]
+                if amount_opponent_adds_to_bet > 0:
+                    state["player_bets_this_hand"][i] += amount_opponent_adds_to_bet # Add to existing bet (e.g., blind)
+                    state["pot_size"] = round(state["pot_size"] + amount_opponent_adds_to_bet, 2)
+                    state["player_stacks"][i] = 0
+                    log_message(state, f"{state['players'][i]} goes ALL IN. Their bet: {state['player_bets_this_hand'][i]:.2f} BB. Pot: {state['pot_size']:.2f} BB")
+                else:
+                    log_message(state, f"{state['players'][i]} is already all-in or has no chips to bet for ALL_IN decision.")
+            # If FOLD, their stack and current bet (e.g. blind) remain. The decision is logged above.
+            
+            # After each player's decision, check if BB is the only one left
+            if _all_folded_before(state, bb_idx) and not state["decisions"][bb_idx]:
+                
+                # BB automatically wins - set decision to ALL_IN
+                _bb_auto_all_in(state, bb_idx, "BB automatically wins as all others folded. BB decision set to ALL_IN.")
+
+                # Skip simulating other decisions
+                break
+
+    # Determine winner, then rotate positions for next hand (user moves to next position)
+    _finish_hand(state, user_original_position_this_hand) # Pass user's original position
+    return {"success": True}
+
+def resolve_user_bb_walk(state):
+    """
+    If the user is BB and everyone before them folded, auto-decides ALL_IN for the user and
+    resolves the hand. Returns True if the state was changed.
+    """
+    if state["game_phase"] != "awaiting_decision":
+        return False
+    bb_idx = state["players"].index("BB")
+
+    if state["user_player_position_idx"] == bb_idx and _all_folded_before(state, bb_idx):
+
+        # Auto-decide ALL_IN for user as BB
+        _bb_auto_all_in(state, bb_idx, "You (BB) automatically win as all others folded. Your decision set to ALL_IN.")
+        _finish_hand(state, state["user_player_position_idx"])
+        return True
+    return False
+
+
+def determine_winner(state, user_idx_for_this_hand): # Added user_idx_for_this_hand
+    # Ensure decisions array is properly initialized
+    current_decisions = state.get("decisions", [])
+    state["decisions"] = current_decisions + ["FOLD"] * (len(state["players"]) - len(current_decisions))
+    for i in range(len(state["decisions"])):
+        if not state["decisions"][i]: 
+            state["decisions"][i] = "FOLD" # Default unmade decisions to FOLD
+
+    # user_p_idx is the user's position for the hand just played
+    user_contribution_this_hand = state["player_bets_this_hand"][user_idx_for_this_hand]
+    current_cumulative_bb_val = state["player_cumulative_bb"][-1] if state["player_cumulative_bb"] else 0
+    state["winners_player_indices"] = [] # Initialize/reset
+
+    non_folded_players = [i for i, d in enumerate(state["decisions"]) if d != "FOLD"]
+
+    if not non_folded_players:
+        log_message(state, "Error: All players folded? Pot distributed or error.")
+        final_user_bb_change_for_hand = -user_contribution_this_hand
+        record_cumulative_bb(state, current_cumulative_bb_val + final_user_bb_change_for_hand)
+        log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
+        state["winner_info"] = {"name": "No Winner", "hand_type": "All Folded"}
+        return
+
+    if len(non_folded_players) == 1:
+        winner_idx = non_folded_players[0]
+        log_message(state, f"{state['players'][winner_idx]} wins the pot of {state['pot_size']:.2f} BB (others folded).")
+        state["winner_info"] = {"name": state['players'][winner_idx], "hand_type": "Opponents Folded"}
+        state["winners_player_indices"] = [winner_idx]
+        if state["all_player_cards"] and len(state["all_player_cards"]) > winner_idx and state["all_player_cards"][winner_idx]:
+            state["revealed_cards"][winner_idx] = state["all_player_cards"][winner_idx]
+        
+        state["player_stacks"][winner_idx] = round(state["player_stacks"][winner_idx] + state["pot_size"], 2)
+        
+        final_user_bb_change_for_hand = 0
+        if winner_idx == user_idx_for_this_hand:
+            final_user_bb_change_for_hand = state["pot_size"] - user_contribution_this_hand
+        else:
+            final_user_bb_change_for_hand = -user_contribution_this_hand
+        
+        record_cumulative_bb(state, current_cumulative_bb_val + final_user_bb_change_for_hand)
+        log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
+        return
+
+    showdown_players_indices = non_folded_players 
+    best_score = None
+    winners_indices_local = [] # Use local variable for winners in this scope
+    player_scores = {}
+
+    for p_idx in showdown_players_indices:
+        if not state["all_player_cards"] or p_idx >= len(state["all_player_cards"]) or not state["all_player_cards"][p_idx]:
+            log_message(state, f"Error: Missing cards for player {state['players'][p_idx]} at index {p_idx} during showdown.")
+            continue # Skip this player if cards are missing
+        hole_cards = state["all_player_cards"][p_idx]
+        score = evaluate_cards(hole_cards + state["community_cards"]) # Random showdowns don't repeat: no memo
+        player_scores[p_idx] = score
+        state["revealed_cards"][p_idx] = hole_cards
+
+        if score:
+            log_message(state, f"{state['players'][p_idx]} has {evaluator.hand_type_to_string(strength_category(score))} ({ints_to_cards(hole_cards)})")
+            if best_score is None or score > best_score:
+                best_score = score
+                winners_indices_local = [p_idx]
+            elif score == best_score:
+                winners_indices_local.append(p_idx)
+        else:
+            log_message(state, f"{state['players'][p_idx]} ({ints_to_cards(hole_cards)}) - could not evaluate hand.")
+
+    state["winners_player_indices"] = winners_indices_local # Store in state
+
+    if not winners_indices_local or not best_score:
+        log_message(state, "Error: Could not determine a winner from hand evaluation.")
+        final_user_bb_change_for_hand = -user_contribution_this_hand if user_idx_for_this_hand in showdown_players_indices else -user_contribution_this_hand
+        record_cumulative_bb(state, current_cumulative_bb_val + final_user_bb_change_for_hand)
+        log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
+        state["winner_info"] = {"name": "Evaluation Error", "hand_type": "Unknown"}
+        return
+
+    pot_per_winner = round(state["pot_size"] / len(winners_indices_local), 2)
+    winner_names = [state['players'][idx] for idx in winners_indices_local]
+    hand_name = evaluator.hand_type_to_string(strength_category(best_score))
+    log_message(state, f"Winner(s): {', '.join(winner_names)} with {hand_name}. Each gets {pot_per_winner:.2f} BB.")
+    state["winner_info"] = {"name": ', '.join(winner_names), "hand_type": hand_name}
+
+    for w_idx in winners_indices_local:
+        state["player_stacks"][w_idx] = round(state["player_stacks"][w_idx] + pot_per_winner, 2)
+
+    final_user_bb_change_for_hand = 0
+    if user_idx_for_this_hand in winners_indices_local:
+        final_user_bb_change_for_hand = pot_per_winner - user_contribution_this_hand
+    elif user_idx_for_this_hand in showdown_players_indices:
+        final_user_bb_change_for_hand = -user_contribution_this_hand
+    else: # User folded before showdown
+        final_user_bb_change_for_hand = -user_contribution_this_hand
+        
+    record_cumulative_bb(state, current_cumulative_bb_val + final_user_bb_change_for_hand)
+    log_message(state, f"Your BB change for hand: {final_user_bb_change_for_hand:.2f}. Total: {state['player_cumulative_bb'][-1]:.2f}")
@@ -0,0 +1,49 @@
+import gc
+import multiprocessing
+import os
+
+# --- Gunicorn production config ---
+# Run with: gunicorn -c gunicorn.conf.py app:app
+#
+# preload_app imports app.py once in the master: the strategy table, equity
+# tables (both memory-mapped), card image index and evaluator lookup tables
+# are built before forking and shared copy-on-write by every worker.
+# gc.freeze() keeps the collector from touching (and so copying) those pages.
+# Sessions work across workers because the signing key comes from SECRET_KEY
+# or the shared instance/secret_key file, and game states live in the shared
+# SQLite store.
+#
+# gevent workers hold idle /events streams cheaply; WEB_CONCURRENCY overrides
+# the worker count (default: one per core, since gevent workers already
+# multiplex connections and the CPU-heavy work is NumPy).
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    # Patch before the app is preloaded, so locks and sockets created at import are cooperative
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+threads = int(os.environ.get('GUNICORN_THREADS', 1)) # Only used by the gthread worker class
+preload_app = True
+timeout = 120 # Long /equity and /simulate requests
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+
+def when_ready(server):
+    # Still in the master: build the 7-card evaluation tables once for every worker
+    from poker_evaluator import warm_up
+    warm_up()
+    gc.collect()
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Write the hands still queued for the hand history log before the worker goes
+    from app import HAND_HISTORY
+    if HAND_HISTORY is not None:
+        HAND_HISTORY.flush()
@@ -0,0 +1,351 @@
+import argparse
+import atexit
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from cards import CARD_STRS
+from deals import DEAL_ENGINE
+from strategy import MAX_SEATS, prior_mask, seat_positions
+
+# --- Hand history log ---
+# Every completed hand is appended to a binary log as one fixed-size record
+# (RECORD_DTYPE): hole cards and board as card-int bytes (NO_CARD for empty
+# slots), the all-in decisions and the winners as seat bitmasks, bets, pot
+# and stack depth as integers in hundredths of a BB, the deal seed and index
+# the hand can be regenerated from (see deals.py), and a 64-bit hash of the
+# session id (the id itself is a bearer token and is never written).
+#
+# A log file is a 64-byte header followed by records. Each worker process
+# appends to its own file, so writers never interleave; a file is closed and
+# a new one started after max_records hands. The request path only puts the
+# record on a queue: a background thread writes queued records in batches, at
+# least every flush_interval seconds.
+#
+# Readers memory-map the files (open_log, iter_records), so scans over
+# millions of hands are NumPy operations over the mapped records. A record
+# torn by a crash mid-write is ignored.
+
+DEFAULT_DIR = os.path.join('instance', 'hand_history')
+LOG_MAGIC = b'PFHANDS1'
+LOG_VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4'), ('created', '<f8'), ('reserved', 'S40')
+])
+NO_CARD = 255
+BET_SCALE = 100 # Bets, pot and stack are stored in hundredths of a BB
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'), # Unix time the hand finished
+    ('session', '<u8'), # session_hash() of the session id
+    ('seed', '<u8'), # The session's deal seed (see deals.py)
+    ('deal_index', '<u4'), # Index of the deal under that seed
+    ('hand', '<u4'), # The session's hands_played count
+    ('stack', '<i4'), # Starting stack (stack_depth)
+    ('pot', '<i4'),
+    ('bets', '<i4', (MAX_SEATS,)), # Total bet per seat (player_bets_this_hand)
+    ('holes', 'u1', (MAX_SEATS, 2)),
+    ('board', 'u1', (5,)),
+    ('num_seats', 'u1'),
+    ('user_seat', 'u1'),
+    ('pushed', '<u2'), # Bit k: seat k went all in
+    ('winners', '<u2'), # Bit k: seat k won (a share of) the pot
+    ('reserved', 'V7')
+])
+assert HEADER_DTYPE.itemsize == HEADER_SIZE and RECORD_DTYPE.itemsize == 112
+
+DEFAULT_MAX_RECORDS = 1 << 20 # Hands per file (112 MiB) before rotating
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_FLUSH_INTERVAL = 1.0 # Seconds a queued record can wait to be written
+DEFAULT_MAX_QUEUED = 100000 # Records beyond this are dropped (and counted) rather than block requests
+
+
+def session_hash(session_id):
+    return int.from_bytes(hashlib.blake2b(session_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def quantize(bb):
+    return int(round(bb * BET_SCALE))
+
+
+def hand_record(state, session_id):
+    """The log record (a 0-d RECORD_DTYPE array) of a game state whose hand just finished."""
+    num_seats = len(state["players"])
+    record = np.zeros((), dtype=RECORD_DTYPE)
+    record["time"] = time.time()
+    record["session"] = session_hash(session_id)
+    record["seed"] = state.get("deal_seed", 0)
+    record["deal_index"] = max(state.get("deal_index", 0), 0)
+    record["hand"] = state["hands_played"]
+    record["stack"] = quantize(state["stack_depth"])
+    record["pot"] = quantize(state["pot_size"])
+    record["bets"][:num_seats] = [quantize(bet) for bet in state["player_bets_this_hand"]]
+    record["holes"][:] = NO_CARD
+    for seat, hole in enumerate(state["all_player_cards"]):
+        record["holes"][seat, :len(hole)] = hole
+    record["board"][:] = NO_CARD
+    record["board"][:len(state["community_cards"])] = state["community_cards"]
+    record["num_seats"] = num_seats
+    record["user_seat"] = state["user_player_position_idx_last_hand"]
+    record["pushed"] = prior_mask(state["decisions"])
+    record["winners"] = sum(1 << seat for seat in state["winners_player_indices"])
+    return record
+
+
+def decode_record(record):
+    """One record as a JSON-friendly dict (positions, card strings, BB amounts), for replay."""
+    num_seats = int(record["num_seats"])
+    positions = seat_positions(num_seats)
+    pushed, winners = int(record["pushed"]), int(record["winners"])
+    return {
+        "time": float(record["time"]),
+        "session": f"{int(record['session']):016x}",
+        "seed": int(record["seed"]),
+        "deal_index": int(record["deal_index"]),
+        "hand": int(record["hand"]),
+        "stack_bb": int(record["stack"]) / BET_SCALE,
+        "pot_bb": int(record["pot"]) / BET_SCALE,
+        "user": positions[int(record["user_seat"])],
+        "players": {
+            position: {
+                "cards": [CARD_STRS[c] for c in record["holes"][seat] if c != NO_CARD],
+                "decision": "ALL_IN" if pushed >> seat & 1 else "FOLD",
+                "bet_bb": int(record["bets"][seat]) / BET_SCALE,
+                "won": bool(winners >> seat & 1)
+            }
+            for seat, position in enumerate(positions)
+        },
+        "board": [CARD_STRS[c] for c in record["board"] if c != NO_CARD]
+    }
+
+
+class HandHistoryWriter:
+    """Appends hand records to rotating log files in directory from a background thread."""
+
+    def __init__(self, directory=DEFAULT_DIR, max_records=DEFAULT_MAX_RECORDS, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_queued=DEFAULT_MAX_QUEUED):
+        self.directory = directory
+        self.max_records = max_records
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._file = None
+        self._file_records = 0
+        self._sequence = 0
+        self.written = 0
+        self.dropped = 0
+        atexit.register(self.flush)
+
+    def _start(self):
+        # The queue and thread belong to one process; a forked worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queued)
+                self._file = None
+                self._file_records = 0
+                self._sequence = 0
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="hand-history", daemon=True).start()
+            return self._queue
+
+    def append(self, record):
+        """Queues one hand_record(); never blocks the caller."""
+        try:
+            self._start().put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Waits (up to timeout seconds) until everything queued so far is written."""
+        if self._pid != os.getpid():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write(np.stack(batch))
+                except OSError as e:
+                    print(f"Could not write hand history to {self.directory}: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def _open_file(self):
+        if self._file is not None:
+            self._file.close()
+        self._sequence += 1
+        name = f"hands-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence}.bin"
+        header = np.zeros((), dtype=HEADER_DTYPE)
+        header["magic"], header["version"] = LOG_MAGIC, LOG_VERSION
+        header["record_size"], header["created"] = RECORD_DTYPE.itemsize, time.time()
+        self._file = open(os.path.join(self.directory, name), 'ab')
+        self._file.write(header.tobytes())
+        self._file_records = 0
+
+    def _write(self, records):
+        start = 0
+        while start < len(records):
+            if self._file is None or self._file_records >= self.max_records:
+                self._open_file()
+            chunk = records[start:start + self.max_records - self._file_records]
+            self._file.write(chunk.tobytes())
+            self._file_records += len(chunk)
+            start += len(chunk)
+        self._file.flush()
+        self.written += len(records)
+
+    def stats(self):
+        return {
+            "directory": self.directory, "written": self.written, "dropped": self.dropped,
+            "queued": self._queue.qsize() if self._pid == os.getpid() else 0
+        }
+
+
+# --- Reading ---
+
+def log_files(directory=DEFAULT_DIR):
+    """The log files in directory, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, 'hands-*.bin')), key=lambda p: (os.path.getmtime(p), p))
+
+
+def open_log(path):
+    """The records of one log file, memory-mapped read-only. Raises ValueError if it isn't a hand log."""
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header[0]["magic"] != LOG_MAGIC:
+        raise ValueError(f"{path} is not a hand history log")
+    if header[0]["version"] != LOG_VERSION or header[0]["record_size"] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has an unsupported record layout")
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize # Drops a torn last record
+    if count <= 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def iter_records(directory=DEFAULT_DIR, chunk_size=1 << 18):
+    """Streams every logged record, oldest file first, as memory-mapped RECORD_DTYPE arrays of up to chunk_size."""
+    for path in log_files(directory):
+        try:
+            records = open_log(path)
+        except ValueError as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        for start in range(0, len(records), chunk_size):
+            yield records[start:start + chunk_size]
+
+
+def user_net(records):
+    """The user's result of each hand in BB (pot share if they won, minus their bet)."""
+    rows = np.arange(len(records))
+    user_seat = records["user_seat"].astype(np.intp)
+    winners = records["winners"].astype(np.int64)
+    num_winners = np.zeros(len(records), dtype=np.int64)
+    for seat in range(MAX_SEATS):
+        num_winners += winners >> seat & 1
+    user_won = (winners >> user_seat & 1).astype(bool)
+    share = np.where(user_won, records["pot"] / np.maximum(num_winners, 1), 0.0)
+    return (share - records["bets"][rows, user_seat]) / BET_SCALE
+
+
+def deal_mismatches(records):
+    """How many records' cards differ from the deal regenerated from their seed and deal index."""
+    mismatches = 0
+    for record in records:
+        num_seats = int(record["num_seats"])
+        holes, board = DEAL_ENGINE.deal(int(record["seed"]), int(record["deal_index"]), num_seats)
+        if holes != record["holes"][:num_seats].tolist() or board != record["board"].tolist():
+            mismatches += 1
+    return mismatches
+
+
+def audit(directory=DEFAULT_DIR, session_id=None, verify_deals=False):
+    """
+    Scans the whole log: hands, sessions, hands per table size, the user's total and
+    per-hand result, and how many records fail the chip check (bets not adding up to the pot).
+    verify_deals also regenerates every deal from its seed and counts the ones that differ
+    (a Python loop, a few microseconds per hand).
+    """
+    session = None if session_id is None else np.uint64(session_hash(session_id))
+    hands = bad_chips = bad_deals = 0
+    net = 0.0
+    sessions = set()
+    table_sizes = np.zeros(MAX_SEATS + 1, dtype=np.int64)
+    for records in iter_records(directory):
+        if session is not None:
+            records = records[records["session"] == session]
+        hands += len(records)
+        sessions.update(np.unique(records["session"]).tolist())
+        table_sizes += np.bincount(records["num_seats"], minlength=MAX_SEATS + 1)
+        tolerance = records["num_seats"].astype(np.int64) # Rounding of one hundredth per bet
+        bad_chips += int(np.count_nonzero(np.abs(records["bets"].sum(axis=1, dtype=np.int64) - records["pot"]) > tolerance))
+        net += float(user_net(records).sum())
+        if verify_deals:
+            bad_deals += deal_mismatches(records)
+    report = {
+        "hands": hands,
+        "sessions": len(sessions),
+        "table_sizes": {str(n): int(table_sizes[n]) for n in range(2, MAX_SEATS + 1) if table_sizes[n]},
+        "user_net_bb": net,
+        "user_bb_per_hand": net / hands if hands else 0.0,
+        "chip_check_failures": bad_chips
+    }
+    if verify_deals:
+        report["deal_check_failures"] = bad_deals
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit or replay the binary hand history log.")
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--session', default=None, help="Only this session id's hands")
+    parser.add_argument('--last', type=int, default=0, help="Also print the last N hands in full")
+    parser.add_argument('--verify-deals', action='store_true', help="Check every hand against its regenerated deal")
+    args = parser.parse_args()
+
+    started = time.time()
+    report = audit(args.dir, args.session, args.verify_deals)
+    report["seconds"] = round(time.time() - started, 2)
+    print(json.dumps(report, indent=2))
+    if args.last > 0:
+        session = None if args.session is None else np.uint64(session_hash(args.session))
+        last = []
+        for records in iter_records(args.dir):
+            if session is not None:
+                records = records[records["session"] == session]
+            last = (last + [decode_record(r) for r in records[-args.last:]])[-args.last:]
+        for hand in last:
+            print(json.dumps(hand))
+
+
+if __name__ == '__main__':
+    main()
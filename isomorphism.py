@@ -0,0 +1,79 @@
+import threading
+
+from cards import NUM_SUITS
+from state_store import LRUCache
+
+# --- Suit isomorphism ---
+# Hold'em values never depend on which suit is which, only on how the cards
+# share suits. Cards are given in groups (each player's hole cards, the board,
+# dead cards); every suit gets a signature, the tuple of its rank masks in
+# each group, and suits are relabelled in descending signature order. Two
+# deals that differ only by a suit permutation get the same representative,
+# in one sort of four tuples rather than a scan of all 24 permutations.
+# Hand classes are invariant under suit permutations, so they stay as they
+# are and only the specific cards are relabelled.
+
+
+def suit_signatures(card_groups):
+    """Per suit: the tuple of rank masks (bit = rank index) of that suit in each group."""
+    masks = [[0] * len(card_groups) for _ in range(NUM_SUITS)]
+    for g, cards in enumerate(card_groups):
+        for c in cards:
+            masks[c & 3][g] |= 1 << (c >> 2)
+    return [tuple(m) for m in masks]
+
+
+def canonical_suit_permutation(card_groups):
+    """old suit -> new suit, mapping the groups to their suit-isomorphic representative."""
+    signatures = suit_signatures(card_groups)
+    order = sorted(range(NUM_SUITS), key=lambda s: signatures[s], reverse=True)
+    permutation = [0] * NUM_SUITS
+    for new_suit, old_suit in enumerate(order):
+        permutation[old_suit] = new_suit
+    return permutation
+
+
+def canonical_groups(card_groups):
+    """The representative of integer card groups: suits relabelled, cards sorted within each group."""
+    permutation = canonical_suit_permutation(card_groups)
+    return tuple(tuple(sorted((c & ~3) | permutation[c & 3] for c in cards)) for cards in card_groups)
+
+
+def canonical_hand_key(cards):
+    """Hashable key shared by every suit permutation of a set of cards (e.g. hole cards + board)."""
+    masks = [0] * NUM_SUITS
+    for c in cards:
+        masks[c & 3] |= 1 << (c >> 2)
+    return tuple(sorted(masks))
+
+
+class MemoCache:
+    """Bounded LRU memo with hit and miss counters."""
+
+    def __init__(self, max_entries):
+        self._entries = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        value = self._entries.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        value = compute()
+        with self._lock:
+            self.misses += 1
+        if value is not None:
+            self._entries.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": len(self._entries), "max_entries": self._entries.max_entries,
+            "hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0
+        }
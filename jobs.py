@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from equity import DEFAULT_TOLERANCE, calculate_equity, canonical_matchup
+from equity_tables import DEFAULT_PATH as EQUITY_TABLES_PATH, load_equity_tables
+from game import BIG_BLIND, SMALL_BLIND, STARTING_STACK
+from simulator import apply_policy, iter_simulation, push_table
+from state_store import LRUCache
+from strategy import NUM_SEATS, get_strategy_table, seat_positions
+
+# --- Background jobs ---
+# Equity calculations, simulations and strategy solves run in a process pool
+# instead of the web worker. Every job is identified by a SHA-256 of its
+# canonical parameters (an equity query's suit-isomorphic representative, a
+# simulation's policy reduced to the push table it produces), and the
+# job id is that hash: submitting a job that is already queued returns the
+# same job, and a finished result is kept in an LRU and, when a cache
+# directory is configured, in <cache_dir>/<job id>.json. Identical requests
+# from any session, or any worker process sharing the directory, are then
+# answered without recomputing.
+#
+# The pool is created on first use in each process, so a preloading server
+# (see gunicorn.conf.py) never forks a master that already owns one.
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_MAX_JOBS = 1024 # Job records kept per process for status lookups
+MAX_SIMULATION_HANDS = 10000000
+MAX_SOLVE_ITERATIONS = 5000
+
+
+def job_key(job_type, canonical):
+    text = json.dumps({"type": job_type, "params": canonical}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _optional_int(value):
+    return None if value is None else int(value)
+
+
+def _seats(params):
+    num_seats = int(params.get("seats", NUM_SEATS))
+    seat_positions(num_seats) # Raises ValueError outside 2-MAX_SEATS
+    return num_seats
+
+
+# Each job type: prepare(params) -> (canonical params, run args), raising ValueError
+# on bad input, and a module-level run function the pool can pickle.
+
+def _prepare_equity(params):
+    hands = params.get("hands", [])
+    if not isinstance(hands, list):
+        raise ValueError("hands must be a list.")
+    canonical_hands, canonical_dead = canonical_matchup(hands, params.get("dead_cards"))
+    tolerance = float(params.get("tolerance", DEFAULT_TOLERANCE))
+    if not 0.0005 <= tolerance <= 0.05: # Keep the job bounded
+        raise ValueError("tolerance must be between 0.0005 and 0.05.")
+    canonical = {
+        "hands": canonical_hands,
+        "dead_cards": canonical_dead,
+        "tolerance": tolerance,
+        "seed": _optional_int(params.get("seed"))
+    }
+    return canonical, (canonical["hands"], canonical["dead_cards"], tolerance, canonical["seed"])
+
+
+def _run_equity(hands, dead_cards, tolerance, seed):
+    result = calculate_equity(hands, dead_cards=dead_cards, tolerance=tolerance, processes=1, seed=seed)
+    result["source"] = "monte_carlo"
+    return result
+
+
+def _prepare_simulation(params, cpu_budget=None):
+    num_hands = int(params.get("hands", 100000))
+    if not 1 <= num_hands <= MAX_SIMULATION_HANDS:
+        raise ValueError(f"hands must be between 1 and {MAX_SIMULATION_HANDS}.")
+    num_seats = _seats(params)
+    table = push_table(get_strategy_table(num_seats))
+    if params.get("policy"):
+        table = apply_policy(table, params["policy"])
+    canonical = {
+        "table": hashlib.sha256(np.ascontiguousarray(table).tobytes()).hexdigest(),
+        "hands": num_hands,
+        "seats": num_seats,
+        "seed": _optional_int(params.get("seed"))
+    }
+    return canonical, (num_hands, table, canonical["seed"], cpu_budget)
+
+
+def _run_simulation(num_hands, table, seed, cpu_budget):
+    for snapshot in iter_simulation(num_hands, table, seed, cpu_budget=cpu_budget):
+        pass
+    return snapshot
+
+
+def _prepare_solve(params):
+    iterations = int(params.get("iterations", 1000))
+    if not 1 <= iterations <= MAX_SOLVE_ITERATIONS:
+        raise ValueError(f"iterations must be between 1 and {MAX_SOLVE_ITERATIONS}.")
+    if not os.path.exists(EQUITY_TABLES_PATH):
+        raise ValueError("Solving needs the equity tables; build them with: python equity_tables.py")
+    canonical = {
+        "iterations": iterations,
+        "seats": _seats(params),
+        "stack": float(params.get("stack", STARTING_STACK)),
+        "small_blind": float(params.get("small_blind", SMALL_BLIND)),
+        "big_blind": float(params.get("big_blind", BIG_BLIND))
+    }
+    if not 0 < canonical["small_blind"] <= canonical["big_blind"] < canonical["stack"]:
+        raise ValueError("Blinds must be positive and below the stack.")
+    return canonical, (iterations, canonical["stack"], canonical["small_blind"], canonical["big_blind"],
+                       canonical["seats"])
+
+
+def _run_solve(iterations, stack, small_blind, big_blind, num_seats=NUM_SEATS):
+    from solver import PushFoldSolver, strategy_to_table # Imported in the pool worker only
+    solver = PushFoldSolver(load_equity_tables(), stack, small_blind, big_blind, num_seats)
+    solver.iterate(iterations)
+    return {"iterations": iterations, "seats": num_seats,
+            "strategy": strategy_to_table(solver.average_strategy()).to_results()}
+
+
+JOB_TYPES = {
+    "equity": (_prepare_equity, _run_equity),
+    "simulation": (_prepare_simulation, _run_simulation),
+    "solve": (_prepare_solve, _run_solve)
+}
+
+
+class ResultCache:
+    """LRU of finished job results by job id, backed by an optional directory of JSON files."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, directory=None):
+        self._entries = LRUCache(max_entries)
+        self.directory = directory or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, count=True):
+        """The cached result or None; count=False leaves the hit/miss counters alone."""
+        result = self._entries.get(key)
+        if result is None and self.directory:
+            try:
+                with open(self._path(key), 'r') as f:
+                    result = json.load(f)
+                self._entries.put(key, result)
+            except (OSError, ValueError):
+                result = None
+        if count:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._entries.put(key, result)
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(result, f, separators=(',', ':'))
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Could not store job result {key}: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0, "directory": self.directory
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers=None, cache_size=DEFAULT_CACHE_SIZE, cache_dir=None,
+                 max_jobs=DEFAULT_MAX_JOBS, simulation_cpu_budget=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = ResultCache(cache_size, cache_dir)
+        self.simulation_cpu_budget = simulation_cpu_budget
+        self._jobs = LRUCache(max_jobs) # job id -> job record
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(self.max_workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def prepare(self, job_type, params):
+        """(job id, run function, run args) for a job. Raises ValueError on an unknown type or bad params."""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if not isinstance(params, dict):
+            raise ValueError("Job parameters must be a JSON object.")
+        prepare, run = JOB_TYPES[job_type]
+        if job_type == "simulation":
+            canonical, args = prepare(params, self.simulation_cpu_budget)
+        else:
+            canonical, args = prepare(params)
+        return job_key(job_type, canonical), run, args
+
+    def submit(self, job_type, params):
+        """Queues a job (or finds the queued or finished one) and returns its status()."""
+        key, run, args = self.prepare(job_type, params)
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None and job["status"] != "failed":
+            return self.status(key)
+        job = {"id": key, "type": job_type, "submitted": time.time(), "finished": None,
+               "status": "queued", "future": None, "cached": False}
+        if self.cache.get(key) is not None:
+            job.update(status="done", finished=job["submitted"], cached=True)
+        with self._lock:
+            self._jobs.put(key, job)
+        if not job["cached"]:
+            job["future"] = self._get_executor().submit(run, *args)
+            job["future"].add_done_callback(lambda future: self._finish(key, future))
+        return self.status(key)
+
+    def _finish(self, key, future):
+        job = self._jobs.get(key)
+        if job is None:
+            return
+        if future.cancelled() or future.exception() is not None:
+            job["error"] = "cancelled" if future.cancelled() else str(future.exception())
+            job["status"] = "failed"
+        else:
+            result = future.result()
+            if result.get("stopped", "complete") == "complete": # Budget-truncated simulations aren't reusable
+                self.cache.put(key, result)
+            job["result"] = result
+            job["status"] = "done"
+        job["finished"] = time.time()
+
+    def status(self, job_id):
+        """Status dict of a job (queued, running, done or failed), or None if it isn't known here."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            if self.cache.get(job_id, count=False) is None:
+                return None
+            return {"id": job_id, "status": "done", "cached": True}
+        status = job["status"]
+        if status == "queued" and job["future"] is not None and job["future"].running():
+            status = "running"
+        info = {"id": job_id, "type": job["type"], "status": status, "cached": job["cached"],
+                "submitted": job["submitted"], "finished": job["finished"]}
+        if status == "failed":
+            info["error"] = job.get("error")
+        return info
+
+    def result(self, job_id):
+        """The job's result if it finished, else None."""
+        job = self._jobs.get(job_id)
+        if job is not None and "result" in job:
+            return job["result"]
+        return self.cache.get(job_id, count=False)
+
+    def run(self, job_type, params, timeout=None):
+        """Submits a job and waits for it; returns (job id, result). Raises ValueError if the job failed."""
+        job_id = self.submit(job_type, params)["id"]
+        job = self._jobs.get(job_id)
+        if job is not None and job["future"] is not None:
+            # The future's value, not the job record: _finish is a done callback and
+            # may not have stored the result yet when result() returns
+            return job_id, job["future"].result(timeout) # Re-raises the job's exception
+        result = self.result(job_id)
+        if result is None:
+            raise ValueError(self.status(job_id).get("error") or "Job failed.")
+        return job_id, result
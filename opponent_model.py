@@ -0,0 +1,144 @@
+import copy
+import os
+
+import numpy as np
+
+from cards import NUM_HAND_CLASSES
+from equity_tables import DEFAULT_PATH as EQUITY_TABLES_PATH, load_equity_tables
+from isomorphism import MemoCache
+from strategy import infoset_id, walk_infoset
+
+# --- Opponent profiling ---
+# Each session counts the user's decisions and all-ins per position
+# (user_decision_counts / user_push_counts in the game state, bumped by
+# record_user_decision). The user's push frequency at their current seat is
+# estimated with PRIOR_WEIGHT pseudo-decisions at the equilibrium frequency,
+# so a few hands don't move it. Once there are MIN_DECISIONS at the seat and
+# the estimate is at least FREQUENCY_STEP away from equilibrium, the user is
+# modelled as pushing the strongest hands (by equity against a random hand)
+# up to that frequency in every spot of the seat, and each bot plays its best
+# response (exploitability.best_response) to that model, with the other bots
+# assumed to play the equilibrium.
+#
+# The estimate is rounded to FREQUENCY_STEP, so a best response is keyed by
+# (table size, stack, user seat, frequency step) and computed once per
+# process, in a few milliseconds, when a key is first needed. Every decision
+# after that is a counter lookup and one cached array read.
+
+MIN_DECISIONS = 20
+PRIOR_WEIGHT = 20
+FREQUENCY_STEP = 0.05
+CACHE_SIZE = 1024
+
+
+def record_user_decision(state, seat, decision):
+    """Counts one of the user's decisions at a seat in the session's profile."""
+    num_seats = len(state["players"])
+    for key in ("user_decision_counts", "user_push_counts"):
+        if len(state.get(key, [])) != num_seats:
+            state[key] = [0] * num_seats
+    state["user_decision_counts"][seat] += 1
+    if decision == "ALL_IN":
+        state["user_push_counts"][seat] += 1
+
+
+class OpponentModel:
+    """Cached best responses of the bots to the user's observed push frequencies."""
+
+    def __init__(self, baseline, tables_path=EQUITY_TABLES_PATH, cache_size=CACHE_SIZE):
+        # baseline(num_seats, stack) -> the StrategyTable the bots play unadapted
+        self.baseline = baseline
+        self.tables_path = tables_path
+        self._tables = None
+        self._solvers = {} # Table size -> PushFoldSolver at the default stack
+        self._equilibria = MemoCache(cache_size) # (num_seats, stack) -> (push table, per-seat push frequency)
+        self._responses = MemoCache(cache_size) # (num_seats, stack, user seat, step) -> bot push table
+
+    def _solver(self, num_seats, stack):
+        from solver import PushFoldSolver # Imports game, so only once the game module is loaded
+        if num_seats not in self._solvers:
+            if self._tables is None:
+                self._tables = load_equity_tables(self.tables_path)
+            self._solvers[num_seats] = PushFoldSolver(self._tables, num_seats=num_seats)
+        solver = self._solvers[num_seats]
+        if solver.stack != stack:
+            solver = copy.copy(solver) # Shares the equity arrays; only the stack differs
+            solver.stack = float(stack)
+        return solver
+
+    def _equilibrium(self, num_seats, stack):
+        from simulator import push_table
+        table = push_table(self.baseline(num_seats, stack))
+        prior = self._solver(num_seats, stack).prior
+        # A seat's overall push frequency: its push mass in each of its decisions (the BB walk
+        # isn't one), weighted by how often the decision comes up
+        push_mass = np.array([prior @ row for row in table])
+        frequencies = []
+        for seat in range(num_seats):
+            total = weight = 0.0
+            for mask in range(1 << seat):
+                if seat == num_seats - 1 and mask == 0:
+                    continue
+                reach = 1.0
+                for k in range(seat):
+                    p = push_mass[infoset_id(k, mask & ((1 << k) - 1))]
+                    reach *= p if mask >> k & 1 else 1.0 - p
+                total += reach * push_mass[infoset_id(seat, mask)]
+                weight += reach
+            frequencies.append(float(total / weight))
+        return table, frequencies
+
+    def _best_response(self, num_seats, stack, user_seat, step):
+        from exploitability import best_response
+        solver = self._solver(num_seats, stack)
+        table, _ = self._equilibria.get_or_compute((num_seats, stack), lambda: self._equilibrium(num_seats, stack))
+        # The user's modelled range: the strongest classes up to the estimated push frequency
+        strength = solver.hu_weighted @ solver.prior
+        order = np.argsort(-strength)
+        cumulative = np.cumsum(solver.prior[order])
+        mass_before = cumulative - solver.prior[order]
+        user_row = np.zeros(NUM_HAND_CLASSES)
+        user_row[order] = np.clip((min(step * FREQUENCY_STEP, 1.0) - mass_before) / solver.prior[order], 0.0, 1.0)
+
+        model = table.copy()
+        for mask in range(1 << user_seat):
+            model[infoset_id(user_seat, mask)] = user_row
+        model[walk_infoset(num_seats)] = 1.0
+        response = model.copy()
+        for seat in range(num_seats):
+            if seat != user_seat:
+                rows, _, _ = best_response(solver, model, seat)
+                for info, row in rows.items():
+                    response[info] = row
+        return response.astype(np.float32)
+
+    def all_in_probability(self, state, seat, info_id, class_id):
+        """A bot's all-in probability adapted to the user's profile, or None to play the equilibrium."""
+        user_seat = state["user_player_position_idx"]
+        decisions = state.get("user_decision_counts")
+        if seat == user_seat or not decisions or decisions[user_seat] < MIN_DECISIONS:
+            return None
+        num_seats = len(state["players"])
+        stack = state.get("stack_depth")
+        _, frequencies = self._equilibria.get_or_compute((num_seats, stack), lambda: self._equilibrium(num_seats, stack))
+        baseline = frequencies[user_seat]
+        estimate = (state["user_push_counts"][user_seat] + PRIOR_WEIGHT * baseline) / (decisions[user_seat] + PRIOR_WEIGHT)
+        if abs(estimate - baseline) < FREQUENCY_STEP:
+            return None
+        step = int(round(estimate / FREQUENCY_STEP))
+        response = self._responses.get_or_compute(
+            (num_seats, stack, user_seat, step), lambda: self._best_response(num_seats, stack, user_seat, step))
+        return float(response[info_id, class_id])
+
+    def stats(self):
+        return {"equilibria": self._equilibria.stats(), "best_responses": self._responses.stats()}
+
+
+def load_opponent_model(baseline, tables_path=EQUITY_TABLES_PATH):
+    """The model, or None when BOT_ADAPTATION is off or the equity tables haven't been built."""
+    if os.environ.get('BOT_ADAPTATION', '1') == '0':
+        return None
+    if not os.path.exists(tables_path):
+        print(f"Bot adaptation is off: equity tables not found at {tables_path} (build them with: python equity_tables.py)")
+        return None
+    return OpponentModel(baseline, tables_path)
@@ -0,0 +1,369 @@
+import itertools
+import os
+
+import numpy as np
+
+from cards import NUM_CARDS, NUM_RANKS, card_to_int
+from isomorphism import MemoCache, canonical_hand_key
+
+# --- Lookup-table hand evaluator ---
+# A hand's strength is a single integer that packs the evaluator's
+# [category, kicker1, kicker2, ...] list: the category sits in bits 20-23 and
+# each kicker (rank value 2..14) takes the next 4 bits down. Lists of the same
+# category always have the same length, so comparing strengths as integers
+# gives exactly the same order as comparing the lists.
+#
+# Non-flush hands depend only on the multiset of ranks. Each rank gets a key
+# chosen so that the sum of the keys of any 5, 6 or 7 ranks (at most 4 of each)
+# is unique, which turns the rank multiset into a perfect hash. Flush hands
+# depend only on the 13-bit rank mask of the flush suit. With 7 or fewer cards
+# a flush can never coexist with quads or a full house, so when a suit holds
+# 5+ cards the flush table alone decides the hand.
+
+HIGH_CARD = 0
+PAIR = 1
+TWO_PAIR = 2
+THREE_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_KIND = 7
+STRAIGHT_FLUSH = 8
+
+# Number of kickers that follow the category in the strength list
+KICKER_COUNTS = {
+    HIGH_CARD: 5, PAIR: 4, TWO_PAIR: 3, THREE_KIND: 3, STRAIGHT: 1,
+    FLUSH: 5, FULL_HOUSE: 2, FOUR_KIND: 2, STRAIGHT_FLUSH: 1
+}
+
+RANK_KEYS = [0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181]
+SUIT_KEYS = [0, 1, 29, 37]
+SUIT_KEY_BITS = 9 # 7 * max(SUIT_KEYS) < 2**9
+
+# Combined per-card key: rank key in the high bits, suit key in the low bits.
+# Sums of 7 card keys still fit in an unsigned 32-bit integer.
+CARD_KEYS = [(RANK_KEYS[c >> 2] << SUIT_KEY_BITS) | SUIT_KEYS[c & 3] for c in range(NUM_CARDS)]
+
+
+def pack_strength(score):
+    """Packs a [category, kickers...] list into a single comparable integer."""
+    strength = score[0]
+    for value in score[1:]:
+        strength = (strength << 4) | value
+    return strength << (4 * (5 - len(score) + 1))
+
+
+def strength_category(strength):
+    """Hand category (HIGH_CARD..STRAIGHT_FLUSH) of a packed strength."""
+    return strength >> 20
+
+
+def unpack_strength(strength):
+    """Inverse of pack_strength: returns the [category, kickers...] list."""
+    category = strength_category(strength)
+    kickers = [(strength >> (16 - 4 * i)) & 0xF for i in range(KICKER_COUNTS[category])]
+    return [category] + kickers
+
+
+def _straight_high(rank_mask):
+    # rank_mask bit i set means rank value i + 2 is present. Returns the high card value or 0.
+    for top in range(NUM_RANKS - 1, 3, -1):
+        run = 0x1F << (top - 4)
+        if rank_mask & run == run:
+            return top + 2
+    if rank_mask & 0x100F == 0x100F: # A-2-3-4-5 (wheel), ace plays low
+        return 5
+    return 0
+
+
+def _score_rank_counts(counts):
+    """Best 5-card non-flush score for a rank count vector (index 0 = deuce)."""
+    values_desc = [r + 2 for r in range(NUM_RANKS - 1, -1, -1) if counts[r]]
+    quads = [r + 2 for r in range(NUM_RANKS - 1, -1, -1) if counts[r] >= 4]
+    trips = [r + 2 for r in range(NUM_RANKS - 1, -1, -1) if counts[r] == 3]
+    pairs = [r + 2 for r in range(NUM_RANKS - 1, -1, -1) if counts[r] == 2]
+
+    if quads:
+        kicker = next((v for v in values_desc if v != quads[0]), 0)
+        return [FOUR_KIND, quads[0], kicker]
+    if trips and (len(trips) > 1 or pairs):
+        pair_candidates = trips[1:] + pairs
+        return [FULL_HOUSE, trips[0], max(pair_candidates)]
+
+    rank_mask = 0
+    for r in range(NUM_RANKS):
+        if counts[r]:
+            rank_mask |= 1 << r
+    high = _straight_high(rank_mask)
+    if high:
+        return [STRAIGHT, high]
+
+    if trips:
+        kickers = [v for v in values_desc if v != trips[0]]
+        return [THREE_KIND, trips[0]] + kickers[:2]
+    if len(pairs) >= 2:
+        kicker = next((v for v in values_desc if v != pairs[0] and v != pairs[1]), 0)
+        return [TWO_PAIR, pairs[0], pairs[1], kicker]
+    if pairs:
+        kickers = [v for v in values_desc if v != pairs[0]]
+        return [PAIR, pairs[0]] + kickers[:3]
+    return [HIGH_CARD] + values_desc[:5]
+
+
+def _score_flush_mask(rank_mask):
+    """Score for the cards of a single suit given as a rank mask, or None if fewer than 5."""
+    values_desc = [r + 2 for r in range(NUM_RANKS - 1, -1, -1) if rank_mask >> r & 1]
+    if len(values_desc) < 5:
+        return None
+    high = _straight_high(rank_mask)
+    if high:
+        return [STRAIGHT_FLUSH, high]
+    return [FLUSH] + values_desc[:5]
+
+
+def _build_flush_table():
+    table = [0] * (1 << NUM_RANKS)
+    for mask in range(1 << NUM_RANKS):
+        score = _score_flush_mask(mask)
+        if score:
+            table[mask] = pack_strength(score)
+    return table
+
+
+def _build_rank_table(num_cards):
+    """Maps the rank-key sum of every valid num_cards rank multiset to its packed strength."""
+    table = {}
+    counts = [0] * NUM_RANKS
+    for combo in itertools.combinations_with_replacement(range(NUM_RANKS), num_cards):
+        for r in range(NUM_RANKS):
+            counts[r] = 0
+        for r in combo:
+            counts[r] += 1
+        if max(counts) > 4:
+            continue
+        key = sum(RANK_KEYS[r] for r in combo)
+        table[key] = pack_strength(_score_rank_counts(counts))
+    return table
+
+
+FLUSH_TABLE = _build_flush_table()
+_RANK_TABLES = {} # num_cards -> {rank key sum: strength}, built on first use
+
+
+def rank_table(num_cards):
+    table = _RANK_TABLES.get(num_cards)
+    if table is None:
+        table = _RANK_TABLES[num_cards] = _build_rank_table(num_cards)
+    return table
+
+
+def evaluate_cards(cards):
+    """
+    Returns the packed strength of the best 5-card hand among 5-7 integer cards.
+    Higher is better; ties compare equal.
+    """
+    total = 0
+    suit_masks = [0, 0, 0, 0]
+    for c in cards:
+        total += CARD_KEYS[c]
+        suit_masks[c & 3] |= 1 << (c >> 2)
+    for mask in suit_masks:
+        strength = FLUSH_TABLE[mask]
+        if strength:
+            return strength
+    return rank_table(len(cards))[total >> SUIT_KEY_BITS]
+
+
+# Build the 7-card table at import, it is the one every showdown uses
+rank_table(7)
+
+
+# Strengths of recently evaluated hands, keyed by their suit-isomorphic form
+# (see isomorphism.canonical_hand_key), so suit permutations of a hand share an entry.
+# Only for callers that repeat queries (PokerEvaluator.evaluate_strength): the key
+# costs more than the lookup it saves, so random deals call evaluate_cards directly.
+EVALUATION_CACHE_SIZE = int(os.environ.get('EVALUATION_CACHE_SIZE', 65536))
+EVALUATION_CACHE = MemoCache(EVALUATION_CACHE_SIZE)
+
+
+def evaluate_cards_cached(cards):
+    """evaluate_cards() through EVALUATION_CACHE."""
+    return EVALUATION_CACHE.get_or_compute(canonical_hand_key(cards), lambda: evaluate_cards(cards))
+
+
+# --- Vectorized (NumPy) evaluation ---
+# The batch path uses the same keys, but resolves rank sums through a dense
+# array (indexed directly by the rank-key sum) instead of a dict, and detects
+# the flush suit from the suit-key sum. Dense tables are built on first use.
+
+_CARD_KEYS_NP = np.array(CARD_KEYS, dtype=np.uint32)
+_FLUSH_TABLE_NP = np.array(FLUSH_TABLE, dtype=np.int32)
+_SUIT_KEY_MASK = (1 << SUIT_KEY_BITS) - 1
+_DENSE_TABLES = {} # num_cards -> (uint16 index by rank-key sum, int32 sorted strengths)
+_FLUSH_SUIT_TABLES = {} # num_cards -> int8 flush suit (or -1) by suit-key sum
+
+
+def _dense_tables(num_cards):
+    tables = _DENSE_TABLES.get(num_cards)
+    if tables is None:
+        table = rank_table(num_cards)
+        keys = np.fromiter(table.keys(), dtype=np.int64, count=len(table))
+        values = np.fromiter(table.values(), dtype=np.int32, count=len(table))
+        strengths, inverse = np.unique(values, return_inverse=True)
+        index = np.zeros(int(keys.max()) + 1, dtype=np.uint16)
+        index[keys] = inverse
+        tables = _DENSE_TABLES[num_cards] = (index, strengths.astype(np.int32))
+    return tables
+
+
+def _flush_suit_table(num_cards):
+    table = _FLUSH_SUIT_TABLES.get(num_cards)
+    if table is None:
+        table = np.full(num_cards * max(SUIT_KEYS) + 1, -1, dtype=np.int8)
+        for suit_counts in itertools.product(range(num_cards + 1), repeat=4):
+            if sum(suit_counts) != num_cards:
+                continue
+            key = sum(n * SUIT_KEYS[s] for s, n in enumerate(suit_counts))
+            for s, n in enumerate(suit_counts):
+                if n >= 5:
+                    table[key] = s
+        _FLUSH_SUIT_TABLES[num_cards] = table
+    return table
+
+
+def warm_up(num_cards=(7,)):
+    """
+    Builds the lookup tables for these hand sizes now rather than on first use, e.g. in
+    a preforking server's master so every worker shares them copy-on-write.
+    """
+    for n in num_cards:
+        rank_table(n)
+        _dense_tables(n)
+        _flush_suit_table(n)
+
+
+def evaluate_batch(cards):
+    """
+    Vectorized evaluation of many hands at once.
+    cards: integer array of shape (N, k) with 5 <= k <= 7 and values 0-51, one hand per row.
+    Returns an int32 array of N packed strengths, identical to evaluate_cards on each row.
+    """
+    cards = np.asarray(cards)
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError(f"evaluate_batch expects an (N, 5..7) card array, got shape {cards.shape}")
+    num_cards = cards.shape[1]
+
+    # Column-wise gathers with in-place adds avoid both a reduction over the
+    # short trailing axis and a temporary per column
+    total = _CARD_KEYS_NP.take(cards[:, 0])
+    for j in range(1, num_cards):
+        total += _CARD_KEYS_NP.take(cards[:, j])
+
+    index, strengths = _dense_tables(num_cards)
+    result = strengths[index[total >> SUIT_KEY_BITS]]
+
+    flush_suit = _flush_suit_table(num_cards)[total & _SUIT_KEY_MASK]
+    flush_rows = np.flatnonzero(flush_suit >= 0)
+    if flush_rows.size:
+        sub = cards[flush_rows].astype(np.int32)
+        in_suit = (sub & 3) == flush_suit[flush_rows, None]
+        masks = np.where(in_suit, np.left_shift(1, sub >> 2), 0).sum(axis=1)
+        result[flush_rows] = _FLUSH_TABLE_NP[masks]
+    return result
+
+
+def board_features(boards):
+    """
+    Precomputes what evaluate_on_boards needs for a fixed set of 5-card boards:
+    the summed card keys (uint32) and the rank mask of each suit (uint16, shape (N, 4)).
+    """
+    boards = np.asarray(boards)
+    totals = _CARD_KEYS_NP.take(boards[:, 0])
+    for j in range(1, boards.shape[1]):
+        totals += _CARD_KEYS_NP.take(boards[:, j])
+    suit_masks = np.zeros((len(boards), 4), dtype=np.uint16)
+    rows = np.arange(len(boards))
+    for j in range(boards.shape[1]):
+        column = boards[:, j].astype(np.int32)
+        suit_masks[rows, column & 3] |= np.left_shift(1, column >> 2).astype(np.uint16)
+    return totals, suit_masks
+
+
+def evaluate_on_boards(hole_cards, board_totals, board_suit_masks):
+    """
+    Strengths of one fixed 2-card hand on many 5-card boards (from board_features).
+    Faster than evaluate_batch when the same boards are reused for many hands.
+    """
+    total = board_totals + np.uint32(CARD_KEYS[hole_cards[0]] + CARD_KEYS[hole_cards[1]])
+    index, strengths = _dense_tables(7)
+    result = strengths[index[total >> SUIT_KEY_BITS]]
+
+    flush_suit = _flush_suit_table(7)[total & _SUIT_KEY_MASK]
+    flush_rows = np.flatnonzero(flush_suit >= 0)
+    if flush_rows.size:
+        suits = flush_suit[flush_rows].astype(np.intp)
+        masks = board_suit_masks[flush_rows, suits].astype(np.int32)
+        for c in hole_cards:
+            masks |= np.where(suits == (c & 3), 1 << (c >> 2), 0)
+        result[flush_rows] = _FLUSH_TABLE_NP[masks]
+    return result
+
+
+class PokerEvaluator:
+    # Hand rankings
+    HIGH_CARD = HIGH_CARD
+    PAIR = PAIR
+    TWO_PAIR = TWO_PAIR
+    THREE_KIND = THREE_KIND
+    STRAIGHT = STRAIGHT
+    FLUSH = FLUSH
+    FULL_HOUSE = FULL_HOUSE
+    FOUR_KIND = FOUR_KIND
+    STRAIGHT_FLUSH = STRAIGHT_FLUSH
+
+    def __init__(self):
+        self.RANK_VALUES = {
+            "2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8, "9": 9,
+            "10": 10, "J": 11, "Q": 12, "K": 13, "A": 14
+        }
+
+    def evaluate_strength(self, hole_cards, community_cards):
+        """
+        Returns the packed integer strength of the best hand, or None if there are
+        fewer than 5 (or more than 7) cards or any card is invalid.
+        Cards may be ints (0-51), strings ("Ah"), tuples (('A', 'h')) or dicts.
+        """
+        all_cards = list(hole_cards) + list(community_cards)
+        if len(all_cards) < 5 or len(all_cards) > 7:
+            return None # Not enough cards to evaluate
+        codes = []
+        for card in all_cards:
+            code = card_to_int(card)
+            if code is None:
+                return None # Invalid card
+            codes.append(code)
+        return evaluate_cards_cached(codes)
+
+    def evaluate_hand(self, hole_cards, community_cards):
+        # Compatibility shim: returns the [category, kickers...] list used by determine_winner
+        strength = self.evaluate_strength(hole_cards, community_cards)
+        if strength is None:
+            return None
+        return unpack_strength(strength)
+
+    def evaluate_batch(self, cards):
+        """Packed strengths for an (N, 5..7) array of integer cards, see evaluate_batch()."""
+        return evaluate_batch(cards)
+
+    def evaluate_five_card_hand(self, hand):
+        if not hand or len(hand) != 5: return None
+        return self.evaluate_hand(hand, [])
+
+    def hand_type_to_string(self, hand_type_val):
+        types = {
+            self.HIGH_CARD: "High Card", self.PAIR: "Pair", self.TWO_PAIR: "Two Pair",
+            self.THREE_KIND: "Three of a Kind", self.STRAIGHT: "Straight", self.FLUSH: "Flush",
+            self.FULL_HOUSE: "Full House", self.FOUR_KIND: "Four of a Kind",
+            self.STRAIGHT_FLUSH: "Straight Flush"
+        }
+        return types.get(hand_type_val, "Unknown Hand")
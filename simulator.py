@@ -0,0 +1,362 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.socket import wait_read as gevent_wait_read
+except ImportError: # gevent is only needed under the gevent web workers
+    gevent_monkey = None
+
+from cards import COMBO_CLASS_IDS, NUM_CARDS, NUM_HAND_CLASSES, class_id_from_str, parse_range
+from game import BIG_BLIND, SMALL_BLIND, STARTING_STACK
+from poker_evaluator import evaluate_batch
+from strategy import (
+    DEFAULT_ALL_IN_PROBABILITY, NUM_SEATS, STRATEGY_TABLE, get_strategy_table, infoset_id, num_seats_for,
+    seat_positions, walk_infoset
+)
+
+# --- Headless batch simulator ---
+# Plays complete N-handed push/fold hands (4-handed by default) with the
+# strategy driving every seat, using the same rules as game.py: SB/BB post
+# blinds, the seats act in turn (CO, BTN, SB, BB when 4-handed), BB is
+# automatically all-in when everyone before them folded, and
+# all-in players share the pot at showdown. Hands are played in NumPy batches:
+# one deck permutation per row, one strategy draw per seat, and a single
+# evaluate_batch call per seat for the rows that reach showdown.
+#
+# Infosets are indexed as in strategy.py (id = 2^seat - 1 + prior all-in mask).
+
+DEFAULT_BATCH_SIZE = 100000
+STREAM_BATCH_SIZE = 10000 # Smaller batches for streamed runs, so snapshots come often
+SNAPSHOT_INTERVAL = 0.25 # Seconds between streamed snapshots
+CI_Z = 1.96 # 95% confidence intervals
+
+
+def push_table(strategy=None):
+    """
+    Dense float64[2^N - 1, 169] copy of a StrategyTable's all-in probabilities.
+    Missing entries fall back to 0.5, as in simulate_optimal_decision.
+    """
+    if strategy is None:
+        strategy = STRATEGY_TABLE
+    table = np.nan_to_num(np.asarray(strategy.all_in, dtype=np.float64), nan=DEFAULT_ALL_IN_PROBABILITY)
+    table[walk_infoset(strategy.num_seats), :] = 1.0 # BB walk: everyone folded to BB
+    return table
+
+
+def table_seats(table):
+    """Table size of a push_table() array."""
+    return num_seats_for(len(table))
+
+
+_COMBO_CLASS_IDS_NP = np.array(COMBO_CLASS_IDS, dtype=np.int16).reshape(NUM_CARDS, NUM_CARDS)
+
+
+def class_ids(card1, card2):
+    """Vectorized hand-class ids (see cards.combo_class_id) for two arrays of integer cards."""
+    return _COMBO_CLASS_IDS_NP[card1, card2]
+
+
+def deal_batch(rng, batch_size, num_seats=NUM_SEATS):
+    """Shuffled decks for batch_size hands; returns (hole cards (B, seats, 2), boards (B, 5))."""
+    decks = rng.permuted(np.tile(np.arange(NUM_CARDS, dtype=np.int16), (batch_size, 1)), axis=1)
+    holes = decks[:, :2 * num_seats].reshape(batch_size, num_seats, 2)
+    boards = decks[:, 2 * num_seats:2 * num_seats + 5]
+    return holes, boards
+
+
+def play_batch(rng, holes, boards, table):
+    """
+    Plays one batch of dealt hands. Returns (pushes (B, seats) bool, net result per seat
+    in BB (B, seats), showdown mask (B,), showdown pot shares (B, seats)).
+    """
+    batch_size, num_seats = holes.shape[:2]
+    classes = class_ids(holes[:, :, 0], holes[:, :, 1])
+    draws = rng.random((batch_size, num_seats))
+    pushes = np.zeros((batch_size, num_seats), dtype=bool)
+    mask = np.zeros(batch_size, dtype=np.int64)
+    for seat in range(num_seats):
+        push = draws[:, seat] < table[(1 << seat) - 1 + mask, classes[:, seat]]
+        pushes[:, seat] = push
+        mask |= push.astype(np.int64) << seat
+
+    blinds = np.zeros(num_seats)
+    blinds[-2:] = [SMALL_BLIND, BIG_BLIND] # SB and BB act last
+    contributions = np.where(pushes, STARTING_STACK, blinds)
+    pot = contributions.sum(axis=1)
+
+    # Uncontested pots go to the only player who pushed
+    shares = pushes.astype(np.float64)
+    showdown = pushes.sum(axis=1) >= 2
+    rows = np.flatnonzero(showdown)
+    if rows.size:
+        strengths = np.full((rows.size, num_seats), -1, dtype=np.int64)
+        for seat in range(num_seats):
+            in_hand = pushes[rows, seat]
+            hands = np.concatenate([holes[rows[in_hand], seat], boards[rows[in_hand]]], axis=1)
+            strengths[in_hand, seat] = evaluate_batch(hands)
+        is_best = strengths == strengths.max(axis=1, keepdims=True)
+        shares[rows] = is_best / is_best.sum(axis=1, keepdims=True)
+
+    net = shares * pot[:, None] - contributions
+    return pushes, net, showdown, shares
+
+
+def _empty_totals(num_seats=NUM_SEATS):
+    return {
+        "hands": 0,
+        "net": np.zeros(num_seats), "net_sq": np.zeros(num_seats),
+        "pushes": np.zeros(num_seats), "showdowns": 0,
+        "showdown_players": np.zeros(num_seats + 1), "showdown_seats": np.zeros(num_seats),
+        "showdown_shares": np.zeros(num_seats)
+    }
+
+
+def _accumulate(totals, pushes, net, showdown, shares):
+    totals["hands"] += len(net)
+    totals["net"] += net.sum(axis=0)
+    totals["net_sq"] += (net * net).sum(axis=0)
+    totals["pushes"] += pushes.sum(axis=0)
+    totals["showdowns"] += int(showdown.sum())
+    totals["showdown_players"] += np.bincount(pushes[showdown].sum(axis=1), minlength=len(totals["net"]) + 1)
+    totals["showdown_seats"] += pushes[showdown].sum(axis=0)
+    totals["showdown_shares"] += shares[showdown].sum(axis=0)
+
+
+def _merge(totals_list):
+    merged = _empty_totals(len(totals_list[0]["net"]))
+    for totals in totals_list:
+        for key in merged:
+            merged[key] = merged[key] + totals[key]
+    return merged
+
+
+def run_hands(num_hands, table, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Plays num_hands in batches in this process and returns the raw totals."""
+    rng = np.random.default_rng(seed)
+    num_seats = table_seats(table)
+    totals = _empty_totals(num_seats)
+    remaining = num_hands
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        holes, boards = deal_batch(rng, size, num_seats)
+        _accumulate(totals, *play_batch(rng, holes, boards, table))
+        remaining -= size
+    return totals
+
+
+def _run_hands_star(args):
+    return run_hands(*args)
+
+
+def summarize(totals):
+    """Turns raw totals into per-position EV (BB/hand) with standard errors and showdown frequencies."""
+    hands = max(totals["hands"], 1)
+    num_seats = len(totals["net"])
+    positions = seat_positions(num_seats)
+    ev = totals["net"] / hands
+    variance = np.maximum(totals["net_sq"] / hands - ev * ev, 0.0)
+    std_error = np.sqrt(variance / hands)
+    showdowns = max(totals["showdowns"], 1)
+    seats_at_showdown = np.maximum(totals["showdown_seats"], 1)
+    return {
+        "hands": int(totals["hands"]),
+        "ev_bb": {p: float(ev[i]) for i, p in enumerate(positions)},
+        "ev_std_error": {p: float(std_error[i]) for i, p in enumerate(positions)},
+        "ev_ci95": {p: [float(ev[i] - CI_Z * std_error[i]), float(ev[i] + CI_Z * std_error[i])] for i, p in enumerate(positions)},
+        "push_frequency": {p: float(totals["pushes"][i] / hands) for i, p in enumerate(positions)},
+        "showdown_frequency": totals["showdowns"] / hands,
+        "showdown_players": {str(n): float(totals["showdown_players"][n] / showdowns) for n in range(2, num_seats + 1)},
+        "showdown_win_share": {p: float(totals["showdown_shares"][i] / seats_at_showdown[i]) for i, p in enumerate(positions)}
+    }
+
+
+def simulate_hands(num_hands, strategy=None, seed=None, processes=1, batch_size=DEFAULT_BATCH_SIZE, table=None):
+    """
+    Plays num_hands complete hands with the strategy at every seat (or with a ready
+    push_table() / apply_policy() array given as table).
+    processes > 1 splits the hands over a multiprocessing pool with independent seeds.
+    Returns the summarize() dict.
+    """
+    if table is None:
+        table = push_table(strategy)
+    processes = max(1, int(processes or 1))
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    if processes == 1:
+        return summarize(run_hands(num_hands, table, seeds[0], batch_size))
+
+    shares = [num_hands // processes + (1 if i < num_hands % processes else 0) for i in range(processes)]
+    jobs = [(n, table, s, batch_size) for n, s in zip(shares, seeds) if n]
+    with multiprocessing.Pool(processes) as pool:
+        return summarize(_merge(pool.map(_run_hands_star, jobs)))
+
+
+# --- Hero policies ---
+# A hero policy replaces the strategy of some positions, keyed by position name:
+#   {"SB": "22+, A2s+, K10o+"}         push exactly this range in every SB spot
+#   {"SB": ["AA", "KK", "AKs"]}        the same, as a list of range tokens
+#   {"SB": {"AA": 1.0, "A5s": 0.5}}    a fixed action table: all-in probability per
+#                                      class, classes not listed fold
+# The policy applies to every infoset of the seat, whatever acted before it.
+
+def apply_policy(table, policy):
+    """Copy of a push_table() array with the policy's positions overridden. Raises ValueError on bad input."""
+    positions = seat_positions(table_seats(table))
+    if not isinstance(policy, dict) or not policy:
+        raise ValueError(f"policy must map positions ({', '.join(positions)}) to a hand range or action table.")
+    table = table.copy()
+    num_seats = len(positions)
+    for position, spec in policy.items():
+        if position not in positions:
+            raise ValueError(f"Unknown position: {position!r}")
+        row = np.zeros(NUM_HAND_CLASSES)
+        if isinstance(spec, dict):
+            for hand_class, all_in in spec.items():
+                class_id = class_id_from_str(hand_class)
+                if class_id is None:
+                    raise ValueError(f"Invalid hand class: {hand_class!r}")
+                all_in = float(all_in)
+                if not 0.0 <= all_in <= 1.0:
+                    raise ValueError(f"All-in probability for {hand_class} must be between 0 and 1.")
+                row[class_id] = all_in
+        else:
+            row[parse_range(spec)] = 1.0
+        seat = positions.index(position)
+        for mask in range(1 << seat):
+            if not (seat == num_seats - 1 and mask == 0): # The BB walk stays automatic
+                table[infoset_id(seat, mask)] = row
+    return table
+
+
+# --- Streamed simulations ---
+# iter_simulation plays hands in small batches and yields a summarize()
+# snapshot every SNAPSHOT_INTERVAL seconds, so a client can watch the EVs
+# converge. It stops early once the process has used cpu_budget seconds of
+# CPU. SimulationStream runs it in a separate, lower-priority process and
+# hands the snapshots back over a pipe, so the web worker serving the stream
+# only waits on I/O.
+
+def iter_simulation(num_hands, table, seed=None, batch_size=STREAM_BATCH_SIZE,
+                    snapshot_interval=SNAPSHOT_INTERVAL, cpu_budget=None):
+    """
+    Yields summarize() snapshots with "hands_requested", "cpu_seconds" and "done" added.
+    The last one has done=True and "stopped" set to "complete" or "cpu_budget".
+    """
+    rng = np.random.default_rng(seed)
+    num_seats = table_seats(table)
+    totals = _empty_totals(num_seats)
+    cpu_start = time.process_time()
+    last_snapshot = time.monotonic()
+    stopped = "complete"
+    while totals["hands"] < num_hands:
+        holes, boards = deal_batch(rng, min(batch_size, num_hands - totals["hands"]), num_seats)
+        _accumulate(totals, *play_batch(rng, holes, boards, table))
+        if totals["hands"] >= num_hands:
+            break
+        if cpu_budget is not None and time.process_time() - cpu_start >= cpu_budget:
+            stopped = "cpu_budget"
+            break
+        if time.monotonic() - last_snapshot >= snapshot_interval:
+            snapshot = summarize(totals)
+            snapshot.update(hands_requested=num_hands, cpu_seconds=round(time.process_time() - cpu_start, 3), done=False)
+            yield snapshot
+            last_snapshot = time.monotonic()
+    snapshot = summarize(totals)
+    snapshot.update(hands_requested=num_hands, cpu_seconds=round(time.process_time() - cpu_start, 3), done=True, stopped=stopped)
+    yield snapshot
+
+
+def _simulation_worker(conn, num_hands, table, seed, cpu_budget, niceness):
+    try:
+        if niceness:
+            os.nice(niceness)
+        for snapshot in iter_simulation(num_hands, table, seed, cpu_budget=cpu_budget):
+            conn.send(snapshot)
+    finally:
+        conn.close()
+
+
+def _under_gevent():
+    return gevent_monkey is not None and gevent_monkey.is_module_patched('socket')
+
+
+def _process_context():
+    if not _under_gevent():
+        return multiprocessing.get_context()
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['simulator']) # Children start with the strategy tables imported
+    return context
+
+
+class SimulationStream:
+    """
+    Iterates over the snapshots of a simulation running in a child process.
+    close() (or leaving the iteration early) terminates the child.
+
+    Under gevent (see gunicorn.conf.py) the child comes from a forkserver
+    rather than a fork of the monkey-patched worker, and the iteration waits
+    for each snapshot cooperatively, so an open stream doesn't block the
+    worker's other connections.
+    """
+
+    def __init__(self, num_hands, table, seed=None, cpu_budget=None, niceness=10):
+        context = _process_context()
+        receiver, sender = context.Pipe(duplex=False)
+        self._conn = receiver
+        self._process = context.Process(
+            target=_simulation_worker, args=(sender, num_hands, table, seed, cpu_budget, niceness), daemon=True)
+        self._process.start()
+        sender.close()
+        self._cooperative = _under_gevent()
+
+    def __iter__(self):
+        try:
+            while True:
+                try:
+                    if self._cooperative:
+                        gevent_wait_read(self._conn.fileno())
+                    snapshot = self._conn.recv()
+                except EOFError: # Worker finished or died
+                    return
+                yield snapshot
+                if snapshot.get("done"):
+                    return
+        finally:
+            self.close()
+
+    def close(self):
+        self._conn.close()
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play push/fold hands headlessly with the loaded strategy.")
+    parser.add_argument('--hands', type=int, default=1000000)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--seats', type=int, default=NUM_SEATS, help="Table size, 2-9 (its strategy from strategy.strategy_paths)")
+    parser.add_argument('--policy', default=None, help='Hero policy JSON, e.g. \'{"SB": "22+, A2s+"}\'')
+    args = parser.parse_args()
+
+    try:
+        strategy_table = push_table(get_strategy_table(args.seats))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if args.policy:
+        strategy_table = apply_policy(strategy_table, json.loads(args.policy))
+
+    started = time.time()
+    result = simulate_hands(args.hands, seed=args.seed, processes=args.processes, table=strategy_table)
+    result["seconds"] = round(time.time() - started, 2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
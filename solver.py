@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from cards import HAND_CLASSES, NUM_HAND_CLASSES, hand_class_combos
+from equity_tables import DEFAULT_PATH as EQUITY_TABLES_PATH, load_equity_tables
+from game import BIG_BLIND, SMALL_BLIND, STARTING_STACK
+from strategy import (
+    GRID_PATH, NUM_SEATS, StrategyGrid, StrategyTable, infoset_id, num_infosets, strategy_paths, walk_infoset
+)
+
+# --- Push/fold CFR+ solver ---
+# Solves the N-handed push/fold game (4-handed by default: CO, BTN, SB, BB
+# act once each; the big blind is automatically all in when everyone folds
+# to them) over its 2^N - 2 infosets x 169 hand classes. Regrets and
+# strategies are float64[2^N - 1, 169] arrays indexed by infoset id (see
+# strategy.infoset_id), and every counterfactual value is a handful of
+# vector/matrix products over class weight vectors, so one 4-handed
+# iteration costs milliseconds (the work grows as 2^N per seat).
+#
+# Payoffs come from the precomputed class-equity tables (equity_tables.py):
+# exact heads-up equity with card removal between the two all-in players, the
+# sampled three-way table for three-way all-ins, and for four-way all-ins (or
+# three-way ones when that table wasn't built) a Bradley-Terry style estimate
+# from the heads-up equities: 1 / (1 + sum over opponents of (1 - e) / e).
+# Folded players' cards are treated as independent of everyone else's.
+
+TOTAL_COMBOS = 1326 # 52 choose 2
+COMBOS_AFTER_ONE_HAND = 1225 # 50 choose 2
+
+
+class PushFoldSolver:
+    def __init__(self, tables, stack=STARTING_STACK, small_blind=SMALL_BLIND, big_blind=BIG_BLIND, num_seats=NUM_SEATS):
+        self.num_seats = num_seats
+        self.stack = float(stack)
+        self.blinds = np.zeros(num_seats)
+        self.blinds[-2:] = [small_blind, big_blind]
+
+        combos = np.array([len(hand_class_combos(c)) for c in HAND_CLASSES], dtype=np.float64)
+        self.prior = combos / TOTAL_COMBOS
+
+        # removal[a, b]: P(class b | class a) / P(class b), so prior @ removal[a] sums to 1
+        hu_combos = np.asarray(tables.hu_combos, dtype=np.float64)
+        self.removal = hu_combos * TOTAL_COMBOS / (np.outer(combos, combos) * COMBOS_AFTER_ONE_HAND)
+        hu_equity = np.nan_to_num(np.asarray(tables.hu_equity, dtype=np.float64), nan=0.5)
+        self.hu_weighted = self.removal * hu_equity
+
+        self.three_way_weighted = None
+        self.three_way_removal = None
+        if tables.three_way is not None:
+            r = self.removal.astype(np.float32)
+            removal3 = r[:, :, None] * r[:, None, :] * r[None, :, :]
+            three_way = np.nan_to_num(np.asarray(tables.three_way, dtype=np.float32), nan=0.0)
+            self.three_way_removal = removal3
+            self.three_way_weighted = removal3 * three_way
+
+        shape = (num_infosets(num_seats), NUM_HAND_CLASSES)
+        self.regret_push = np.zeros(shape)
+        self.regret_fold = np.zeros(shape)
+        self.strategy_sum = np.zeros(shape)
+        self.weight_sum = 0.0
+        self.iteration = 0
+        self.strategy = np.full(shape, 0.5)
+        self._force_bb_walk(self.strategy)
+
+    def _force_bb_walk(self, strategy):
+        strategy[walk_infoset(self.num_seats), :] = 1.0
+
+    def _action_weights(self, strategy, profile, seat):
+        """Prior-weighted probability vector of seat's action in profile (a bitmask of pushers)."""
+        push_prob = strategy[infoset_id(seat, profile & ((1 << seat) - 1))]
+        if profile >> seat & 1:
+            return self.prior * push_prob
+        return self.prior * (1.0 - push_prob)
+
+    def _showdown_value(self, seat, opponents, weights):
+        """Expected (equity share, probability mass) vectors for seat vs pushing opponents' weights."""
+        if len(opponents) == 1:
+            w = weights[opponents[0]]
+            return self.hu_weighted @ w, self.removal @ w
+        if len(opponents) == 2 and self.three_way_weighted is not None:
+            w1, w2 = (weights[j].astype(np.float32) for j in opponents)
+            share = np.tensordot(self.three_way_weighted, w2, axes=([2], [0])) @ w1
+            mass = np.tensordot(self.three_way_removal, w2, axes=([2], [0])) @ w1
+            return share.astype(np.float64), mass.astype(np.float64)
+        # Bradley-Terry estimate from each opponent's mean heads-up equity
+        mass = np.ones(NUM_HAND_CLASSES)
+        loss_odds = np.zeros(NUM_HAND_CLASSES)
+        for j in opponents:
+            m = self.removal @ weights[j]
+            mean_equity = np.clip((self.hu_weighted @ weights[j]) / np.maximum(m, 1e-12), 1e-3, 1.0 - 1e-3)
+            loss_odds += (1.0 - mean_equity) / mean_equity
+            mass *= m
+        return mass / (1.0 + loss_odds), mass
+
+    def profile_values(self, strategy, seat):
+        """Counterfactual value vectors (over seat's classes) of every terminal profile."""
+        values = {}
+        # Profile 0 (everyone folds) can't happen: BB is forced all in when everyone folds to them
+        n = self.num_seats
+        for profile in range(1, 1 << n):
+            weights = {j: self._action_weights(strategy, profile, j) for j in range(n) if j != seat}
+            pushers = [j for j in range(n) if profile >> j & 1]
+            contributions = np.where([profile >> j & 1 for j in range(n)], self.stack, self.blinds)
+            pot = contributions.sum()
+            folded_mass = np.prod([weights[j].sum() for j in weights if j not in pushers])
+
+            if seat not in pushers:
+                pusher_mass = np.prod([weights[j].sum() for j in pushers])
+                values[profile] = np.full(NUM_HAND_CLASSES, -contributions[seat] * folded_mass * pusher_mass)
+                continue
+            opponents = [j for j in pushers if j != seat]
+            if not opponents:
+                values[profile] = np.full(NUM_HAND_CLASSES, (pot - self.stack) * folded_mass)
+                continue
+            share, mass = self._showdown_value(seat, opponents, weights)
+            values[profile] = folded_mass * (pot * share - self.stack * mass)
+        return values
+
+    def action_values(self, strategy, seat):
+        """{prior mask: (push value, fold value)} vectors over seat's classes for each of seat's infosets."""
+        low_bits = (1 << seat) - 1
+        sums = {}
+        for profile, value in self.profile_values(strategy, seat).items():
+            key = (profile & low_bits, profile >> seat & 1)
+            sums[key] = sums[key] + value if key in sums else value
+        zero = np.zeros(NUM_HAND_CLASSES)
+        return {mask: (sums.get((mask, 1), zero), sums.get((mask, 0), zero)) for mask in range(1 << seat)}
+
+    def _update_seat(self, seat, weight):
+        for mask, (push_value, fold_value) in self.action_values(self.strategy, seat).items():
+            if seat == self.num_seats - 1 and mask == 0:
+                continue # Forced BB walk, no decision
+            info = infoset_id(seat, mask)
+            sigma = self.strategy[info]
+            node_value = sigma * push_value + (1.0 - sigma) * fold_value
+            # CFR+: regrets are floored at zero
+            self.regret_push[info] = np.maximum(self.regret_push[info] + push_value - node_value, 0.0)
+            self.regret_fold[info] = np.maximum(self.regret_fold[info] + fold_value - node_value, 0.0)
+            total = self.regret_push[info] + self.regret_fold[info]
+            self.strategy[info] = np.where(total > 0, self.regret_push[info] / np.where(total > 0, total, 1.0), 0.5)
+            self.strategy_sum[info] += weight * self.strategy[info]
+
+    def iterate(self, iterations=1):
+        """Runs CFR+ iterations with alternating seat updates and linear strategy averaging."""
+        for _ in range(iterations):
+            self.iteration += 1
+            for seat in range(self.num_seats):
+                self._update_seat(seat, self.iteration)
+            self.weight_sum += self.iteration
+
+    def average_strategy(self):
+        if not self.weight_sum:
+            return self.strategy.copy()
+        average = self.strategy_sum / self.weight_sum
+        self._force_bb_walk(average)
+        return average
+
+    def save_checkpoint(self, path):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, regret_push=self.regret_push, regret_fold=self.regret_fold,
+                 strategy_sum=self.strategy_sum, strategy=self.strategy,
+                 weight_sum=self.weight_sum, iteration=self.iteration,
+                 config=np.array([self.stack, *self.blinds[-2:]]))
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path):
+        data = np.load(path)
+        if not np.allclose(data['config'], [self.stack, *self.blinds[-2:]]) or data['strategy'].shape != self.strategy.shape:
+            raise ValueError(f"Checkpoint {path} was made for different stack/blind/seat settings.")
+        self.regret_push = data['regret_push']
+        self.regret_fold = data['regret_fold']
+        self.strategy_sum = data['strategy_sum']
+        self.strategy = data['strategy']
+        self.weight_sum = float(data['weight_sum'])
+        self.iteration = int(data['iteration'])
+
+
+def strategy_to_table(strategy):
+    """Converts a float[2^N - 1, 169] push-probability array to a StrategyTable (the BB walk row left empty)."""
+    all_in = np.asarray(strategy, dtype=np.float32).copy()
+    table = StrategyTable(all_in)
+    all_in[walk_infoset(table.num_seats), :] = np.nan
+    return table
+
+
+def parse_stacks(spec):
+    """ "3:25:1" -> [3.0, 4.0, ..., 25.0] (start:stop:step, stop included); "5,8,12" -> [5.0, 8.0, 12.0]."""
+    if ':' in spec:
+        start, stop, step = (float(x) for x in spec.split(':'))
+        return [float(d) for d in np.arange(start, stop + step / 2, step)]
+    return sorted(float(d) for d in spec.split(','))
+
+
+def solve_grid(tables, depths, iterations, small_blind=SMALL_BLIND, big_blind=BIG_BLIND, num_seats=NUM_SEATS):
+    """Solves every stack depth and returns the StrategyGrid of their average strategies."""
+    strategies = []
+    for depth in depths:
+        started = time.time()
+        solver = PushFoldSolver(tables, depth, small_blind, big_blind, num_seats)
+        solver.iterate(iterations)
+        strategies.append(strategy_to_table(solver.average_strategy()))
+        print(f"Solved {depth:g} BB ({time.time() - started:.0f}s)")
+    return StrategyGrid.from_tables(depths, strategies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the N-handed push/fold game and write its strategy (aggregated_results.json for 4 seats).")
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--stack', type=float, default=STARTING_STACK)
+    parser.add_argument('--small-blind', type=float, default=SMALL_BLIND)
+    parser.add_argument('--big-blind', type=float, default=BIG_BLIND)
+    parser.add_argument('--seats', type=int, default=NUM_SEATS, help="Table size, 2-9")
+    parser.add_argument('--tables', default=EQUITY_TABLES_PATH)
+    parser.add_argument('--output', default=None, help="Strategy JSON (default: strategy.strategy_paths for --seats)")
+    parser.add_argument('--compiled-output', default=None, help="Compiled .npy table written next to the JSON")
+    parser.add_argument('--checkpoint', default=None, help="Resume from / periodically save to this .npz file")
+    parser.add_argument('--checkpoint-every', type=int, default=200)
+    parser.add_argument('--stacks', default=None,
+                        help="Solve a grid of stack depths instead, e.g. 3:25:1 or 5,8,12, and write it to --grid-output")
+    parser.add_argument('--grid-output', default=GRID_PATH)
+    args = parser.parse_args()
+    default_output, default_compiled = strategy_paths(args.seats)
+    args.output = args.output or default_output
+    args.compiled_output = args.compiled_output or default_compiled
+
+    tables = load_equity_tables(args.tables)
+    if tables is None:
+        raise SystemExit(f"Equity tables not found at {args.tables}; build them with: python equity_tables.py")
+    if args.stacks:
+        grid = solve_grid(tables, parse_stacks(args.stacks), args.iterations, args.small_blind, args.big_blind, args.seats)
+        grid.save(args.grid_output)
+        print(f"Wrote {args.grid_output} ({len(grid.depths)} depths)")
+        return
+    solver = PushFoldSolver(tables, args.stack, args.small_blind, args.big_blind, args.seats)
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        solver.load_checkpoint(args.checkpoint)
+        print(f"Resumed from {args.checkpoint} at iteration {solver.iteration}")
+
+    started = time.time()
+    previous = solver.average_strategy()
+    while solver.iteration < args.iterations:
+        solver.iterate(min(args.checkpoint_every, args.iterations - solver.iteration))
+        current = solver.average_strategy()
+        print(f"Iteration {solver.iteration}: max strategy change {np.abs(current - previous).max():.5f} ({time.time() - started:.0f}s)")
+        previous = current
+        if args.checkpoint:
+            solver.save_checkpoint(args.checkpoint)
+
+    table = strategy_to_table(solver.average_strategy())
+    with open(args.output, 'w') as f:
+        json.dump(table.to_results(), f, indent=2)
+    table.save(args.compiled_output)
+    print(f"Wrote {args.output} and {args.compiled_output}")
+
+
+if __name__ == '__main__':
+    main()
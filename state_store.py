@@ -0,0 +1,220 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# --- Server-side game state store ---
+# Game states live on the server; the Flask session cookie only carries a
+# random session id. States are stored as zlib-compressed compact JSON with a
+# version number that goes up on every save.
+#
+# CachedStateStore keeps recently used states as uncompressed JSON in an
+# in-process LRU. Each get still reads the stored version (one indexed integer
+# lookup), so a state saved by another worker process is never served stale
+# from the cache. Every get() returns a fresh copy, so a request that mutates
+# its state and fails (or never saves) leaves the cache untouched, and
+# concurrent requests of a session never share an object: only save()
+# publishes a state.
+
+DEFAULT_DB_PATH = os.path.join('instance', 'game_state.sqlite3')
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600 # Sessions untouched for 30 days are pruned at startup
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+def encode_state(state):
+    return zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_state(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class MemoryStateStore:
+    """Dict-backed store for a single process (development, tests)."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def version(self, session_id):
+        entry = self._states.get(session_id)
+        return entry[0] if entry else None
+
+    def load(self, session_id):
+        """Returns (version, state) or None."""
+        entry = self._states.get(session_id)
+        if entry is None:
+            return None
+        return entry[0], decode_state(entry[1])
+
+    def save(self, session_id, state):
+        """Stores the state and returns its new version."""
+        blob = encode_state(state)
+        with self._lock:
+            version = self._states.get(session_id, (0, None))[0] + 1
+            self._states[session_id] = (version, blob)
+        return version
+
+    def delete(self, session_id):
+        with self._lock:
+            self._states.pop(session_id, None)
+
+
+class SQLiteStateStore:
+    """File-backed store shared by every worker process on the host."""
+
+    def __init__(self, path=DEFAULT_DB_PATH, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS game_states ("
+                "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                "state BLOB NOT NULL, updated REAL NOT NULL)"
+            )
+        if max_age:
+            self.prune(max_age)
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads or across fork() (a
+        # preloading server builds the store in its master), so keep one per thread
+        # and per process
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self, session_id):
+        row = self._connection().execute(
+            "SELECT version FROM game_states WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id):
+        """Returns (version, state) or None."""
+        row = self._connection().execute(
+            "SELECT version, state FROM game_states WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        return row[0], decode_state(row[1])
+
+    def save(self, session_id, state):
+        """Stores the state and returns its new version."""
+        blob = encode_state(state)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT version FROM game_states WHERE session_id = ?", (session_id,)).fetchone()
+            version = (row[0] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO game_states (session_id, version, state, updated) VALUES (?, ?, ?, ?)",
+                (session_id, version, blob, time.time()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def delete(self, session_id):
+        self._connection().execute("DELETE FROM game_states WHERE session_id = ?", (session_id,))
+
+    def prune(self, max_age):
+        """Deletes states not saved within max_age seconds; returns how many were removed."""
+        cursor = self._connection().execute(
+            "DELETE FROM game_states WHERE updated < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+
+class LRUCache:
+    """Thread-safe least-recently-used map with a fixed number of entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedStateStore:
+    """In-process LRU of decoded states in front of another store."""
+
+    def __init__(self, backend, max_entries=DEFAULT_CACHE_SIZE):
+        self.backend = backend
+        self._cache = LRUCache(max_entries) # session id -> (version, state JSON)
+
+    def version(self, session_id):
+        """The session's current state version, or None if it has never been saved."""
+        return self.backend.version(session_id)
+
+    def get_versioned(self, session_id):
+        """(version, a fresh copy of the state) for the session, or None if it has never been saved."""
+        version = self.backend.version(session_id)
+        if version is None:
+            return None
+        entry = self._cache.get(session_id)
+        if entry is not None and entry[0] == version:
+            return version, json.loads(entry[1])
+        loaded = self.backend.load(session_id)
+        if loaded is None:
+            return None
+        self._cache.put(session_id, (loaded[0], json.dumps(loaded[1], separators=(',', ':'))))
+        return loaded
+
+    def get(self, session_id):
+        """A fresh copy of the session's state, or None if it has never been saved."""
+        entry = self.get_versioned(session_id)
+        return entry[1] if entry else None
+
+    def save(self, session_id, state):
+        """Stores the state and returns its new version."""
+        version = self.backend.save(session_id, state)
+        self._cache.put(session_id, (version, json.dumps(state, separators=(',', ':'))))
+        return version
+
+    def delete(self, session_id):
+        self.backend.delete(session_id)
+        self._cache.pop(session_id)
+
+
+def create_state_store(backend='sqlite', path=DEFAULT_DB_PATH, cache_size=DEFAULT_CACHE_SIZE):
+    """Builds the configured store: backend is "sqlite" or "memory"."""
+    if backend == 'memory':
+        return CachedStateStore(MemoryStateStore(), cache_size)
+    if backend == 'sqlite':
+        return CachedStateStore(SQLiteStateStore(path), cache_size)
+    raise ValueError(f"Unknown game state backend: {backend}")
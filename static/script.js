@@ -23,6 +23,30 @@ document.addEventListener('DOMContentLoaded', () => {
     const chartCanvas = document.getElementById('performanceChart');
 
     const CARD_IMAGE_PATH = '/static/card_images/';
+    const CARD_DISPLAY_WIDTH = 60; // Matches the card size in style.css
+    const ACTIONS_RETURN_VIEW = true; // false: POST the action, then GET /get_state
+    const USE_STATE_EVENTS = typeof EventSource !== 'undefined'; // Live updates over /events (SSE)
+    let currentView = null; // Last rendered view, SSE deltas are applied on top of it
+
+    // Draws a card from the sprite atlas when /get_state sends one, otherwise as a plain image
+    function createCardElement(cardFile, sprite, atlas, alt) {
+        if (atlas && sprite) {
+            const scale = CARD_DISPLAY_WIDTH / atlas.card_width;
+            const cardDiv = document.createElement('div');
+            cardDiv.classList.add('card-sprite');
+            if (cardFile === 'back.png') cardDiv.classList.add('card-back');
+            cardDiv.setAttribute('role', 'img');
+            cardDiv.setAttribute('aria-label', alt);
+            cardDiv.style.backgroundImage = `url(${atlas.image_url})`;
+            cardDiv.style.backgroundSize = `${atlas.width * scale}px ${atlas.height * scale}px`;
+            cardDiv.style.backgroundPosition = `-${sprite[0] * scale}px -${sprite[1] * scale}px`;
+            return cardDiv;
+        }
+        const cardImg = document.createElement('img');
+        cardImg.src = CARD_IMAGE_PATH + cardFile;
+        cardImg.alt = alt;
+        return cardImg;
+    }
 
     const hamburgerIcon = document.getElementById('hamburger-menu-icon');
     const sideMenu = document.getElementById('side-menu');
@@ -74,7 +98,30 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Applies the server's state stream: a full snapshot, then changed fields only
+    function startStateEvents() {
+        const source = new EventSource('/events');
+        source.addEventListener('snapshot', (event) => {
+            const view = JSON.parse(event.data);
+            if (currentView && currentView.state_version !== undefined && view.state_version <= currentView.state_version) return;
+            updateUI(view);
+        });
+        source.addEventListener('delta', (event) => {
+            if (!currentView) return;
+            const delta = JSON.parse(event.data);
+            // An action response may already have shown this version (or a newer one)
+            if (currentView.state_version !== undefined && delta.state_version <= currentView.state_version) return;
+            // The changes are relative to the stream's previous view; if that isn't the one shown, refetch
+            if (delta.base_version !== currentView.state_version) {
+                fetchAndUpdateState();
+                return;
+            }
+            updateUI(Object.assign({}, currentView, delta.changes));
+        });
+    }
+
     function updateUI(state) {
+        currentView = state;
         // Log messages
         logMessagesUl.innerHTML = ''; // Clear old logs
         state.log_messages.forEach(msg => {
@@ -128,11 +175,11 @@ document.addEventListener('DOMContentLoaded', () => {
                                        ? state.all_player_cards_display[index] 
                                        : ['back.png', 'back.png'];
 
-            playerCardsToDisplay.forEach(cardFile => {
-                const cardImg = document.createElement('img');
-                cardImg.src = CARD_IMAGE_PATH + cardFile;
-                cardImg.alt = cardFile.split('.')[0]; 
-                cardsDiv.appendChild(cardImg);
+            const playerSprites = (state.all_player_cards_sprites && state.all_player_cards_sprites[index]) || [];
+
+            playerCardsToDisplay.forEach((cardFile, cardIndex) => {
+                const sprite = playerSprites[cardIndex] || (cardFile === 'back.png' ? state.card_back_sprite : null);
+                cardsDiv.appendChild(createCardElement(cardFile, sprite, state.sprite_atlas, cardFile.split('.')[0]));
             });
             playerArea.appendChild(cardsDiv);
 
@@ -162,22 +209,17 @@ document.addEventListener('DOMContentLoaded', () => {
         // Community cards (lines 106-122)
         // This logic should be fine as state.community_cards_display is now set by backend for showdown
         communityCardsArea.innerHTML = '';
-        (state.community_cards_display || []).forEach(cardFile => {
+        (state.community_cards_display || []).forEach((cardFile, cardIndex) => {
             if (cardFile) { 
-                const cardImg = document.createElement('img');
-                cardImg.src = CARD_IMAGE_PATH + cardFile;
-                cardImg.alt = cardFile.split('.')[0];
-                communityCardsArea.appendChild(cardImg);
+                const sprite = state.community_cards_sprites && state.community_cards_sprites[cardIndex];
+                communityCardsArea.appendChild(createCardElement(cardFile, sprite, state.sprite_atlas, cardFile.split('.')[0]));
             }
         });
         // If fewer than 5 community cards are sent (e.g. not showdown), fill with backs
         const revealedCount = (state.community_cards_display || []).length;
         if (state.game_phase !== "showdown" || revealedCount < 5) { // Show 5 backs if not showdown or not all revealed
             for (let i = revealedCount; i < 5; i++) {
-                const cardImg = document.createElement('img');
-                cardImg.src = CARD_IMAGE_PATH + 'back.png';
-                cardImg.alt = 'Card Back';
-                communityCardsArea.appendChild(cardImg);
+                communityCardsArea.appendChild(createCardElement('back.png', state.card_back_sprite, state.sprite_atlas, 'Card Back'));
             }
         }
 
@@ -201,7 +243,11 @@ document.addEventListener('DOMContentLoaded', () => {
         
         // Performance Graph Update
         if (state.player_cumulative_bb && typeof Chart !== 'undefined') { // Check if Chart.js is loaded
-            const labels = Array.from({ length: state.player_cumulative_bb.length }, (_, i) => i);
+            // Point i is the total after hand i * stride; the last point is always the latest hand
+            const stride = state.player_cumulative_bb_stride || 1;
+            const handsRecorded = state.player_cumulative_bb_hands !== undefined
+                ? state.player_cumulative_bb_hands : state.player_cumulative_bb.length - 1;
+            const labels = state.player_cumulative_bb.map((_, i) => Math.min(i * stride, handsRecorded));
             const data = {
                 labels: labels,
                 datasets: [{
@@ -233,28 +279,43 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    dealButton.addEventListener('click', async () => {
-        await fetch('/deal', { method: 'POST' });
-        fetchAndUpdateState();
-    });
+    // Posts an action. With ACTIONS_RETURN_VIEW the response carries the updated view
+    // (?view=1), so there's no second GET /get_state round trip.
+    async function postAction(url) {
+        if (!ACTIONS_RETURN_VIEW) {
+            await fetch(url, { method: 'POST' });
+            return fetchAndUpdateState();
+        }
+        try {
+            const response = await fetch(`${url}?view=1`, { method: 'POST' });
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const result = await response.json();
+            if (result.state) {
+                updateUI(result.state);
+            } else {
+                await fetchAndUpdateState();
+            }
+        } catch (error) {
+            console.error("Error posting action:", error);
+            logMessagesUl.innerHTML += `<li>Error: ${error.message}</li>`;
+        }
+    }
 
-    allInButton.addEventListener('click', async () => {
-        await fetch('/make_decision/ALL_IN', { method: 'POST' });
-        fetchAndUpdateState();
-    });
+    dealButton.addEventListener('click', () => postAction('/deal'));
 
-    foldButton.addEventListener('click', async () => {
-        await fetch('/make_decision/FOLD', { method: 'POST' });
-        fetchAndUpdateState();
-    });
+    allInButton.addEventListener('click', () => postAction('/make_decision/ALL_IN'));
 
-    restartButton.addEventListener('click', async () => {
-        await fetch('/restart', { method: 'POST' });
-        fetchAndUpdateState(); // Fetch initial state after restart
-    });
+    foldButton.addEventListener('click', () => postAction('/make_decision/FOLD'));
+
+    restartButton.addEventListener('click', () => postAction('/restart')); // Shows the initial state after restart
 
     // Initial state load
     fetchAndUpdateState();
+    if (USE_STATE_EVENTS) {
+        startStateEvents();
+    }
 });
 
 // Adblock detection function
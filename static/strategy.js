@@ -0,0 +1,72 @@
+// Push/fold strategy decoder for the binary export written by strategy_assets.py:
+// a 16-byte header (magic "PFSTRAT1", version, seats, bits per value, rows,
+// columns), then one all-in probability per [infoset id][hand class id], stored
+// as round(p * (2^bits - 2)). The top value marks entries the strategy doesn't cover.
+// Infoset id = 2^seat - 1 + prior mask (bit k set when seat k went all in).
+
+const STRATEGY_MAGIC = 'PFSTRAT1';
+const STRATEGY_HEADER_SIZE = 16;
+const STRATEGY_RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A'];
+
+class PushFoldStrategy {
+    constructor(buffer) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 8));
+        if (magic !== STRATEGY_MAGIC || view.getUint8(8) !== 1) {
+            throw new Error('Not a version 1 strategy export');
+        }
+        this.numSeats = view.getUint8(9);
+        this.bits = view.getUint8(10);
+        this.numInfosets = view.getUint16(12, true);
+        this.numClasses = view.getUint16(14, true);
+        const count = this.numInfosets * this.numClasses;
+        this.values = this.bits === 16
+            ? new Uint16Array(buffer, STRATEGY_HEADER_SIZE, count) // Little-endian, as on every browser platform
+            : new Uint8Array(buffer, STRATEGY_HEADER_SIZE, count);
+        this.missing = (1 << this.bits) - 1;
+        this.bytes = buffer.byteLength;
+    }
+
+    // Number of covered (infoset, hand class) entries
+    get count() {
+        return this.values.reduce((n, value) => n + (value !== this.missing ? 1 : 0), 0);
+    }
+
+    static infosetId(seat, priorMask) {
+        return (1 << seat) - 1 + priorMask;
+    }
+
+    // "AKs" / "K7o" / "1010" -> hand class id (cards.hand_class_id), or -1
+    static classId(handClass) {
+        const suffix = handClass.slice(-1);
+        const ranks = suffix === 's' || suffix === 'o' ? handClass.slice(0, -1) : handClass;
+        const firstLength = ranks.startsWith('10') ? 2 : 1;
+        const high = STRATEGY_RANKS.indexOf(ranks.slice(0, firstLength));
+        const low = STRATEGY_RANKS.indexOf(ranks.slice(firstLength));
+        if (high < 0 || low < 0) return -1;
+        const [a, b] = high >= low ? [high, low] : [low, high];
+        return suffix === 'o' && a !== b ? 13 * b + a : 13 * a + b;
+    }
+
+    // All-in probability of a seat holding handClass after the prior decisions in priorMask, or null if not covered
+    allInProbability(seat, priorMask, handClass) {
+        const classId = PushFoldStrategy.classId(handClass);
+        const infosetId = PushFoldStrategy.infosetId(seat, priorMask);
+        if (classId < 0 || infosetId >= this.numInfosets) return null;
+        const value = this.values[infosetId * this.numClasses + classId];
+        return value === this.missing ? null : value / (this.missing - 1);
+    }
+}
+
+// Fetches the current export named by baseUrl + "manifest.json". The hashed file itself
+// is requested: the Flask /strategy/ route answers with its precompressed .br or .gz copy
+// and Content-Encoding, and static hosts compress it on the fly or send its 2.5 KB as is.
+async function loadPushFoldStrategy(baseUrl) {
+    const manifestResponse = await fetch(`${baseUrl}manifest.json`, { cache: 'no-cache' });
+    if (!manifestResponse.ok) throw new Error(`No strategy manifest at ${baseUrl}`);
+    const manifest = await manifestResponse.json();
+
+    const response = await fetch(`${baseUrl}${manifest.file}`);
+    if (!response.ok) throw new Error(`Could not fetch ${manifest.file}`);
+    return new PushFoldStrategy(await response.arrayBuffer());
+}
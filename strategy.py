@@ -0,0 +1,450 @@
+import bisect
+import json
+import os
+import pickle
+
+import numpy as np
+
+from cards import HAND_CLASSES, HAND_CLASS_IDS, NUM_HAND_CLASSES
+
+# --- Strategy data ---
+# The push/fold strategy is a dense float32[15, 169] array of all-in
+# probabilities indexed by (infoset id, hand-class id); fold probability is
+# 1 - all-in and NaN marks a situation the strategy doesn't cover.
+# aggregated_results.json ("P2:[P0:P][P1:P]|KJo" -> probabilities) is the
+# source format; it is compiled once to aggregated_results.npy, which is
+# memory-mapped at import so startup doesn't parse JSON in every worker.
+#
+# Infosets are indexed by (seat, prior-action bitmask): id = 2^seat - 1 + mask,
+# where bit k of the mask is set when seat k went all in. Seats are numbered
+# in acting order, so the formula is the same at any table size: an N-handed
+# strategy has 2^N - 1 rows, and the 4-handed one's seats are CO, BTN, SB, BB.
+# The last seat (BB) with an all-fold mask is the automatic walk and has no
+# entries.
+#
+# Tables other than 4-handed (see strategy_paths) use generic infoset keys,
+# "<seat>:<prior actions>" such as "3:FAF|KJo"; the 4-handed JSON keeps its
+# original "P2:[P0:P][P1:P]" keys, and both forms are read for it.
+
+NUM_SEATS = 4 # The default table size
+MAX_SEATS = 9
+NUM_INFOSETS = (1 << NUM_SEATS) - 1
+DEFAULT_ALL_IN_PROBABILITY = 0.5 # Used for situations missing from the strategy
+JSON_PATH = os.path.join('static', 'aggregated_results.json')
+COMPILED_PATH = os.path.join('static', 'aggregated_results.npy')
+PICKLE_PATH = 'aggregated_results.pkl'
+
+# Position names in acting order; an N-handed table uses the last N
+POSITIONS = ["UTG", "UTG1", "UTG2", "LJ", "HJ", "CO", "BTN", "SB", "BB"]
+
+
+def seat_positions(num_seats=NUM_SEATS):
+    """Position names of an N-handed table in acting order, e.g. 4 -> CO, BTN, SB, BB."""
+    if not 2 <= num_seats <= MAX_SEATS:
+        raise ValueError(f"Tables must have between 2 and {MAX_SEATS} seats.")
+    return POSITIONS[MAX_SEATS - num_seats:]
+
+
+def num_infosets(num_seats):
+    return (1 << num_seats) - 1
+
+
+def num_seats_for(num_rows):
+    """Table size of a strategy array with num_rows infosets (2^N - 1), or None."""
+    num_seats = (num_rows + 1).bit_length() - 1
+    return num_seats if num_infosets(num_seats) == num_rows and 2 <= num_seats <= MAX_SEATS else None
+
+
+def walk_infoset(num_seats=NUM_SEATS):
+    """Infoset id of the last seat (BB) when everyone folded to it: an automatic all-in, not a decision."""
+    return infoset_id(num_seats - 1, 0)
+
+
+def strategy_paths(num_seats=NUM_SEATS):
+    """(JSON source, compiled .npy) of the strategy for a table size."""
+    if num_seats == NUM_SEATS:
+        return JSON_PATH, COMPILED_PATH
+    return (os.path.join('static', f'strategy_{num_seats}max.json'),
+            os.path.join('static', f'strategy_{num_seats}max.npy'))
+
+
+# Helper function to generate the infoset string for strategy lookup
+def generate_infoset_for_lookup(prior_actions):
+    """
+    Generates the infoset string based on prior player actions.
+    prior_actions: list of decisions ("ALL_IN" or "FOLD") from CO, BTN, SB in order.
+    Player IDs in infoset (P0, P1, P2, P3) map to (CO, BTN, SB, BB).
+    """
+    num_prior = len(prior_actions)
+
+    if num_prior == 0:  # Current player is CO
+        # This is the typical starting infoset for the first actor (CO)
+        return "P2:[P0:P][P1:P]"
+
+    elif num_prior == 1:  # Current player is BTN (CO has acted)
+        co_act_char = 'A' if prior_actions[0] == 'ALL_IN' else 'F'
+        # Infoset for BTN, given CO's action (P2 refers to CO in this context)
+        return f"P3:[P0:P][P1:P][P2:{co_act_char}]"
+
+    elif num_prior == 2:  # Current player is SB (CO and BTN have acted)
+        co_act_char = 'A' if prior_actions[0] == 'ALL_IN' else 'F'
+        btn_act_char = 'A' if prior_actions[1] == 'ALL_IN' else 'F'
+        # Infoset for SB, given CO (P2) and BTN (P3) actions
+        return f"P0:[P1:P][P2:{co_act_char}][P3:{btn_act_char}]"
+
+    elif num_prior == 3:  # Current player is BB (CO, BTN, SB have acted)
+        co_act_char = 'A' if prior_actions[0] == 'ALL_IN' else 'F'
+        btn_act_char = 'A' if prior_actions[1] == 'ALL_IN' else 'F'
+        sb_act_char = 'A' if prior_actions[2] == 'ALL_IN' else 'F'
+        # Infoset for BB, given CO (P0), BTN (P2), and SB (P3) actions
+        return f"P1:[P0:{co_act_char}][P2:{btn_act_char}][P3:{sb_act_char}]"
+
+    # Fallback, though for a 4-player game, num_prior should be 0, 1, 2, or 3.
+    print(f"Warning: Unexpected number of prior actions ({num_prior}) for infoset generation.")
+    return "ERROR_UNKNOWN_INFOSET_CONDITION"
+
+
+def infoset_id(seat, prior_mask):
+    return (1 << seat) - 1 + prior_mask
+
+
+# Precomputed seat -> prior all-in mask -> infoset id table (for every table size)
+INFOSET_ID_TABLE = [[infoset_id(seat, mask) for mask in range(1 << seat)] for seat in range(MAX_SEATS)]
+
+
+def prior_mask(prior_actions):
+    """Bitmask of the prior decisions that were ALL_IN (bit k = seat k)."""
+    mask = 0
+    for k, action in enumerate(prior_actions):
+        if action == "ALL_IN":
+            mask |= 1 << k
+    return mask
+
+
+def prior_actions_from_mask(seat, prior_mask):
+    return ["ALL_IN" if prior_mask >> k & 1 else "FOLD" for k in range(seat)]
+
+
+def infoset_key(seat, prior_mask):
+    """Generic infoset key: seat, then A/F for each prior seat, e.g. (3, 0b010) -> "3:FAF"."""
+    return f"{seat}:" + "".join('A' if prior_mask >> k & 1 else 'F' for k in range(seat))
+
+
+def decision_infosets(num_seats=NUM_SEATS):
+    """(seat, prior mask) of every decision of an N-handed table (the BB walk is not one)."""
+    return [(seat, mask) for seat in range(num_seats) for mask in range(1 << seat)
+            if not (seat == num_seats - 1 and mask == 0)]
+
+
+def infoset_name(seat, prior_mask, num_seats=NUM_SEATS):
+    """The original "P2:[P0:P][P1:P]" string for the 4-handed table, the generic key otherwise."""
+    if num_seats == NUM_SEATS:
+        return generate_infoset_for_lookup(prior_actions_from_mask(seat, prior_mask))
+    return infoset_key(seat, prior_mask)
+
+
+def infoset_strings(num_seats=NUM_SEATS):
+    """(infoset id, infoset_name) for every decision the strategy covers (the BB walk has none)."""
+    return [(infoset_id(seat, mask), infoset_name(seat, mask, num_seats)) for seat, mask in decision_infosets(num_seats)]
+
+
+INFOSET_IDS = {infoset: info_id for info_id, infoset in infoset_strings()}
+
+
+def parse_infoset(infoset, num_seats=NUM_SEATS):
+    """Infoset id of a generic key ("3:FAF") or, for the 4-handed table, an original string; None if unknown."""
+    if num_seats == NUM_SEATS and infoset in INFOSET_IDS:
+        return INFOSET_IDS[infoset]
+    seat, sep, actions = infoset.partition(':')
+    if not sep or not seat.isdigit() or int(seat) >= num_seats or len(actions) != int(seat) or set(actions) - {'A', 'F'}:
+        return None
+    seat = int(seat)
+    mask = sum(1 << k for k, action in enumerate(actions) if action == 'A')
+    if seat == num_seats - 1 and mask == 0:
+        return None
+    return infoset_id(seat, mask)
+
+
+class StrategyTable:
+    def __init__(self, all_in=None, num_seats=NUM_SEATS):
+        if all_in is None:
+            all_in = np.full((num_infosets(num_seats), NUM_HAND_CLASSES), np.nan, dtype=np.float32)
+        num_seats = num_seats_for(all_in.shape[0]) if all_in.ndim == 2 else None
+        if num_seats is None or all_in.shape[1] != NUM_HAND_CLASSES:
+            raise ValueError(f"Strategy array must have shape (2^seats - 1, {NUM_HAND_CLASSES}), got {all_in.shape}")
+        self.all_in = all_in
+        self.num_seats = num_seats
+
+    @classmethod
+    def from_results(cls, results, num_seats=NUM_SEATS):
+        """
+        Builds the table from aggregated results, keyed either "infoset|hand" with
+        {"fold_probability", "all_in_probability"} values (the JSON format) or
+        (infoset, hand) with (fold, all_in) tuples (the old pickle format).
+        Keys with an unknown infoset or hand class are skipped.
+        """
+        table = cls(num_seats=num_seats)
+        for key, probabilities in results.items():
+            if isinstance(key, str):
+                if '|' not in key:
+                    continue
+                infoset, hand = key.split('|', 1)
+                all_in = probabilities.get('all_in_probability', DEFAULT_ALL_IN_PROBABILITY)
+            else:
+                infoset, hand = key
+                all_in = probabilities[1]
+            info_id = parse_infoset(infoset, num_seats)
+            class_id = HAND_CLASS_IDS.get(hand)
+            if info_id is not None and class_id is not None:
+                table.all_in[info_id, class_id] = all_in
+        return table
+
+    @classmethod
+    def from_json(cls, path=JSON_PATH, num_seats=NUM_SEATS):
+        with open(path, 'r') as f:
+            return cls.from_results(json.load(f), num_seats)
+
+    @classmethod
+    def load(cls, path=COMPILED_PATH, mmap=True):
+        """Loads a compiled .npy table, memory-mapped read-only by default."""
+        all_in = np.load(path, mmap_mode='r' if mmap else None)
+        if all_in.dtype != np.float32:
+            raise ValueError(f"{path} is not a float32 strategy table")
+        return cls(all_in)
+
+    def save(self, path=COMPILED_PATH):
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, np.asarray(self.all_in, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def to_results(self):
+        """The aggregated_results.json dict for the entries the table covers."""
+        results = {}
+        for info_id, infoset in infoset_strings(self.num_seats):
+            for class_id, hand_class in enumerate(HAND_CLASSES):
+                all_in = float(self.all_in[info_id, class_id])
+                if all_in == all_in: # skip NaN
+                    results[f"{infoset}|{hand_class}"] = {
+                        "fold_probability": 1.0 - all_in,
+                        "all_in_probability": all_in
+                    }
+        return results
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self.all_in)))
+
+    def contains(self, info_id, class_id):
+        return not np.isnan(self.all_in[info_id, class_id])
+
+    def all_in_probability(self, info_id, class_id, default=DEFAULT_ALL_IN_PROBABILITY):
+        """All-in probability for one (infoset id, class id); default when not covered."""
+        all_in = float(self.all_in[info_id, class_id])
+        return default if all_in != all_in else all_in
+
+    def all_in_probabilities(self, info_ids, class_ids, default=DEFAULT_ALL_IN_PROBABILITY):
+        """Batched lookup: all-in probabilities for arrays of infoset ids and class ids."""
+        all_in = self.all_in[np.asarray(info_ids), np.asarray(class_ids)]
+        return np.where(np.isnan(all_in), np.float32(default), all_in)
+
+
+# --- Stack-depth grid ---
+# Strategies solved at several stack depths (e.g. 3-25 BB, see solver.py
+# --stacks) are stacked into one float32[depths, 15, 169] array and written
+# to a single binary file: a 64-byte header, the float32 depths, then the
+# array. It is memory-mapped like the compiled table. A lookup at any stack
+# interpolates linearly between the two neighbouring depths (clamped at the
+# ends); on an evenly spaced grid the neighbours are found by arithmetic, so
+# the lookup costs the same however many depths the grid has.
+
+GRID_PATH = os.path.join('static', 'strategy_grid.bin')
+GRID_MAGIC = b'PFSTGRID'
+GRID_VERSION = 1
+GRID_HEADER_SIZE = 64
+GRID_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('num_depths', '<u4'), ('num_infosets', '<u4'),
+    ('num_classes', '<u4'), ('reserved', 'S40')
+])
+
+
+class StrategyGrid:
+    def __init__(self, depths, all_in):
+        depths = np.asarray(depths, dtype=np.float32)
+        if depths.ndim != 1 or len(depths) == 0 or np.any(np.diff(depths) <= 0):
+            raise ValueError("Grid depths must be a non-empty, strictly increasing list.")
+        num_seats = num_seats_for(all_in.shape[1]) if all_in.ndim == 3 else None
+        if num_seats is None or all_in.shape[0] != len(depths) or all_in.shape[2] != NUM_HAND_CLASSES:
+            raise ValueError(f"Grid array must have shape ({len(depths)}, 2^seats - 1, {NUM_HAND_CLASSES}), got {all_in.shape}")
+        self.depths = depths
+        self.all_in = all_in
+        self.num_seats = num_seats
+        self._depth_list = [float(d) for d in depths]
+        steps = np.diff(depths)
+        # Evenly spaced grids find their bracket by arithmetic instead of a search
+        self._step = float(steps[0]) if len(steps) and np.allclose(steps, steps[0], rtol=1e-4) else None
+
+    @classmethod
+    def from_tables(cls, depths, tables):
+        """Stacks one StrategyTable per depth."""
+        return cls(depths, np.stack([np.asarray(t.all_in, dtype=np.float32) for t in tables]))
+
+    @classmethod
+    def load(cls, path=GRID_PATH):
+        header = np.fromfile(path, dtype=GRID_HEADER_DTYPE, count=1)[0]
+        if header['magic'] != GRID_MAGIC or header['version'] != GRID_VERSION:
+            raise ValueError(f"{path} is not a version {GRID_VERSION} strategy grid file.")
+        if num_seats_for(int(header['num_infosets'])) is None or header['num_classes'] != NUM_HAND_CLASSES:
+            raise ValueError(f"{path} was written for a different number of infosets or classes.")
+        num_depths = int(header['num_depths'])
+        depths = np.fromfile(path, dtype='<f4', count=num_depths, offset=GRID_HEADER_SIZE)
+        all_in = np.memmap(path, dtype='<f4', mode='r', offset=GRID_HEADER_SIZE + 4 * num_depths,
+                           shape=(num_depths, int(header['num_infosets']), NUM_HAND_CLASSES))
+        return cls(depths, all_in)
+
+    def save(self, path=GRID_PATH):
+        header = np.zeros(1, dtype=GRID_HEADER_DTYPE)
+        header['magic'] = GRID_MAGIC
+        header['version'] = GRID_VERSION
+        header['num_depths'] = len(self.depths)
+        header['num_infosets'] = self.all_in.shape[1]
+        header['num_classes'] = NUM_HAND_CLASSES
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header.tobytes().ljust(GRID_HEADER_SIZE, b'\0'))
+            f.write(np.ascontiguousarray(self.depths, dtype='<f4').tobytes())
+            f.write(np.ascontiguousarray(self.all_in, dtype='<f4').tobytes())
+        os.replace(tmp_path, path)
+
+    @property
+    def min_depth(self):
+        return self._depth_list[0]
+
+    @property
+    def max_depth(self):
+        return self._depth_list[-1]
+
+    def bracket(self, stack):
+        """(lower depth index, upper depth index, weight of the upper one) for a stack in BB."""
+        depths = self._depth_list
+        if stack <= depths[0]:
+            return 0, 0, 0.0
+        if stack >= depths[-1]:
+            last = len(depths) - 1
+            return last, last, 0.0
+        if self._step is not None:
+            low = min(int((stack - depths[0]) / self._step), len(depths) - 2)
+        else:
+            low = bisect.bisect_right(depths, stack) - 1
+        return low, low + 1, (stack - depths[low]) / (depths[low + 1] - depths[low])
+
+    def all_in_probability(self, stack, info_id, class_id, default=DEFAULT_ALL_IN_PROBABILITY):
+        """All-in probability at any stack depth; default when neither neighbouring depth covers it."""
+        low, high, weight = self.bracket(stack)
+        a = float(self.all_in[low, info_id, class_id])
+        b = float(self.all_in[high, info_id, class_id])
+        if a != a: # NaN: fall back to whichever neighbour covers the spot
+            a = b
+        if b != b:
+            b = a
+        if a != a:
+            return default
+        return a + (b - a) * weight
+
+    def table_at(self, stack):
+        """StrategyTable interpolated at one stack depth (NaN where neither neighbour covers a spot)."""
+        low, high, weight = self.bracket(stack)
+        a = np.asarray(self.all_in[low], dtype=np.float32)
+        b = np.asarray(self.all_in[high], dtype=np.float32)
+        a_filled = np.where(np.isnan(a), b, a)
+        b_filled = np.where(np.isnan(b), a, b)
+        return StrategyTable((a_filled + (b_filled - a_filled) * np.float32(weight)).astype(np.float32))
+
+
+def load_strategy_grid(path=GRID_PATH):
+    """Opens the stack-depth grid if it has been built, otherwise returns None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        grid = StrategyGrid.load(path)
+        print(f"Loaded strategy grid with {len(grid.depths)} stack depths ({grid.min_depth:g}-{grid.max_depth:g} BB) from {path}")
+        return grid
+    except (ValueError, OSError) as e:
+        print(f"Error loading strategy grid from {path}: {e}")
+        return None
+
+
+def compile_strategy(json_path=JSON_PATH, compiled_path=COMPILED_PATH, num_seats=NUM_SEATS):
+    """Compiles the JSON source to the .npy table and returns it."""
+    table = StrategyTable.from_json(json_path, num_seats)
+    table.save(compiled_path)
+    return table
+
+
+# Load hand data (strategy)
+def load_strategy_table(json_path=JSON_PATH, compiled_path=COMPILED_PATH, num_seats=NUM_SEATS):
+    """
+    Loads the compiled table, recompiling it first when the JSON source is newer.
+    Falls back to the JSON itself (if the .npy can't be written) and then (4-handed
+    only) to the old pickle file; returns an empty table when no strategy is found.
+    """
+    try:
+        json_exists = os.path.exists(json_path)
+        if os.path.exists(compiled_path) and (not json_exists or os.path.getmtime(compiled_path) >= os.path.getmtime(json_path)):
+            table = StrategyTable.load(compiled_path)
+            if table.num_seats != num_seats:
+                raise ValueError(f"{compiled_path} is a {table.num_seats}-handed strategy, expected {num_seats}-handed")
+            print(f"Loaded {len(table)} strategy entries from {compiled_path}")
+            return table
+
+        if json_exists:
+            table = StrategyTable.from_json(json_path, num_seats)
+            try:
+                table.save(compiled_path)
+                print(f"Compiled {len(table)} strategy entries from {json_path} to {compiled_path}")
+            except OSError as e:
+                print(f"Loaded {len(table)} strategy entries from {json_path} (could not write {compiled_path}: {e})")
+            return table
+
+        # Fallback to pickle file if JSON doesn't exist
+        if num_seats != NUM_SEATS:
+            raise FileNotFoundError(json_path)
+        with open(PICKLE_PATH, 'rb') as f:
+            table = StrategyTable.from_results(pickle.load(f))
+            print(f"Successfully loaded {PICKLE_PATH} with {len(table)} entries.")
+            return table
+    except FileNotFoundError:
+        if num_seats != NUM_SEATS:
+            print(f"Warning: No {num_seats}-handed strategy found at {json_path}. Using empty strategy.")
+        else:
+            print("Warning: Neither aggregated_results.json nor aggregated_results.pkl found. Using empty strategy.")
+        return StrategyTable(num_seats=num_seats)
+    except Exception as e:
+        print(f"Error loading strategy data: {e}")
+        return StrategyTable(num_seats=num_seats)
+
+
+STRATEGY_TABLE = load_strategy_table()
+_STRATEGY_TABLES = {NUM_SEATS: STRATEGY_TABLE} # Table size -> strategy, loaded on first use
+
+
+def get_strategy_table(num_seats=NUM_SEATS):
+    """
+    The strategy for an N-handed table (see strategy_paths), loaded once per process.
+    Raises ValueError for a table size other than NUM_SEATS that hasn't been solved.
+    """
+    table = _STRATEGY_TABLES.get(num_seats)
+    if table is None:
+        if not any(os.path.exists(path) for path in strategy_paths(num_seats)):
+            raise ValueError(f"No {num_seats}-handed strategy; run python solver.py --seats {num_seats}")
+        table = _STRATEGY_TABLES[num_seats] = load_strategy_table(*strategy_paths(num_seats), num_seats=num_seats)
+    return table
+
+
+STRATEGY_GRID = load_strategy_grid() # None until built with solver.py --stacks
+
+
+if __name__ == '__main__':
+    import sys
+    seats = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_SEATS # python strategy.py [seats]
+    json_source, compiled_output = strategy_paths(seats)
+    compiled = compile_strategy(json_source, compiled_output, seats)
+    print(f"Compiled {len(compiled)} strategy entries to {compiled_output}")
@@ -0,0 +1,170 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError: # Brotli is only needed for the .br variant
+    brotli = None
+
+from card_assets import write_hashed
+from cards import NUM_HAND_CLASSES
+from strategy import NUM_SEATS, get_strategy_table, num_seats_for
+
+# --- Client strategy export ---
+# The browser clients get the strategy as a small binary file instead of the
+# aggregated_results.json dict: a 16-byte header (magic, version, table size,
+# bits per value, rows, columns) followed by every all-in probability as a
+# uint8 (or uint16) in [infoset id][hand class id] order, the same layout as
+# StrategyTable (see strategy.infoset_id and cards.hand_class_id).
+# A probability p is stored as round(p * MAX) with MAX = 2^bits - 2; the top
+# value marks entries the strategy doesn't cover, which clients treat as 0.5.
+#
+# The file and its gzip (and, with the brotli package, brotli) compressed
+# copies are written to static/strategy under content-hashed names, so they
+# can be cached forever; static/strategy/manifest.json points at the current
+# build and records a hash of the source table, and the export is only
+# rebuilt when that hash changes or a compressed copy this process can write
+# (brotli, once installed) is missing. static/strategy.js decodes the file; the
+# Flask app serves the precompressed copies with Content-Encoding (/strategy).
+
+STRATEGY_ASSET_DIR = os.path.join('static', 'strategy')
+MANIFEST_NAME = 'manifest.json'
+EXPORT_MAGIC = b'PFSTRAT1'
+EXPORT_VERSION = 1
+EXPORT_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', 'u1'), ('num_seats', 'u1'), ('bits', 'u1'), ('reserved', 'u1'),
+    ('num_infosets', '<u2'), ('num_classes', '<u2')
+])
+EXPORT_BITS = 8
+# Encodings the app can serve, best first: Content-Encoding -> manifest key and file suffix
+ENCODINGS = [("br", "brotli", ".br"), ("gzip", "gzip", ".gz")]
+COMPRESSORS = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+if brotli is not None:
+    COMPRESSORS["brotli"] = lambda data: brotli.compress(data, quality=11)
+
+
+def quantize_strategy(all_in, bits=EXPORT_BITS):
+    """float[infosets, 169] all-in probabilities (NaN = not covered) -> uint8/uint16 array."""
+    if bits not in (8, 16):
+        raise ValueError("bits must be 8 or 16.")
+    missing = (1 << bits) - 1
+    all_in = np.asarray(all_in, dtype=np.float64)
+    values = np.rint(np.clip(np.nan_to_num(all_in), 0.0, 1.0) * (missing - 1))
+    values[np.isnan(all_in)] = missing
+    return values.astype('<u2' if bits == 16 else 'u1')
+
+
+def dequantize_strategy(values, bits=EXPORT_BITS):
+    """The inverse of quantize_strategy: float32 probabilities with NaN for uncovered entries."""
+    missing = (1 << bits) - 1
+    all_in = values.astype(np.float32) / np.float32(missing - 1)
+    all_in[values == missing] = np.nan
+    return all_in
+
+
+def encode_strategy(all_in, bits=EXPORT_BITS):
+    """The binary export (header + quantized values) of a float[2^N - 1, 169] strategy array."""
+    num_seats = num_seats_for(len(all_in))
+    if num_seats is None or all_in.shape[1] != NUM_HAND_CLASSES:
+        raise ValueError(f"Strategy array must have shape (2^seats - 1, {NUM_HAND_CLASSES}), got {all_in.shape}")
+    header = np.zeros((), dtype=EXPORT_HEADER_DTYPE)
+    header["magic"], header["version"], header["num_seats"], header["bits"] = EXPORT_MAGIC, EXPORT_VERSION, num_seats, bits
+    header["num_infosets"], header["num_classes"] = all_in.shape
+    return header.tobytes() + quantize_strategy(all_in, bits).tobytes()
+
+
+def decode_strategy(data):
+    """float32[2^N - 1, 169] strategy array from encode_strategy() bytes. Raises ValueError on other data."""
+    header = np.frombuffer(data, dtype=EXPORT_HEADER_DTYPE, count=1)[0]
+    if header["magic"] != EXPORT_MAGIC or header["version"] != EXPORT_VERSION:
+        raise ValueError("Not a version 1 strategy export.")
+    bits = int(header["bits"])
+    shape = (int(header["num_infosets"]), int(header["num_classes"]))
+    values = np.frombuffer(data, dtype='<u2' if bits == 16 else 'u1', offset=EXPORT_HEADER_DTYPE.itemsize)
+    return dequantize_strategy(values.reshape(shape), bits)
+
+
+def build_strategy_assets(all_in, output_dir=STRATEGY_ASSET_DIR, bits=EXPORT_BITS, stem='push_fold'):
+    """Writes the hashed export and its compressed copies; returns the manifest dict."""
+    os.makedirs(output_dir, exist_ok=True)
+    data = encode_strategy(all_in, bits)
+    manifest = {
+        "file": write_hashed(output_dir, stem, 'bin', data),
+        "bytes": len(data),
+        "bits": bits,
+        "num_seats": num_seats_for(len(all_in)),
+        "num_infosets": int(all_in.shape[0]),
+        "num_classes": int(all_in.shape[1])
+    }
+    for _, key, suffix in ENCODINGS:
+        if key in COMPRESSORS:
+            compressed = COMPRESSORS[key](data)
+            manifest[key] = write_hashed(output_dir, stem, 'bin' + suffix, compressed, hash_of=data)
+            manifest[f"{key}_bytes"] = len(compressed)
+    return manifest
+
+
+def _source_signature(all_in, bits):
+    return hashlib.sha256(np.ascontiguousarray(all_in, dtype=np.float32).tobytes() + bytes([bits])).hexdigest()[:16]
+
+
+def _is_current(manifest, signature, output_dir):
+    # Current if built from the same strategy with every compressed copy this process can write
+    # (installing brotli later adds the .br copy); copies made elsewhere are kept
+    if manifest.get("signature") != signature or any(key not in manifest for key in COMPRESSORS):
+        return False
+    files = [manifest["file"]] + [manifest[key] for _, key, _ in ENCODINGS if key in manifest]
+    return all(os.path.exists(os.path.join(output_dir, name)) for name in files)
+
+
+def load_strategy_assets(all_in=None, output_dir=STRATEGY_ASSET_DIR, bits=EXPORT_BITS, build=True):
+    """
+    The current export's manifest, rebuilt first if the strategy changed since the last build.
+    Returns None when there's no usable export (and it can't be written).
+    """
+    if all_in is None:
+        all_in = get_strategy_table(NUM_SEATS).all_in
+    signature = _source_signature(all_in, bits)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if _is_current(manifest, signature, output_dir):
+            return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+    if not build:
+        return None
+    try:
+        manifest = build_strategy_assets(all_in, output_dir, bits)
+        manifest["signature"] = signature
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+        print(f"Built strategy export {manifest['file']} ({manifest['bytes']} bytes)")
+        return manifest
+    except OSError as e:
+        print(f"Strategy export unavailable: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the strategy for the browser clients to static/strategy.")
+    parser.add_argument('--output', default=STRATEGY_ASSET_DIR)
+    parser.add_argument('--bits', type=int, choices=(8, 16), default=EXPORT_BITS)
+    args = parser.parse_args()
+    manifest = load_strategy_assets(output_dir=args.output, bits=args.bits)
+    if manifest is None:
+        raise SystemExit(1)
+    variants = ", ".join(f"{manifest[key]} ({manifest[key + '_bytes']} bytes)" for _, key, _ in ENCODINGS if key in manifest)
+    print(f"{args.output}: {manifest['file']} ({manifest['bytes']} bytes), {variants}")
+
+
+if __name__ == '__main__':
+    main()
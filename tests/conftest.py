@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules live at the repository root and open static/ relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from deals import POOL_SIZE, DealEngine
+from game import apply_user_decision, deal_new_hand, get_initial_game_state, resolve_user_bb_walk
+from hand_history import HandHistoryWriter, NO_CARD, decode_record, deal_mismatches, hand_record, iter_records
+
+
+def play_hands(writer, num_hands, seed):
+    state = get_initial_game_state(deal_seed=seed)
+    for hand in range(num_hands):
+        assert deal_new_hand(state)["success"]
+        if not resolve_user_bb_walk(state) and state["game_phase"] == "awaiting_decision":
+            assert apply_user_decision(state, "ALL_IN" if hand % 2 else "FOLD")["success"]
+        assert state["game_phase"] == "showdown"
+        writer.append(hand_record(state, "test-session"))
+    writer.flush()
+
+
+def test_logged_deals_regenerate_from_seed_and_index(tmp_path):
+    seed = 20240917
+    num_hands = POOL_SIZE + 6 # Crosses a pool boundary
+    play_hands(HandHistoryWriter(str(tmp_path)), num_hands, seed)
+    records = np.concatenate(list(iter_records(str(tmp_path))))
+    assert len(records) == num_hands
+    assert records["deal_index"].tolist() == list(range(num_hands))
+
+    engine = DealEngine() # Fresh pools, nothing cached from the game
+    for record in records:
+        num_seats = int(record["num_seats"])
+        assert int(record["seed"]) == seed
+        holes, board = engine.deal(seed, int(record["deal_index"]), num_seats)
+        assert record["holes"][:num_seats].tolist() == holes
+        assert (record["holes"][num_seats:] == NO_CARD).all()
+        assert record["board"].tolist() == board
+        assert len(decode_record(record)["board"]) == 5
+    assert deal_mismatches(records) == 0
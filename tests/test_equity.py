@@ -0,0 +1,40 @@
+import pytest
+
+from equity import calculate_equity, canonical_matchup, parse_players
+
+
+def test_class_narrowed_to_one_combo_is_still_a_class():
+    # The dead aces leave AKs with only AsKs; KQs is dealt around its king
+    _, _, fixed = parse_players(["AKs", "KQs"], ["Ac", "Ad", "Ah"])
+    assert fixed == []
+    specs, _ = canonical_matchup(["AKs", "KQs"], ["Ac", "Ad", "Ah"])
+    assert specs == ["AKs", "KQs"]
+    result = calculate_equity(["AKs", "KQs"], dead_cards=["Ac", "Ad", "Ah"], tolerance=0.01, processes=1, seed=1)
+    assert result["trials"] > 0
+    assert result["equity"][0] > 0.5
+
+
+def test_classes_that_collide_are_dealt_not_rejected_as_duplicates():
+    dead = ["Ac", "Ad", "Ah", "Kc", "Kd", "Kh"] # Leaves AKs = AsKs and KQs = KsQs, which share the Ks
+    with pytest.raises(ValueError, match="can't be dealt together"):
+        calculate_equity(["AKs", "KQs"], dead_cards=dead, tolerance=0.01, processes=1, seed=1)
+
+
+def test_specific_cards_given_twice_are_rejected():
+    with pytest.raises(ValueError, match="more than one player"):
+        parse_players(["AhKh", "KhQd"])
+
+
+def test_table_answers_have_the_monte_carlo_shape():
+    from cards import class_id_from_str
+    from equity_tables import load_equity_tables
+    tables = load_equity_tables()
+    if tables is None:
+        pytest.skip("equity tables not built")
+    result = tables.result([class_id_from_str("AA"), class_id_from_str("KK")])
+    sampled = calculate_equity(["AA", "KK"], tolerance=0.01, processes=1, seed=1)
+    assert set(sampled) <= set(result)
+    assert result["std_error"] == [0.0, 0.0]
+    assert abs(sum(result["win"]) + result["tie"][0] - 1.0) < 1e-5
+    for exact, estimate in zip(result["equity"] + result["win"], sampled["equity"] + sampled["win"]):
+        assert abs(exact - estimate) < 0.03
@@ -0,0 +1,21 @@
+import time
+
+from jobs import JobQueue
+
+
+class SlowFinishQueue(JobQueue):
+    """A queue whose done callback runs late, as it can when a waiter wakes first."""
+
+    def _finish(self, key, future):
+        time.sleep(0.2)
+        super()._finish(key, future)
+
+
+def test_run_returns_result_before_done_callback():
+    queue = SlowFinishQueue(max_workers=1)
+    job_id, result = queue.run("equity", {"hands": ["AA", "KK"], "tolerance": 0.05, "seed": 1}, timeout=60)
+    assert len(result["equity"]) == 2
+    assert abs(sum(result["equity"]) - 1.0) < 1e-6
+    # Once the callback has run, the same job is answered from the record
+    time.sleep(0.5)
+    assert queue.run("equity", {"hands": ["AA", "KK"], "tolerance": 0.05, "seed": 1}) == (job_id, result)
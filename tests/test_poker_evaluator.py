@@ -0,0 +1,72 @@
+import itertools
+import random
+from collections import Counter
+
+import numpy as np
+
+from cards import cards_to_ints
+from poker_evaluator import evaluate_batch, evaluate_cards, pack_strength
+
+
+def reference_five(cards):
+    """[category, kickers...] of exactly five card ints, the slow and obvious way."""
+    ranks = sorted(((c >> 2) + 2 for c in cards), reverse=True)
+    flush = len({c & 3 for c in cards}) == 1
+    distinct = sorted(set(ranks), reverse=True)
+    straight_high = 0
+    if len(distinct) == 5 and distinct[0] - distinct[4] == 4:
+        straight_high = distinct[0]
+    elif distinct == [14, 5, 4, 3, 2]: # The wheel
+        straight_high = 5
+    # Ranks by (count, rank), highest first
+    groups = sorted(Counter(ranks).items(), key=lambda item: (item[1], item[0]), reverse=True)
+    counts = [count for _, count in groups]
+    by_group = [rank for rank, _ in groups]
+    if straight_high and flush:
+        return [8, straight_high]
+    if counts[0] == 4:
+        return [7] + by_group
+    if counts == [3, 2]:
+        return [6] + by_group
+    if flush:
+        return [5] + ranks
+    if straight_high:
+        return [4, straight_high]
+    if counts[0] == 3:
+        return [3] + by_group
+    if counts[:2] == [2, 2]:
+        return [2] + by_group
+    if counts[0] == 2:
+        return [1] + by_group
+    return [0] + ranks
+
+
+def reference_strength(cards):
+    return max(pack_strength(reference_five(five)) for five in itertools.combinations(cards, 5))
+
+
+def test_evaluate_cards_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(3000):
+        cards = rng.sample(range(52), rng.choice((5, 6, 7)))
+        assert evaluate_cards(cards) == reference_strength(cards), cards
+
+
+def test_evaluate_cards_edge_hands():
+    for hand in (["Ah", "2d", "3c", "4s", "5h", "Kd", "Kc"], # Wheel over a pair
+                 ["Ah", "2h", "3h", "4h", "5h", "6d", "7d"], # Steel wheel
+                 ["Kh", "Kd", "Kc", "2s", "2h", "2d", "Ac"], # Two trips make a full house
+                 ["9h", "9d", "9c", "9s", "Ah", "Kd", "Kc"]): # Quads with the best kicker
+        cards = cards_to_ints(hand)
+        assert evaluate_cards(cards) == reference_strength(cards), hand
+
+
+def test_evaluate_batch_matches_evaluate_cards():
+    rng = np.random.default_rng(2)
+    for num_cards in (5, 6, 7):
+        hands = np.array([rng.permutation(52)[:num_cards] for _ in range(2000)])
+        expected = [evaluate_cards(list(map(int, row))) for row in hands]
+        assert evaluate_batch(hands).tolist() == expected
+        # A sample against the reference too, so both paths are pinned to it
+        for row, strength in zip(hands[:200], expected):
+            assert strength == reference_strength(list(map(int, row)))
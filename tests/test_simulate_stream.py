@@ -0,0 +1,69 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("gevent")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app under a monkey-patched gevent server in one process, as a gevent gunicorn worker runs it
+SERVER = """
+import sys
+from gevent import monkey
+monkey.patch_all()
+from gevent.pywsgi import WSGIServer
+from app import app
+WSGIServer(('127.0.0.1', int(sys.argv[1])), app, log=None).serve_forever()
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def gevent_server():
+    port = _free_port()
+    env = dict(os.environ, SIMULATE_CPU_BUDGET='10')
+    server = subprocess.Popen([sys.executable, '-c', SERVER, str(port)], cwd=ROOT, env=env)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    pytest.fail("The gevent server didn't start")
+                time.sleep(0.2)
+        yield port
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def test_requests_are_served_while_a_simulation_streams(gevent_server):
+    stream = http.client.HTTPConnection('127.0.0.1', gevent_server, timeout=30)
+    stream.request('POST', '/simulate', body=json.dumps({"hands": 10000000, "seed": 1}),
+                   headers={"Content-Type": "application/json"})
+    response = stream.getresponse()
+    first = json.loads(response.readline())
+    assert not first["done"]
+
+    # The stream is still open (10M hands take far longer than this); another request gets through
+    started = time.monotonic()
+    other = http.client.HTTPConnection('127.0.0.1', gevent_server, timeout=5)
+    other.request('GET', '/jobs/stats')
+    assert json.loads(other.getresponse().read())["success"]
+    assert time.monotonic() - started < 2
+    assert not json.loads(response.readline())["done"]
+    other.close()
+    stream.close()
@@ -0,0 +1,25 @@
+import pytest
+
+from equity_tables import load_equity_tables
+from exploitability import exploitability
+from solver import PushFoldSolver
+
+
+@pytest.fixture(scope="module")
+def tables():
+    tables = load_equity_tables()
+    if tables is None:
+        pytest.skip("equity tables not built")
+    return tables
+
+
+def test_heads_up_exploitability_falls_below_bound(tables):
+    solver = PushFoldSolver(tables, num_seats=2)
+    solver.iterate(10)
+    early = exploitability(solver.average_strategy(), solver=solver)["exploitability_mbb"]
+    solver.iterate(490)
+    report = exploitability(solver.average_strategy(), solver=solver)
+    assert report["exploitability_mbb"] < 0.1 # mBB/hand, about 0.005 after 500 iterations
+    assert report["exploitability_mbb"] < early / 10
+    for position in report["positions"].values():
+        assert position["gain_mbb"] >= 0.0
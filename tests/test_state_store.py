@@ -0,0 +1,21 @@
+from state_store import create_state_store
+
+
+def test_unsaved_changes_never_reach_the_cache():
+    store = create_state_store('memory')
+    store.save("s", {"hands_played": 1, "decisions": []})
+    state = store.get("s")
+    state["hands_played"] = 2 # A handler that mutates, then fails before saving
+    state["decisions"].append("ALL_IN")
+    assert store.get("s") == {"hands_played": 1, "decisions": []}
+
+
+def test_concurrent_gets_are_independent_and_save_publishes():
+    store = create_state_store('memory')
+    version = store.save("s", {"hands_played": 1})
+    first, second = store.get("s"), store.get("s")
+    assert first is not second
+    first["hands_played"] = 5
+    assert store.save("s", first) == version + 1
+    first["hands_played"] = 6 # Changes after save() aren't published either
+    assert store.get_versioned("s") == (version + 1, {"hands_played": 5})
@@ -0,0 +1,52 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from strategy import JSON_PATH, NUM_SEATS, StrategyGrid, StrategyTable, get_strategy_table, strategy_paths
+
+
+def test_unsolved_table_size_is_refused():
+    assert len(get_strategy_table(NUM_SEATS))
+    for path in strategy_paths(7):
+        assert not os.path.exists(path)
+    with pytest.raises(ValueError, match="solver.py --seats 7"):
+        get_strategy_table(7)
+
+
+def test_strategy_table_json_npy_json_round_trip(tmp_path):
+    with open(JSON_PATH, 'r') as f:
+        results = json.load(f)
+    table = StrategyTable.from_json(JSON_PATH)
+    path = str(tmp_path / "strategy.npy")
+    table.save(path)
+    loaded = StrategyTable.load(path)
+    assert loaded.num_seats == NUM_SEATS
+    np.testing.assert_array_equal(np.asarray(loaded.all_in), table.all_in)
+
+    round_trip = loaded.to_results()
+    assert set(round_trip) == {key for key in results if '|' in key}
+    for key, probabilities in round_trip.items():
+        assert abs(probabilities["all_in_probability"] - results[key]["all_in_probability"]) < 1e-6
+        assert abs(probabilities["fold_probability"] - results[key]["fold_probability"]) < 1e-6
+
+
+def test_strategy_grid_save_load_and_interpolation(tmp_path):
+    rng = np.random.default_rng(3)
+    all_in = rng.random((3, 15, 169)).astype(np.float32)
+    all_in[1, 0, 0] = np.nan # Not covered at one depth: the neighbour fills in
+    grid = StrategyGrid([4.0, 8.0, 12.0], all_in)
+    path = str(tmp_path / "grid.bin")
+    grid.save(path)
+    loaded = StrategyGrid.load(path)
+    np.testing.assert_array_equal(loaded.depths, grid.depths)
+    np.testing.assert_array_equal(np.asarray(loaded.all_in), all_in)
+    assert loaded.num_seats == NUM_SEATS
+
+    expected = all_in[0, 2, 5] + (all_in[1, 2, 5] - all_in[0, 2, 5]) * 0.25
+    assert abs(loaded.all_in_probability(5.0, 2, 5) - expected) < 1e-6
+    assert loaded.all_in_probability(2.0, 2, 5) == pytest.approx(all_in[0, 2, 5]) # Clamped
+    assert loaded.all_in_probability(6.0, 0, 0) == pytest.approx(all_in[0, 0, 0])
+    expected_table = (np.where(np.isnan(all_in[1]), all_in[2], all_in[1]) + all_in[2]) / 2
+    np.testing.assert_allclose(loaded.table_at(10.0).all_in, expected_table, atol=1e-6)